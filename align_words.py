@@ -3,32 +3,44 @@
 # Authorin: Sandra Sánchez
 # Datum: 07.04.2022
 
+import argparse
 import sys
 
+import instrumentation
 from shared_functions\
-    import calculate_word_alignments, save_data
+    import iterate_word_alignments, write_alignments
 
 
 def align_words(modelled_probabilities: str,
                 calculated_alignments_filename: str,
-                sentence_pairs_filename: str):
+                sentence_pairs_filename: str,
+                workers: int = 1,
+                chunk_size: int = 1000):
     """
     Get words translations and alignments based on the
     translation probabilities calculated by the EM algorithm.
-    Save them into file.
+    Save them into file, one sentence per line.
+    Sentence pairs are read, aligned and written one by one.
     :param modelled_probabilities: File with translation probs.
     :param calculated_alignments_filename: File to save
         alignments into.
     :param sentence_pairs_filename: file with sentence pairs.
+    :param workers: number of processes that align chunks of
+        sentence pairs in parallel.
+    :param chunk_size: number of sentence pairs per chunk.
     :return: None
     """
     print("________________PHASE 2: ALIGN WORDS__________________")
 
-    tiny_sentence_pairs = get_sentence_pairs_from_file(
+    tiny_sentence_pairs = iterate_sentence_pairs_from_file(
         sentence_pairs_filename)
-    alignments = calculate_word_alignments(
-        modelled_probabilities, tiny_sentence_pairs)
-    save_data(alignments, calculated_alignments_filename)
+    alignments = iterate_word_alignments(
+        modelled_probabilities, tiny_sentence_pairs,
+        workers=workers, chunk_size=chunk_size)
+    with instrumentation.timer('alignment'):
+        number_sentence_pairs = write_alignments(
+            alignments, calculated_alignments_filename)
+    instrumentation.count('alignment.sentence_pairs', number_sentence_pairs)
 
 
 def get_sentence_pairs_from_file(sentence_pairs_filename: str):
@@ -38,27 +50,48 @@ def get_sentence_pairs_from_file(sentence_pairs_filename: str):
     :param sentence_pairs_filename: file to read from
     :return: list of lists of str.
     """
-    sentence_pairs = []
+    return list(iterate_sentence_pairs_from_file(sentence_pairs_filename))
+
+
+def iterate_sentence_pairs_from_file(sentence_pairs_filename: str):
+    """
+    Lazy version of get_sentence_pairs_from_file().
+    :param sentence_pairs_filename: file to read from
+    :return: generator of lists of lists of str.
+    """
     with open(sentence_pairs_filename, 'r') as file:
-        for index, line in enumerate(file.readlines()):
-            tokenise = line.split()
-            is_source: bool = index % 2 == 0
-            if is_source:
-                sentence_pairs.append([tokenise])
-            else:
-                sentence_pairs[-1].append(tokenise)
-    return sentence_pairs
+        for source_line in file:
+            target_line = next(file, '')
+            yield [source_line.split(), target_line.split()]
+
+
+def parse_arguments(arguments):
+    """Parse the command line arguments of phase 2."""
+    parser = argparse.ArgumentParser(
+        description="Phase 2: align words with a trained model.")
+    parser.add_argument('modelled_probabilities')
+    parser.add_argument('calculated_alignments_filename')
+    parser.add_argument('sentence_pairs_filename')
+    parser.add_argument(
+        '--workers', type=int, default=1,
+        help="number of processes that align chunks in parallel")
+    parser.add_argument(
+        '--chunk-size', type=int, default=1000,
+        help="number of sentence pairs per chunk")
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args(arguments)
+    if args.workers < 1 or args.chunk_size < 1:
+        parser.error("--workers and --chunk-size must be at least 1")
+    return args
 
 
 if __name__ == '__main__':
-    if len(sys.argv) != 4:
-        sys.exit(f"4 arguments are needed, found {len(sys.argv)}")
-    else:
-        modelled_probabilities = sys.argv[1]
-        calculated_alignments_filename = sys.argv[2]
-        sentence_pairs_filename = sys.argv[3]
+    args = parse_arguments(sys.argv[1:])
+    with instrumentation.instrumented(args):
         align_words(
-            modelled_probabilities,
-            calculated_alignments_filename,
-            sentence_pairs_filename
+            args.modelled_probabilities,
+            args.calculated_alignments_filename,
+            args.sentence_pairs_filename,
+            workers=args.workers,
+            chunk_size=args.chunk_size
         )
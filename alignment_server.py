@@ -0,0 +1,351 @@
+# -*- coding: utf-8 -*-
+# Modulprojekt CLT
+# Authorin: Sandra Sánchez
+# Datum: 17.10.2026
+
+import argparse
+import functools
+import json
+import logging
+import os
+import queue
+import socketserver
+import sys
+import threading
+import time
+from concurrent.futures import Future
+
+import instrumentation
+from shared_functions import align_sentence, align_sentence_vectorized, \
+    tokenize_not_remove_punctuation, download_tokenizer_models
+from translation_table import load_translation_probabilities
+
+logger = logging.getLogger(__name__)
+
+
+class Aligner:
+    """
+    Aligns untokenized sentence pairs with a model that is loaded once.
+    The results of the last cache_size different sentence pairs are
+    kept, so a repeated sentence pair is neither tokenized nor aligned
+    again.
+    """
+
+    def __init__(self, probabilities_filename, tokenizer='nltk',
+                 vectorized=False, cache_size=10000):
+        """
+        :param probabilities_filename: binary model or probabilities file
+        :param tokenizer: 'nltk' or 'regex', see
+            shared_functions.tokenize_not_remove_punctuation()
+        :param vectorized: bool, see
+            shared_functions.align_sentence_vectorized()
+        :param cache_size: int, number of sentence pairs in the LRU cache,
+            no cache if 0
+        """
+        with instrumentation.timer('model_loading'):
+            self.translation_probabilities = load_translation_probabilities(
+                probabilities_filename)
+        self.tokenizer = tokenizer
+        self.align_sentence = align_sentence_vectorized if vectorized \
+            else align_sentence
+        self.align = functools.lru_cache(maxsize=cache_size)(
+            self._align) if cache_size else self._align
+
+    def _align(self, source_sentence, target_sentence):
+        """
+        :param source_sentence: str. Example: 'the blue house'
+        :param target_sentence: str. Example: 'la maison bleu'
+        :return: tuple (alignments, source_tokens, target_tokens) with
+            the str of phase 2 and tuples of str, the source tokens start
+            with 'NULL'. Example: ('1-1 2-3 3-2',
+            ('NULL', 'the', 'blue', 'house'), ('la', 'maison', 'bleu'))
+        """
+        source_tokens = tokenize_not_remove_punctuation(
+            source_sentence, append_null=True, tokenizer=self.tokenizer)
+        target_tokens = tokenize_not_remove_punctuation(
+            target_sentence, tokenizer=self.tokenizer)
+        return (self.align_sentence(self.translation_probabilities,
+                                    source_tokens, target_tokens),
+                tuple(source_tokens), tuple(target_tokens))
+
+    def align_batch(self, sentence_pairs):
+        """
+        :param sentence_pairs: list of tuples (source_sentence,
+            target_sentence) of str
+        :return: list of the results of align(), in the same order. A
+            sentence pair that cannot be aligned gets the exception
+            instead, so it does not fail the others of the batch.
+        """
+        results = []
+        with instrumentation.timer('alignment'):
+            for source_sentence, target_sentence in sentence_pairs:
+                try:
+                    results.append(self.align(source_sentence,
+                                              target_sentence))
+                except Exception as error:
+                    results.append(error)
+        instrumentation.count('alignment.sentence_pairs', len(results))
+        return results
+
+    def cache_info(self):
+        """:return: dict with the hits, misses and size of the cache"""
+        if not hasattr(self.align, 'cache_info'):
+            return {}
+        return self.align.cache_info()._asdict()
+
+
+class MicroBatcher:
+    """
+    Collects the requests of concurrent clients into batches that one
+    thread processes, so the model is only used by that thread.
+    A request that finds the queue empty is processed at once. When
+    more requests are queued, they are batched, and the batch waits for
+    further requests until it has max_batch_size requests or its first
+    request has waited max_delay seconds.
+    """
+
+    def __init__(self, function, max_batch_size=64, max_delay=0.0005):
+        """
+        :param function: function that takes a list of items and returns
+            the list of their results. An exception in the list is
+            raised by the future of its item only.
+        :param max_batch_size: int
+        :param max_delay: float, seconds
+        """
+        self.function = function
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.batch_sizes = []
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, item):
+        """
+        :param item: the argument of function for one request
+        :return: concurrent.futures.Future of its result
+        """
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def _run(self):
+        while True:
+            request = self._queue.get()
+            if request is None:
+                return
+            batch = [request]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch_size:
+                try:
+                    request = self._queue.get_nowait()
+                except queue.Empty:
+                    # An isolated request is not held back
+                    timeout = deadline - time.monotonic()
+                    if len(batch) == 1 or timeout <= 0:
+                        break
+                    try:
+                        request = self._queue.get(timeout=timeout)
+                    except queue.Empty:
+                        break
+                if request is None:
+                    self._queue.put(None)
+                    break
+                batch.append(request)
+            self.batch_sizes.append(len(batch))
+            items = [item for item, _ in batch]
+            try:
+                results = self.function(items)
+            except Exception as error:
+                for _, future in batch:
+                    future.set_exception(error)
+            else:
+                for (_, future), result in zip(batch, results):
+                    if isinstance(result, Exception):
+                        future.set_exception(result)
+                    else:
+                        future.set_result(result)
+
+    def close(self):
+        """Process the queued requests and stop the thread."""
+        self._queue.put(None)
+        self._thread.join()
+
+
+def handle_request(line, align):
+    """
+    Answer one request of the JSON-lines protocol.
+    A request is an object with the untokenized sentences as strings,
+    and an optional id that the response repeats:
+        {"id": 1, "source": "the blue house", "target": "la maison bleu"}
+    The response has the alignments in the format of phase 2, and in
+    "source" and "target" the lists of tokens they refer to:
+        {"id": 1, "alignments": "1-1 2-3 3-2",
+         "source": ["NULL", "the", "blue", "house"],
+         "target": ["la", "maison", "bleu"]}
+    A request that fails gets an error instead, and the server goes on:
+        {"id": 1, "error": "'source' and 'target' must be strings"}
+    :param line: str, one JSON object
+    :param align: function of (source_sentence, target_sentence) that
+        returns the result of Aligner.align()
+    :return: str, one JSON object without line break
+    """
+    response = {}
+    try:
+        request = json.loads(line)
+        if not isinstance(request, dict):
+            raise ValueError("A request must be a JSON object")
+        if 'id' in request:
+            response['id'] = request['id']
+        source_sentence = request.get('source')
+        target_sentence = request.get('target')
+        if not isinstance(source_sentence, str) \
+                or not isinstance(target_sentence, str):
+            raise ValueError("'source' and 'target' must be strings")
+        alignments, source_tokens, target_tokens = align(
+            source_sentence, target_sentence)
+    except ValueError as error:
+        response['error'] = str(error)
+    except Exception as error:
+        logger.exception("Request failed: %s", line.rstrip('\n'))
+        response['error'] = f"{type(error).__name__}: {error}"
+    else:
+        response.update(alignments=alignments, source=list(source_tokens),
+                        target=list(target_tokens))
+    return json.dumps(response, ensure_ascii=False)
+
+
+def serve_lines(aligner, input_file, output_file):
+    """
+    Answer the requests of input_file, one per line, in output_file.
+    Every response is flushed at once, so a client can wait for it
+    before it sends the next request.
+    :param aligner: Aligner
+    :param input_file: text file, for example sys.stdin
+    :param output_file: text file, for example sys.stdout
+    :return: int, number of requests
+    """
+    number_requests = 0
+    for line in input_file:
+        if not line.strip():
+            continue
+        output_file.write(handle_request(line, aligner.align) + '\n')
+        output_file.flush()
+        number_requests += 1
+    return number_requests
+
+
+class _ConnectionHandler(socketserver.StreamRequestHandler):
+    """Answers the JSON-lines requests of one client connection."""
+
+    def handle(self):
+        submit = self.server.batcher.submit
+
+        def align(source_sentence, target_sentence):
+            return submit((source_sentence, target_sentence)).result()
+
+        for line in self.rfile:
+            try:
+                line = line.decode('utf-8')
+            except UnicodeDecodeError as error:
+                response = json.dumps(
+                    {'error': f"The request is not UTF-8: {error}"})
+            else:
+                if not line.strip():
+                    continue
+                response = handle_request(line, align)
+            self.wfile.write((response + '\n').encode('utf-8'))
+            self.wfile.flush()
+
+
+class AlignmentServer(socketserver.ThreadingMixIn,
+                      socketserver.UnixStreamServer):
+    """
+    Unix socket server with one thread per connection. The requests of
+    all connections are aligned in micro-batches, see MicroBatcher.
+    """
+    daemon_threads = True
+
+    def __init__(self, socket_path, aligner, max_batch_size=64,
+                 max_delay=0.0005):
+        """
+        :param socket_path: str, a stale socket file is replaced
+        :param aligner: Aligner
+        :param max_batch_size: int, see MicroBatcher
+        :param max_delay: float, seconds, see MicroBatcher
+        """
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        self.batcher = MicroBatcher(aligner.align_batch, max_batch_size,
+                                    max_delay)
+        super().__init__(socket_path, _ConnectionHandler)
+
+    def server_close(self):
+        super().server_close()
+        self.batcher.close()
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+
+
+def parse_arguments(arguments):
+    """Parse the command line arguments of the alignment server."""
+    parser = argparse.ArgumentParser(
+        description="Load a model once and align sentence pairs sent as "
+                    "JSON lines on stdin or on a Unix socket.")
+    parser.add_argument('modelled_probabilities')
+    parser.add_argument(
+        '--socket',
+        help="listen on this Unix socket instead of reading stdin")
+    parser.add_argument(
+        '--tokenizer', choices=['nltk', 'regex'], default='nltk',
+        help="'regex' is the NLTK word tokenizer without sentence "
+             "splitting and with fewer regular expressions per sentence. "
+             "Periods inside a line, as after abbreviations, can give "
+             "other tokens than with 'nltk'.")
+    parser.add_argument(
+        '--vectorized', action='store_true',
+        help="align every sentence pair with numpy, faster with binary "
+             "models")
+    parser.add_argument(
+        '--cache-size', type=int, default=10000,
+        help="number of sentence pairs whose alignments are kept, "
+             "0 for no cache")
+    parser.add_argument(
+        '--max-batch-size', type=int, default=64,
+        help="most requests of concurrent clients aligned in one batch")
+    parser.add_argument(
+        '--max-delay', type=float, default=0.5,
+        help="milliseconds that a batch of queued requests waits for "
+             "others, a request on an idle server is aligned at once")
+    parser.add_argument(
+        '--download-tokenizer', action='store_true',
+        help="download the NLTK punkt models before serving")
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args(arguments)
+    if args.cache_size < 0:
+        parser.error("--cache-size must be at least 0")
+    if args.max_batch_size < 1:
+        parser.error("--max-batch-size must be at least 1")
+    return args
+
+
+if __name__ == '__main__':
+    args = parse_arguments(sys.argv[1:])
+    logging.basicConfig(format='%(asctime)s %(levelname)s %(message)s')
+    if args.download_tokenizer:
+        download_tokenizer_models()
+    with instrumentation.instrumented(args):
+        aligner = Aligner(args.modelled_probabilities,
+                          tokenizer=args.tokenizer,
+                          vectorized=args.vectorized,
+                          cache_size=args.cache_size)
+        if args.socket is None:
+            serve_lines(aligner, sys.stdin, sys.stdout)
+        else:
+            with AlignmentServer(args.socket, aligner, args.max_batch_size,
+                                 args.max_delay / 1000) as server:
+                print(f"Listening on {args.socket}", file=sys.stderr)
+                try:
+                    server.serve_forever()
+                except KeyboardInterrupt:
+                    pass
@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+# Modulprojekt CLT
+# Authorin: Sandra Sánchez
+# Datum: 17.10.2026
+
+import asyncio
+import collections
+import functools
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from shared_functions import align_sentence, align_sentence_vectorized, \
+    tokenize_not_remove_punctuation
+from translation_table import load_translation_probabilities
+
+
+def align_untokenized_chunk(translation_probabilities, align, tokenizer,
+                            chunk):
+    """
+    Tokenize and align a list of sentence pairs, the CPU work that
+    AsyncAligner keeps away from the event loop.
+    :param translation_probabilities: dict or TranslationTable
+    :param align: align_sentence() or align_sentence_vectorized()
+    :param tokenizer: 'nltk' or 'regex'
+    :param chunk: list of tuples (source_sentence, target_sentence) of
+        untokenized str
+    :return: list of str, one alignment per sentence pair
+    """
+    return [align(translation_probabilities,
+                  tokenize_not_remove_punctuation(
+                      source_sentence, append_null=True,
+                      tokenizer=tokenizer),
+                  tokenize_not_remove_punctuation(
+                      target_sentence, tokenizer=tokenizer))
+            for source_sentence, target_sentence in chunk]
+
+
+_worker_model = {}
+
+
+def _load_worker_model(probabilities_filename, vectorized):
+    """Process pool initializer: load the model once per worker."""
+    _worker_model['translation_probabilities'] = \
+        load_translation_probabilities(probabilities_filename)
+    _worker_model['align'] = \
+        align_sentence_vectorized if vectorized else align_sentence
+
+
+def _align_chunk_in_worker(tokenizer, chunk):
+    """Align a chunk with the model of the worker process."""
+    return align_untokenized_chunk(_worker_model['translation_probabilities'],
+                                   _worker_model['align'], tokenizer, chunk)
+
+
+async def iterate_batches(sentence_pairs, batch_size, max_delay=None):
+    """
+    Group an async iterable into lists of at most batch_size items.
+    :param sentence_pairs: async iterable
+    :param batch_size: int
+    :param max_delay: float, seconds. A batch is passed on incomplete
+        when the source has not given another item that long after the
+        first item of the batch. Batches are always complete if None.
+    :return: async generator of lists
+    """
+    loop = asyncio.get_running_loop()
+    iterator = sentence_pairs.__aiter__()
+    # The next item is awaited in a task that outlives a timeout, so
+    # no item is lost when a batch is passed on incomplete
+    next_item = None
+    try:
+        while True:
+            batch = []
+            deadline = None
+            while len(batch) < batch_size:
+                if next_item is None:
+                    next_item = asyncio.ensure_future(iterator.__anext__())
+                if deadline is not None:
+                    done, _ = await asyncio.wait(
+                        {next_item}, timeout=max(deadline - loop.time(), 0))
+                    if not done:
+                        break
+                try:
+                    item = await next_item
+                except StopAsyncIteration:
+                    next_item = None
+                    if batch:
+                        yield batch
+                    return
+                next_item = None
+                batch.append(item)
+                if deadline is None and max_delay is not None:
+                    deadline = loop.time() + max_delay
+            yield batch
+    finally:
+        if next_item is not None:
+            next_item.cancel()
+
+
+class AsyncAligner:
+    """
+    asyncio front end of the aligner of calculate_word_alignments().
+    Untokenized sentence pairs come from an async iterator, and their
+    alignments are yielded in the same order. Tokenization and argmax
+    run in batches in an executor, so the event loop never waits for
+    them. At most max_in_flight batches are in the executor at the same
+    time: the source is not read further until the oldest batch is
+    done and its alignments have been consumed, so a slow consumer
+    slows down the reading instead of filling the memory.
+    """
+
+    def __init__(self, probabilities_filename, tokenizer='nltk',
+                 vectorized=False, workers=1, processes=False,
+                 batch_size=64, max_in_flight=4, max_delay=None):
+        """
+        :param probabilities_filename: binary model or probabilities file
+        :param tokenizer: 'nltk' or 'regex'
+        :param vectorized: bool, see
+            shared_functions.align_sentence_vectorized()
+        :param workers: int, threads or processes of the executor
+        :param processes: bool, when True batches are aligned in a
+            process pool, where every worker loads the model once.
+            Otherwise the model is loaded here and shared by threads,
+            which keeps the event loop free but runs one batch at a time
+            because of the GIL.
+        :param batch_size: int, sentence pairs per executor task
+        :param max_in_flight: int, most batches submitted at once
+        :param max_delay: float, seconds, see iterate_batches()
+        """
+        if max_in_flight < 1 or batch_size < 1:
+            raise ValueError("batch_size and max_in_flight must be at "
+                             "least 1")
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.max_delay = max_delay
+        if processes:
+            self._executor = ProcessPoolExecutor(
+                workers, initializer=_load_worker_model,
+                initargs=(probabilities_filename, vectorized))
+            self._align_chunk = functools.partial(_align_chunk_in_worker,
+                                                  tokenizer)
+        else:
+            self._executor = ThreadPoolExecutor(workers)
+            self._align_chunk = functools.partial(
+                align_untokenized_chunk,
+                load_translation_probabilities(probabilities_filename),
+                align_sentence_vectorized if vectorized else align_sentence,
+                tokenizer)
+
+    async def align(self, sentence_pairs):
+        """
+        :param sentence_pairs: async iterable of tuples
+            (source_sentence, target_sentence) of untokenized str
+        :return: async generator of str, one alignment per sentence
+            pair in the order of sentence_pairs. Example: '1-0 2-3 3-2'
+        """
+        loop = asyncio.get_running_loop()
+        in_flight = collections.deque()
+        try:
+            async for batch in iterate_batches(
+                    sentence_pairs, self.batch_size, self.max_delay):
+                in_flight.append(loop.run_in_executor(
+                    self._executor, self._align_chunk, batch))
+                if len(in_flight) == self.max_in_flight:
+                    for alignment in await in_flight.popleft():
+                        yield alignment
+            while in_flight:
+                for alignment in await in_flight.popleft():
+                    yield alignment
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+    async def align_sentence_pair(self, source_sentence, target_sentence):
+        """
+        Align one sentence pair in the executor.
+        :return: str. Example: '1-0 2-3 3-2'
+        """
+        alignments = await asyncio.get_running_loop().run_in_executor(
+            self._executor, self._align_chunk,
+            [(source_sentence, target_sentence)])
+        return alignments[0]
+
+    async def close(self):
+        """
+        Wait for the submitted batches and stop the executor. The
+        waiting runs in the default executor of the loop, so the event
+        loop goes on meanwhile.
+        """
+        await asyncio.get_running_loop().run_in_executor(
+            None, self._executor.shutdown)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
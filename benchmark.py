@@ -0,0 +1,327 @@
+# -*- coding: utf-8 -*-
+# Modulprojekt CLT
+# Authorin: Sandra Sánchez
+# Datum: 17.10.2026
+
+import argparse
+import contextlib
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+
+PHASES = ['learn', 'align', 'evaluate']
+
+
+def generate_corpus(directory, sentence_pairs=1000, vocabulary_size=5000,
+                    sentence_length=20, gold_sentence_pairs=100, seed=0):
+    """
+    Write a synthetic parallel corpus and a gold standard for it.
+    Source words are drawn from a Zipf distribution. Every source word
+    has one translation, which the target sentence contains with
+    probability 0.9 (otherwise a random target word), plus a target word
+    aligned with NULL now and then. Neighbouring target words are
+    sometimes swapped, so the alignments are not all monotone.
+    The first gold_sentence_pairs pairs are also written in the format
+    of the files in gold_standard/, with their true alignments.
+    :param directory: directory for the files
+    :param sentence_pairs: int, size of the corpus
+    :param vocabulary_size: int, number of words of every language
+    :param sentence_length: int, mean number of source words
+    :param gold_sentence_pairs: int, size of the gold standard
+    :param seed: int, the same seed gives the same files
+    :return: dict with the names of the files
+    """
+    generator = random.Random(seed)
+    words = list(range(vocabulary_size))
+    zipf_weights = list(itertools.accumulate(
+        1 / rank for rank in range(1, vocabulary_size + 1)))
+    translations = words[:]
+    generator.shuffle(translations)
+    filenames = {name: os.path.join(directory, filename) for name, filename
+                 in [('source', 'corpus.src'), ('target', 'corpus.tgt'),
+                     ('gold_alignments', 'gold_alignments.txt'),
+                     ('gold_source', 'gold.src'),
+                     ('gold_target', 'gold.tgt')]}
+    files = {name: open(filename, 'w', encoding='utf-8')
+             for name, filename in filenames.items()}
+    with contextlib.ExitStack() as stack:
+        for file in files.values():
+            stack.enter_context(file)
+        for sentence in range(sentence_pairs):
+            length = max(1, round(generator.gauss(
+                sentence_length, sentence_length / 3)))
+            source = generator.choices(words, cum_weights=zipf_weights,
+                                       k=length)
+            target = []
+            for source_position, word in enumerate(source, 1):
+                if generator.random() < 0.9:
+                    target.append((f"t{translations[word]}", source_position))
+                else:
+                    target.append((f"t{generator.randrange(vocabulary_size)}",
+                                   source_position))
+                if generator.random() < 0.05:
+                    target.append(("tnull", 0))
+            for position in range(len(target) - 1):
+                if generator.random() < 0.1:
+                    target[position], target[position + 1] = \
+                        target[position + 1], target[position]
+            source_sentence = ' '.join(f"s{word}" for word in source)
+            target_sentence = ' '.join(word for word, _ in target)
+            files['source'].write(source_sentence + '\n')
+            files['target'].write(target_sentence + '\n')
+            if sentence < gold_sentence_pairs:
+                files['gold_source'].write(
+                    f"<s snum={sentence + 1}> {source_sentence} </s>\n")
+                files['gold_target'].write(
+                    f"<s snum={sentence + 1}> {target_sentence} </s>\n")
+                for target_position, (_, source_position) \
+                        in enumerate(target, 1):
+                    if source_position:
+                        files['gold_alignments'].write(
+                            f"{sentence + 1} {source_position} "
+                            f"{target_position} S\n")
+    return filenames
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    if sys.platform == 'darwin':
+        return peak / 1024 ** 2
+    return peak / 1024
+
+
+def run_phase(phase, arguments):
+    """
+    Run one phase of the pipeline in this process and measure it.
+    :param phase: 'learn', 'align' or 'evaluate'
+    :param arguments: dict of keyword arguments of the phase function
+    :return: dict with the wall time and the peak RSS of the process
+    """
+    with open(os.devnull, 'w') as devnull, \
+            contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        if phase == 'learn':
+            from learn_alignments import learn_alignments
+            learn_alignments(**arguments)
+        elif phase == 'align':
+            from align_words import align_words
+            align_words(**arguments)
+        else:
+            from evaluate import evaluate
+            scores = evaluate(**arguments)
+        wall_seconds = time.perf_counter() - start
+    result = {'wall_seconds': wall_seconds, 'peak_rss_mb': peak_rss_mb()}
+    if phase == 'evaluate':
+        result['recall'], result['precision'], result['aer'] = scores
+    return result
+
+
+def _child_main(connection, phase, arguments):
+    """Entry point of the process that runs one phase."""
+    try:
+        connection.send(run_phase(phase, arguments))
+    except BaseException as error:
+        connection.send(error)
+        raise
+    finally:
+        connection.close()
+
+
+def run_phase_in_child(phase, arguments):
+    """
+    Run a phase in a fresh process, so that its peak RSS is not mixed up
+    with the other phases or with the corpus generation.
+    :return: dict, see run_phase()
+    """
+    context = multiprocessing.get_context('spawn')
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_child_main,
+                              args=(sender, phase, arguments))
+    process.start()
+    sender.close()
+    try:
+        result = receiver.recv()
+    except EOFError:
+        result = RuntimeError(f"The {phase} phase exited with code "
+                              f"{process.exitcode}")
+    process.join()
+    if isinstance(result, BaseException):
+        raise result
+    return result
+
+
+def run_benchmark(directory, sentence_pairs=1000, vocabulary_size=5000,
+                  sentence_length=20, gold_sentence_pairs=100,
+                  engine='numpy', max_iterations=3, workers=1,
+                  align_workers=1, tokenizer='regex', seed=0):
+    """
+    Run the three phases on a synthetic corpus, see generate_corpus().
+    Phase 1 trains on the whole corpus.
+    :param directory: directory for the corpus and the phase outputs
+    :param engine: EM engine, see learn_alignments.py
+    :param max_iterations: int, EM iterations
+    :param workers: int, processes of the E-step
+    :param align_workers: int, processes of phase 2
+    :param tokenizer: 'nltk' or 'regex'
+    :return: dict that can be serialised as JSON
+    """
+    configuration = {
+        'sentence_pairs': sentence_pairs, 'vocabulary_size': vocabulary_size,
+        'sentence_length': sentence_length,
+        'gold_sentence_pairs': gold_sentence_pairs, 'engine': engine,
+        'max_iterations': max_iterations, 'workers': workers,
+        'align_workers': align_workers, 'tokenizer': tokenizer,
+        'seed': seed,
+    }
+    filenames = generate_corpus(directory, sentence_pairs, vocabulary_size,
+                                sentence_length, gold_sentence_pairs, seed)
+    model_filename = os.path.join(directory, 'model.bin')
+    pairs_filename = os.path.join(directory, 'sentence_pairs.txt')
+    training_log = os.path.join(directory, 'training_log.jsonl')
+    phases = {}
+    phases['learn'] = run_phase_in_child('learn', {
+        'source_language': filenames['source'],
+        'target_language': filenames['target'],
+        'model_probabilities_filename': model_filename,
+        'pairs_filename': pairs_filename, 'engine': engine,
+        'workers': workers, 'binary_model': True, 'tokenizer': tokenizer,
+        'max_iterations': max_iterations, 'training_log': training_log,
+        'max_sentence_pairs': None,
+    })
+    with open(training_log, encoding='utf-8') as file:
+        phases['learn']['em_iterations'] = [
+            {key: record[key] for key in
+             ('iteration', 'e_step_seconds', 'm_step_seconds',
+              'log_likelihood')}
+            for record in map(json.loads, file)]
+    phases['align'] = run_phase_in_child('align', {
+        'modelled_probabilities': model_filename,
+        'calculated_alignments_filename':
+            os.path.join(directory, 'alignments.txt'),
+        'sentence_pairs_filename': pairs_filename,
+        'workers': align_workers,
+    })
+    phases['evaluate'] = run_phase_in_child('evaluate', {
+        'gold_alignments_filename': filenames['gold_alignments'],
+        'gold_source_sentences_filename':
+            os.path.abspath(filenames['gold_source']),
+        'gold_target_sentences_filename':
+            os.path.abspath(filenames['gold_target']),
+        'probabilities_filename': model_filename,
+        'golden_sents_calculated_alignments_filename':
+            os.path.join(directory, 'gold_alignments_calculated.txt'),
+        'tokenizer': tokenizer,
+    })
+    processed = {'learn': sentence_pairs, 'align': sentence_pairs,
+                 'evaluate': min(gold_sentence_pairs, sentence_pairs)}
+    for phase, result in phases.items():
+        result['sentences_per_second'] = \
+            processed[phase] / result['wall_seconds']
+    return {
+        'configuration': configuration,
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'phases': phases,
+    }
+
+
+def compare_with_baseline(results, baseline, tolerance=0.1):
+    """
+    Compare the wall time and the peak RSS of every phase with a
+    baseline from an earlier run.
+    :param results: dict returned by run_benchmark()
+    :param baseline: dict returned by run_benchmark()
+    :param tolerance: float, a phase regresses when it is more than this
+        fraction slower or bigger than in the baseline
+    :return: dict with the ratios current / baseline of every phase and
+        the list of regressions
+    """
+    if results['configuration'] != baseline['configuration']:
+        print("Warning: the baseline was measured with another "
+              "configuration", file=sys.stderr)
+    comparison = {'phases': {}, 'regressions': []}
+    for phase in PHASES:
+        if phase not in baseline['phases']:
+            continue
+        ratios = {}
+        for measure in ('wall_seconds', 'peak_rss_mb'):
+            ratios[measure] = results['phases'][phase][measure] \
+                / baseline['phases'][phase][measure]
+            if ratios[measure] > 1 + tolerance:
+                comparison['regressions'].append(f"{phase} {measure}")
+        comparison['phases'][phase] = ratios
+    return comparison
+
+
+def parse_arguments(arguments):
+    """Parse the command line arguments of the benchmark."""
+    parser = argparse.ArgumentParser(
+        description="Benchmark the three phases on a synthetic corpus.")
+    parser.add_argument('--sentence-pairs', type=int, default=1000)
+    parser.add_argument('--vocabulary-size', type=int, default=5000)
+    parser.add_argument('--sentence-length', type=int, default=20,
+                        help="mean number of source words")
+    parser.add_argument('--gold-sentence-pairs', type=int, default=100)
+    parser.add_argument('--engine',
+                        choices=['dense', 'sparse', 'numpy', 'bucketed'],
+                        default='numpy')
+    parser.add_argument('--max-iterations', type=int, default=3)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--align-workers', type=int, default=1)
+    parser.add_argument('--tokenizer', choices=['nltk', 'regex'],
+                        default='regex')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument(
+        '--directory',
+        help="keep the corpus and the outputs in this directory instead "
+             "of a temporary one")
+    parser.add_argument('--output', help="write the results to this file")
+    parser.add_argument(
+        '--baseline',
+        help="compare with the results of an earlier run in this file")
+    parser.add_argument(
+        '--tolerance', type=float, default=0.1,
+        help="allowed slowdown or memory growth against the baseline")
+    return parser.parse_args(arguments)
+
+
+def main(arguments):
+    """Run the benchmark, return 1 if it regressed against the baseline."""
+    args = parse_arguments(arguments)
+    with tempfile.TemporaryDirectory() as temporary_directory:
+        directory = args.directory or temporary_directory
+        os.makedirs(directory, exist_ok=True)
+        results = run_benchmark(
+            directory, args.sentence_pairs, args.vocabulary_size,
+            args.sentence_length, args.gold_sentence_pairs, args.engine,
+            args.max_iterations, args.workers, args.align_workers,
+            args.tokenizer, args.seed)
+    if args.baseline is not None:
+        with open(args.baseline, encoding='utf-8') as file:
+            results['baseline_comparison'] = compare_with_baseline(
+                results, json.load(file), args.tolerance)
+    output = json.dumps(results, indent=2)
+    if args.output is not None:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(output + '\n')
+    print(output)
+    if args.baseline is not None \
+            and results['baseline_comparison']['regressions']:
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
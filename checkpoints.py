@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+# Modulprojekt CLT
+# Authorin: Sandra Sánchez
+# Datum: 17.10.2026
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from translation_table import TranslationTable, save_translation_table
+
+
+class CheckpointWriter:
+    """
+    Save EM checkpoints in the binary model format from a background
+    thread, so the training loop only waits for the previous checkpoint
+    to be on disk before it hands over the next one.
+    Every checkpoint replaces the previous one atomically, see
+    translation_table.save_translation_table().
+    Use it as a context manager so the last checkpoint is finished.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._pending = None
+
+    def save(self, get_probabilities, metadata):
+        """
+        Schedule a checkpoint.
+        :param get_probabilities: function without arguments that returns
+            the dict of probabilities. It runs in the background thread,
+            so it must not read anything the training loop changes.
+        :param metadata: dict, at least {'iteration': int}
+        :return: None
+        """
+        self.wait()
+        self._pending = self._executor.submit(
+            self._write, get_probabilities, metadata)
+
+    def _write(self, get_probabilities, metadata):
+        save_translation_table(get_probabilities(), self.filename,
+                               metadata=metadata)
+
+    def wait(self):
+        """Block until the scheduled checkpoint is written."""
+        if self._pending is not None:
+            pending, self._pending = self._pending, None
+            pending.result()
+
+    def close(self):
+        """Finish the last checkpoint and stop the thread."""
+        try:
+            self.wait()
+        finally:
+            self._executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def load_checkpoint(filename):
+    """
+    Read a checkpoint written by CheckpointWriter.
+    :param filename: file
+    :return: tuple (probabilities, metadata) with a dict of items
+        (s_w, t_w) : float and the metadata dict, or None if the
+        file does not exist
+    """
+    if not os.path.exists(filename):
+        return None
+    with TranslationTable(filename) as table:
+        probabilities = table.to_dict()
+        return probabilities, table.metadata
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+# Modulprojekt CLT
+# Authorin: Sandra Sánchez
+# Datum: 17.10.2026
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+from array import array
+from importlib.metadata import version, PackageNotFoundError
+
+MAGIC = b'IBM1TOK\x01'
+# magic, number of sentences, number of tokens, bytes of the vocabulary
+HEADER = struct.Struct('<8sQQQ')
+
+
+def file_hash(filename, block_size=1024 * 1024):
+    """Return the sha256 hex digest of the content of a file."""
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as file:
+        for block in iter(lambda: file.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def tokenizer_version():
+    """Version of the package behind the tokenizer, part of the cache key."""
+    try:
+        return version('nltk')
+    except PackageNotFoundError:
+        return None
+
+
+def cache_filename(filename, settings, cache_dir):
+    """
+    Get the cache file of a tokenized corpus.
+    The name depends on the content of the corpus file and on the
+    tokenizer settings, so changing either of them gives a new cache file.
+    :param filename: corpus file
+    :param settings: dict that describes how the corpus is tokenized
+    :param cache_dir: directory of the cache files
+    :return: str
+    """
+    key = json.dumps({'corpus': file_hash(filename),
+                      'tokenizer_version': tokenizer_version(),
+                      **settings}, sort_keys=True)
+    name = hashlib.sha256(key.encode('utf-8')).hexdigest()
+    return os.path.join(cache_dir, f"{name}.tok")
+
+
+def write_tokenized_corpus(sentences, filename):
+    """
+    Save tokenized sentences as integer ids into a cache file.
+    The file is written under a temporary name and renamed at the end,
+    so an interrupted run never leaves a broken cache file behind.
+    Layout: header, vocabulary, uint64 sentence offsets, uint32 token ids.
+    :param sentences: iterable of lists of str
+    :param filename: file
+    :return: None
+    """
+    vocabulary = {}
+    token_ids = array('I')
+    offsets = array('Q', [0])
+    for sentence in sentences:
+        token_ids.extend(vocabulary.setdefault(token, len(vocabulary))
+                         for token in sentence)
+        offsets.append(len(token_ids))
+    vocabulary_bytes = '\n'.join(vocabulary).encode('utf-8')
+    padding = -(HEADER.size + len(vocabulary_bytes)) % 8
+    temporary_filename = f"{filename}.{os.getpid()}.tmp"
+    with open(temporary_filename, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, len(offsets) - 1, len(token_ids),
+                               len(vocabulary_bytes)))
+        file.write(vocabulary_bytes)
+        file.write(b'\x00' * padding)
+        offsets.tofile(file)
+        token_ids.tofile(file)
+    os.replace(temporary_filename, filename)
+
+
+def read_tokenized_corpus(filename):
+    """
+    Read the sentences of a cache file one by one.
+    :param filename: file written by write_tokenized_corpus()
+    :return: generator of lists of str
+    """
+    with open(filename, 'rb') as file, \
+            mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        magic, number_sentences, number_tokens, vocabulary_bytes = \
+            HEADER.unpack_from(buffer)
+        if magic != MAGIC:
+            raise ValueError(f"{filename} is not a tokenized corpus")
+        position = HEADER.size
+        vocabulary = buffer[position:position + vocabulary_bytes] \
+            .decode('utf-8').split('\n')
+        position += vocabulary_bytes
+        position += -position % 8
+        view = memoryview(buffer)
+        offsets = view[position:position + 8 * (number_sentences + 1)] \
+            .cast('Q')
+        position += 8 * (number_sentences + 1)
+        token_ids = view[position:position + 4 * number_tokens].cast('I')
+        try:
+            for sentence in range(number_sentences):
+                sentence_ids = token_ids[offsets[sentence]:
+                                         offsets[sentence + 1]]
+                tokens = [vocabulary[token_id] for token_id in sentence_ids]
+                sentence_ids.release()
+                yield tokens
+        finally:
+            token_ids.release()
+            offsets.release()
+            view.release()
+
+
+def cached_tokenization(filename, read_sentences, tokenize_sentences,
+                        settings, cache_dir):
+    """
+    Tokenize a corpus file, or read its tokens from the cache.
+    The first time a file is seen all its sentences are tokenized and
+    cached. Later runs with the same file content and the same settings
+    read the cache and skip tokenization.
+    :param filename: corpus file
+    :param read_sentences: function that yields the str sentences of
+        the file
+    :param tokenize_sentences: function that turns an iterable of str
+        sentences into an iterable of lists of tokens, in the same order
+    :param settings: dict that describes read_sentences and
+        tokenize_sentences
+    :param cache_dir: directory of the cache files
+    :return: generator of lists of str
+    """
+    cache_file = cache_filename(filename, settings, cache_dir)
+    if not os.path.exists(cache_file):
+        os.makedirs(cache_dir, exist_ok=True)
+        write_tokenized_corpus(
+            tokenize_sentences(read_sentences(filename)), cache_file)
+    return read_tokenized_corpus(cache_file)
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+# Modulprojekt CLT
+# Authorin: Sandra Sánchez
+# Datum: 17.10.2026
+
+import bisect
+import itertools
+import math
+import random
+
+SAMPLING_METHODS = ['head', 'random', 'stratified']
+
+# Upper bounds of the source length strata of stratified_sample(),
+# the last stratum has every longer sentence
+LENGTH_STRATA = (10, 20, 30, 40, 60)
+
+
+def count_words(sentence):
+    """Length of an untokenized sentence in whitespace-separated words."""
+    return len(sentence.split())
+
+
+def filter_sentence_pairs(sentence_pairs, max_length=None,
+                          max_length_ratio=None, length=len):
+    """
+    Drop the sentence pairs that make EM slow without helping it.
+    An E-step costs |source| * |target| per sentence pair, so a few
+    very long sentences dominate an iteration, and pairs of very
+    different lengths are usually misaligned sentences.
+    :param sentence_pairs: iterable of tuples (source, target)
+    :param max_length: int, drop the pairs with a longer sentence
+    :param max_length_ratio: float, drop the pairs whose longer sentence
+        is more than this many times as long as the shorter one. Pairs
+        with an empty sentence are dropped as well.
+    :param length: function that gives the length of a sentence,
+        count_words() for untokenized sentences
+    :return: generator of the kept sentence pairs
+    """
+    for sentence_pair in sentence_pairs:
+        source_length = length(sentence_pair[0])
+        target_length = length(sentence_pair[1])
+        if max_length is not None \
+                and max(source_length, target_length) > max_length:
+            continue
+        if max_length_ratio is not None and (
+                min(source_length, target_length) == 0
+                or max(source_length, target_length)
+                > max_length_ratio * min(source_length, target_length)):
+            continue
+        yield sentence_pair
+
+
+def reservoir_sample(items, sample_size, seed=0):
+    """
+    Draw a uniform random sample in one pass over a stream of unknown
+    length, holding only sample_size items (Li's algorithm L).
+    Instead of a random number per item, the number of items to skip
+    until the next replacement is drawn from its distribution.
+    :param items: iterable
+    :param sample_size: int
+    :param seed: int, the same seed gives the same sample
+    :return: list of the sampled items in their original order
+    """
+    generator = random.Random(seed)
+    iterator = iter(items)
+    reservoir = list(enumerate(itertools.islice(iterator, sample_size)))
+    if len(reservoir) < sample_size or sample_size == 0:
+        return [item for _, item in reservoir]
+    # 1 - random() is in (0, 1], so its logarithm is finite
+    weight = math.exp(math.log(1 - generator.random()) / sample_size)
+    next_index = sample_size + _skip(generator, weight)
+    for index, item in enumerate(iterator, sample_size):
+        if index == next_index:
+            reservoir[generator.randrange(sample_size)] = (index, item)
+            weight *= math.exp(math.log(1 - generator.random())
+                               / sample_size)
+            next_index += _skip(generator, weight) + 1
+    reservoir.sort(key=lambda indexed_item: indexed_item[0])
+    return [item for _, item in reservoir]
+
+
+def _skip(generator, weight):
+    """Number of items algorithm L passes over before the next one."""
+    if weight >= 1.0:
+        return 0
+    if weight <= 0.0:
+        return math.inf
+    return math.floor(math.log(1 - generator.random())
+                      / math.log1p(-weight))
+
+
+def stratified_sample(sentence_pairs, sample_size, seed=0, length=len,
+                      strata=LENGTH_STRATA):
+    """
+    Draw a random sample in one pass that keeps the distribution of the
+    source sentence lengths of the corpus.
+    Every length stratum keeps a reservoir of sample_size pairs. At the
+    end every stratum contributes in proportion to its size, so
+    short and long sentences are represented as in the whole corpus
+    and not only on average.
+    :param sentence_pairs: iterable of tuples (source, target)
+    :param sample_size: int
+    :param seed: int, the same seed gives the same sample
+    :param length: function that gives the length of a sentence
+    :param strata: sorted tuple of int, the upper bounds of the strata
+    :return: list of the sampled sentence pairs in their original order
+    """
+    generator = random.Random(seed)
+    reservoirs = [[] for _ in range(len(strata) + 1)]
+    counts = [0] * (len(strata) + 1)
+    for index, sentence_pair in enumerate(sentence_pairs):
+        stratum = bisect.bisect_left(strata, length(sentence_pair[0]))
+        counts[stratum] += 1
+        reservoir = reservoirs[stratum]
+        if len(reservoir) < sample_size:
+            reservoir.append((index, sentence_pair))
+        else:
+            position = generator.randrange(counts[stratum])
+            if position < sample_size:
+                reservoir[position] = (index, sentence_pair)
+    sample = []
+    for reservoir, quota in zip(
+            reservoirs, _proportional_quotas(counts, sample_size)):
+        sample.extend(generator.sample(reservoir, quota))
+    sample.sort(key=lambda indexed_item: indexed_item[0])
+    return [sentence_pair for _, sentence_pair in sample]
+
+
+def _proportional_quotas(counts, sample_size):
+    """
+    Split sample_size over the strata in proportion to their counts,
+    rounding by the largest remainders.
+    :return: list of int, never more than the count of a stratum
+    """
+    number_items = sum(counts)
+    if number_items <= sample_size:
+        return counts
+    shares = [count * sample_size / number_items for count in counts]
+    quotas = [math.floor(share) for share in shares]
+    by_remainder = sorted(range(len(counts)),
+                          key=lambda stratum: quotas[stratum]
+                          - shares[stratum])
+    for stratum in by_remainder[:sample_size - sum(quotas)]:
+        quotas[stratum] += 1
+    return quotas
+
+
+def sample_sentence_pairs(sentence_pairs, sample_size, method='head',
+                          seed=0, length=len):
+    """
+    Select sample_size sentence pairs of a stream.
+    :param sentence_pairs: iterable of tuples (source, target)
+    :param sample_size: int
+    :param method: 'head' takes the first pairs and stops reading,
+        'random' draws a uniform sample, see reservoir_sample(),
+        'stratified' keeps the length distribution, see
+        stratified_sample()
+    :param seed: int, seed of the random methods
+    :param length: function that gives the length of a sentence
+    :return: iterable of the selected sentence pairs
+    """
+    if method == 'head':
+        return itertools.islice(sentence_pairs, sample_size)
+    if method == 'random':
+        return reservoir_sample(sentence_pairs, sample_size, seed)
+    if method == 'stratified':
+        return stratified_sample(sentence_pairs, sample_size, seed, length)
+    raise ValueError(f"Unknown sampling method '{method}'")
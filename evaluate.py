@@ -4,13 +4,21 @@
 # Datum: 07.04.2022
 
 
+import argparse
+import collections
+import functools
+import itertools
 import sys
+from typing import NamedTuple
 
 import os
 
+from corpus_cache import cached_tokenization
 from shared_functions \
-    import read_lines_from_file, clean_corpus_leave_punctuation, \
-    get_sentence_pairs, calculate_word_alignments, save_data
+    import iterate_lines_from_file, iterate_tokenized_sentences, \
+    tokenizer_settings, iterate_word_alignments, read_alignments, \
+    write_alignments_lazily, download_tokenizer_models, align_sentence, \
+    align_sentence_vectorized
 
 
 def tokenise_already_preprocessed_corpus(preprocessed_corpus):
@@ -38,25 +46,71 @@ def load_data(filename):
     return words
 
 
-def read_and_preprocess_gold_sentences(gold_sentences_file):
-    """Read file with golden sentences and tokenise them."""
+def read_and_preprocess_gold_sentences(gold_sentences_file, cache_dir=None,
+                                       tokenizer='nltk'):
+    """
+    Read file with golden sentences and tokenise them.
+    :param gold_sentences_file: file in the gold_standard folder
+    :param cache_dir: directory of the tokenization cache, no cache if None
+    :param tokenizer: 'nltk' or 'regex', see
+        shared_functions.tokenize_not_remove_punctuation()
+    :return: list of lists of str
+    """
+    return list(iterate_preprocessed_gold_sentences(
+        gold_sentences_file, cache_dir, tokenizer))
+
+
+def iterate_preprocessed_gold_sentences(gold_sentences_file, cache_dir=None,
+                                        tokenizer='nltk', append_null=False):
+    """
+    Lazy version of read_and_preprocess_gold_sentences().
+    :param append_null: bool, start every sentence with 'NULL' like the
+        source sentences of phase 1 and 2
+    :return: generator of lists of str
+    """
     foldername = os.path.dirname(gold_sentences_file)
     full_path = os.path.join('../gold_standard/',
                              foldername, gold_sentences_file)
+    if cache_dir is not None:
+        return cached_tokenization(
+            full_path, iterate_gold_sentences,
+            functools.partial(iterate_tokenized_sentences,
+                              append_null=append_null, tokenizer=tokenizer),
+            tokenizer_settings('gold_sentences', append_null=append_null,
+                               tokenizer=tokenizer),
+            cache_dir)
+    return iterate_tokenized_sentences(iterate_gold_sentences(full_path),
+                                       append_null=append_null,
+                                       tokenizer=tokenizer)
+
+
+def read_gold_sentences(full_path):
+    """
+    Read file with golden sentences of the form
+    '<s snum=1> resumption of the session </s>'.
+    :param full_path: file
+    :return: list of str. Example: ['resumption of the session']
+    """
+    return list(iterate_gold_sentences(full_path))
+
+
+def iterate_gold_sentences(full_path):
+    """
+    Lazy version of read_gold_sentences(). A sentence may span several
+    lines, it ends with '</s>'.
+    :param full_path: file
+    :return: generator of str
+    """
     with open(full_path, encoding='utf-8') as file:
-        text = file.read()  # Text as string
-    text = text.strip().split('</s>')  # Split into sentences
-    all_sents = []
-    for sentence in text:
-        if sentence == '':  # Delete empty lines
-            pass
-        else:
-            sentence = sentence.split()
-            sentence = sentence[2:]
-            sentence = ' '.join(sentence)
-            all_sents.append(sentence)
-    clean_sents = clean_corpus_leave_punctuation(all_sents)
-    return clean_sents
+        text = ''
+        for line in file:
+            text = (text + line).lstrip() if not text else text + line
+            *sentences, text = text.split('</s>')
+            for sentence in sentences:
+                if sentence != '':  # Delete empty lines
+                    yield ' '.join(sentence.split()[2:])
+        if text.strip():
+            yield ' '.join(text.split()[2:])
 
 
 def get_gold_alignments(lines):
@@ -85,6 +139,216 @@ def get_gold_alignments(lines):
     return lists
 
 
+def iterate_gold_alignment_sets(lines):
+    """
+    Convert the gold alignments of every sentence into sets of integer
+    (source_position, target_position) pairs, sentence by sentence, so
+    that a gold standard of any size is read once and never held in
+    memory as a whole.
+    The lines must be grouped by sentence number, like in
+    goldstandard_en_es.txt. Sentences without any line get empty sets.
+    :param lines: iterable of str
+        Example: '1 2 2 S', '1 1 1 S', '2 6 5 P', '2 5 4 S'
+    :return: generator of tuples (sure, possible) of sets of tuples of
+        int, one per sentence starting with sentence 1. Every sure
+        alignment is also possible.
+        Example: ({(2, 2), (1, 1)}, {(2, 2), (1, 1)}),
+        ({(5, 4)}, {(6, 5), (5, 4)})
+    """
+    next_sentence = 1
+    fields = (line.split() for line in lines if line.strip())
+    for sentence, sentence_fields in itertools.groupby(
+            fields, key=lambda line_fields: int(line_fields[0])):
+        for _ in range(next_sentence, sentence):
+            yield set(), set()
+        sure = set()
+        possible = set()
+        for _, source_position, target_position, annotation \
+                in sentence_fields:
+            alignment = (int(source_position), int(target_position))
+            possible.add(alignment)
+            if annotation == 'S':
+                sure.add(alignment)
+        yield sure, possible
+        next_sentence = sentence + 1
+
+
+def add_null_alignments(sure, possible, target_length):
+    """
+    Set version of add_missing_null_alignments_to_goldstandard():
+    align every target position without any gold alignment with 'NULL'.
+    :param sure: set of tuples (source_position, target_position)
+    :param possible: set of tuples, updated in place like sure
+    :param target_length: int
+    :return: None
+    """
+    aligned_targets = {target for _, target in possible}
+    for target in range(1, target_length + 1):
+        if target not in aligned_targets:
+            sure.add((0, target))
+            possible.add((0, target))
+
+
+def parse_calculated_alignments(sentence_alignments):
+    """
+    Read the alignments of one sentence as written by phase 2.
+    :param sentence_alignments: str of 'target_position-source_position'
+        pairs. Example: '1-0 2-3 3-2'
+    :return: list of tuples (source_position, target_position) of int,
+        one per target position. Example: [(0, 1), (3, 2), (2, 3)]
+    """
+    alignments = []
+    for alignment in sentence_alignments.split():
+        target_position, source_position = alignment.split('-')
+        alignments.append((int(source_position), int(target_position)))
+    return alignments
+
+
+class AlignmentCounts(NamedTuple):
+    """
+    The four counts that recall, precision and AER are made of.
+    A is the set of calculated alignments, S the sure and P the
+    possible gold alignments.
+    """
+    sure_matches: int = 0  # |A ∩ S|
+    possible_matches: int = 0  # |A ∩ P|
+    calculated: int = 0  # |A|
+    sure: int = 0  # |S|
+
+    def combine(self, other):
+        """Add up the counts of two sets of sentences."""
+        return AlignmentCounts(*map(sum, zip(self, other)))
+
+    def recall(self):
+        """|A ∩ S| / |S|"""
+        return self.sure_matches / self.sure
+
+    def precision(self):
+        """|A ∩ P| / |A|"""
+        return self.possible_matches / self.calculated
+
+    def alignment_error_rate(self):
+        """1 - (|A ∩ S| + |A ∩ P|) / (|A| + |S|)"""
+        return 1 - (self.sure_matches + self.possible_matches) \
+            / (self.calculated + self.sure)
+
+
+def score_sentence(sure, possible, calculated_alignments):
+    """
+    Count the matches of one sentence, see AlignmentCounts.
+    :param sure: set of tuples (source_position, target_position)
+    :param possible: set of tuples, a superset of sure
+    :param calculated_alignments: list of tuples, see
+        parse_calculated_alignments()
+    :return: AlignmentCounts
+    """
+    sure_matches = 0
+    possible_matches = 0
+    for alignment in calculated_alignments:
+        if alignment in possible:
+            possible_matches += 1
+            if alignment in sure:
+                sure_matches += 1
+    return AlignmentCounts(sure_matches, possible_matches,
+                           len(calculated_alignments), len(sure))
+
+
+def score_alignments(gold_alignment_sets, calculated_alignments):
+    """
+    Count the matches of all sentences in one pass over both streams.
+    Target positions without gold alignment are aligned with 'NULL',
+    the target length is the number of calculated alignments, since
+    phase 2 aligns every target position.
+    :param gold_alignment_sets: iterable of tuples (sure, possible),
+        see iterate_gold_alignment_sets()
+    :param calculated_alignments: iterable of str, one per sentence.
+        Example: '1-0 2-3 3-2'
+    :return: AlignmentCounts of the sentences of both streams
+    """
+    sure_matches = possible_matches = calculated = sure_total = 0
+    for sentence_alignments, (sure, possible) in zip(
+            calculated_alignments, gold_alignment_sets):
+        alignments = parse_calculated_alignments(sentence_alignments)
+        add_null_alignments(sure, possible, len(alignments))
+        counts = score_sentence(sure, possible, alignments)
+        sure_matches += counts.sure_matches
+        possible_matches += counts.possible_matches
+        calculated += counts.calculated
+        sure_total += counts.sure
+    return AlignmentCounts(sure_matches, possible_matches, calculated,
+                           sure_total)
+
+
+def evaluate_alignments_file(gold_alignments_filename,
+                             calculated_alignments_filename):
+    """
+    Streaming mode: score an alignments file written by phase 2 against
+    the gold standard without loading either of them.
+    :param gold_alignments_filename: file with alignments and
+        annotations, see iterate_gold_alignment_sets()
+    :param calculated_alignments_filename: file with one sentence of
+        calculated alignments per line
+    :return: AlignmentCounts
+    """
+    return score_alignments(
+        iterate_gold_alignment_sets(
+            iterate_lines_from_file(gold_alignments_filename)),
+        read_alignments(calculated_alignments_filename))
+
+
+def make_gold_evaluation_callback(gold_alignments_filename,
+                                  gold_source_sentences_filename,
+                                  gold_target_sentences_filename,
+                                  cache_dir=None, tokenizer='nltk'):
+    """
+    Read and tokenize the gold standard once, for
+    learn_alignments.expectation_maximization_algorithm(), which calls
+    the callback after every iteration. The golden sentences are
+    aligned with the probabilities in memory, so a training run gives
+    the learning curve without writing or reading any model file.
+    :param gold_alignments_filename: file with alignments and annotations
+    :param gold_source_sentences_filename: file with golden sentences of
+        source language
+    :param gold_target_sentences_filename: file with golden sentences of
+        target language
+    :param cache_dir: directory of the tokenization cache
+    :param tokenizer: 'nltk' or 'regex'
+    :return: function that takes the probabilities of an iteration, as
+        a dict or mapping with items of the form (s_w, t_w) : float, and
+        returns a dict with the recall, precision and AER of the
+        golden sentences
+    """
+    gold_sentence_pairs = list(zip(
+        iterate_preprocessed_gold_sentences(
+            gold_source_sentences_filename, cache_dir, tokenizer,
+            append_null=True),
+        iterate_preprocessed_gold_sentences(
+            gold_target_sentences_filename, cache_dir, tokenizer)))
+    gold_alignment_sets = list(itertools.islice(
+        iterate_gold_alignment_sets(
+            iterate_lines_from_file(gold_alignments_filename)),
+        len(gold_sentence_pairs)))
+    for (sure, possible), (_, target_sentence) in zip(
+            gold_alignment_sets, gold_sentence_pairs):
+        add_null_alignments(sure, possible, len(target_sentence))
+
+    def evaluate_probabilities(translation_probabilities):
+        # Mappings other than dicts find the pairs of a sentence at once
+        align = align_sentence \
+            if isinstance(translation_probabilities, dict) \
+            else align_sentence_vectorized
+        counts = score_alignments(
+            gold_alignment_sets,
+            (align(translation_probabilities, source_sentence,
+                   target_sentence)
+             for source_sentence, target_sentence in gold_sentence_pairs))
+        return {'recall': counts.recall(),
+                'precision': counts.precision(),
+                'aer': counts.alignment_error_rate()}
+
+    return evaluate_probabilities
+
+
 def add_missing_null_alignments_to_goldstandard(
         gold_sentences_alignments,
         target_sentences_lengths):
@@ -197,7 +461,7 @@ def reverse_indexes(alignments_list):
         reversed_sentence = []
         for word_alignment in sentence_alignment:  # ['1-0', '2-3', '3-2']
             alignment = word_alignment.split('-')  # ['1', '0']
-            reversed_alignment = alignment[1] + '-' + word_alignment[0]
+            reversed_alignment = alignment[1] + '-' + alignment[0]
             reversed_sentence.append(reversed_alignment)
         reversed_sentences.append(reversed_sentence)
     return reversed_sentences
@@ -279,7 +543,9 @@ def evaluate(
         gold_source_sentences_filename: str,
         gold_target_sentences_filename,
         probabilities_filename: str,
-        golden_sents_calculated_alignments_filename: str
+        golden_sents_calculated_alignments_filename: str,
+        cache_dir: str = None,
+        tokenizer: str = 'nltk'
 ):
     """
     Use trained model to get word alignments from
@@ -296,53 +562,75 @@ def evaluate(
         probabilities.
     :param golden_sents_calculated_alignments_filename:
         file with calculated alignments
+    :param cache_dir: directory of the tokenization cache, see
+        corpus_cache.py. The golden sentences are tokenized again in
+        every run if None.
+    :param tokenizer: 'nltk' or 'regex', see
+        shared_functions.tokenize_not_remove_punctuation()
     :return: recall, precision and AER values.
     """
     print("________________PHASE 3: EVALUATE_____________________")
-    gold_lines = read_lines_from_file(gold_alignments_filename)
-    gold_alignments = get_gold_alignments(gold_lines)
-    gold_clean_sents_en = read_and_preprocess_gold_sentences(
-        gold_source_sentences_filename)
-    gold_clean_sents_es = read_and_preprocess_gold_sentences(
-        gold_target_sentences_filename)
-    gold_sentence_pairs = get_sentence_pairs(
-        gold_clean_sents_en, gold_clean_sents_es)
-    target_sentences_lengths = get_sentences_lengths(gold_clean_sents_es)
-    complete_gold_alignments = add_missing_null_alignments_to_goldstandard(
-        gold_alignments, target_sentences_lengths)
-    golden_calculated_sentences_alignments = calculate_word_alignments(
-        probabilities_filename, gold_sentence_pairs)
-    save_data(golden_calculated_sentences_alignments,
-              golden_sents_calculated_alignments_filename)
-    loaded_golden_calculated_sentences_alignments = load_data(
+    gold_alignment_sets = iterate_gold_alignment_sets(
+        iterate_lines_from_file(gold_alignments_filename))
+    # Position 0 of the calculated alignments is 'NULL', so the source
+    # sentences need it like in phase 2
+    gold_sentence_pairs = zip(
+        iterate_preprocessed_gold_sentences(
+            gold_source_sentences_filename, cache_dir, tokenizer,
+            append_null=True),
+        iterate_preprocessed_gold_sentences(
+            gold_target_sentences_filename, cache_dir, tokenizer))
+    golden_calculated_sentences_alignments = write_alignments_lazily(
+        iterate_word_alignments(probabilities_filename, gold_sentence_pairs),
         golden_sents_calculated_alignments_filename)
-    tokenised_alignments = tokenise_already_preprocessed_corpus(
-        loaded_golden_calculated_sentences_alignments)
-    reversed_alignments = reverse_indexes(tokenised_alignments)
-    recall_value = recall(complete_gold_alignments, reversed_alignments)
+    counts = score_alignments(gold_alignment_sets,
+                              golden_calculated_sentences_alignments)
+    # Sentences without gold alignments are still written into the file
+    collections.deque(golden_calculated_sentences_alignments, maxlen=0)
+    recall_value = counts.recall()
     print(recall_value)
-    precision_value = precision(
-        complete_gold_alignments, reversed_alignments)
+    precision_value = counts.precision()
     print(precision_value)
-    aer_value = alignment_error_rate(
-        reversed_alignments, complete_gold_alignments)
+    aer_value = counts.alignment_error_rate()
     print(aer_value)
     return recall_value, precision_value, aer_value
 
 
+def parse_arguments(arguments):
+    """Parse the command line arguments of phase 3."""
+    parser = argparse.ArgumentParser(
+        description="Phase 3: evaluate alignments against a gold standard.")
+    parser.add_argument('gold_alignments_filename')
+    parser.add_argument('gold_source_sentences_filename')
+    parser.add_argument('gold_target_sentences_filename')
+    parser.add_argument('probabilities_filename')
+    parser.add_argument('golden_sents_calculated_alignments_filename')
+    parser.add_argument(
+        '--cache-dir',
+        help="cache the tokenized golden sentences in this directory")
+    parser.add_argument(
+        '--tokenizer', choices=['nltk', 'regex'], default='nltk',
+        help="'regex' is the NLTK word tokenizer without sentence "
+             "splitting and with fewer regular expressions per sentence. "
+             "Periods inside a line, as after abbreviations, can give "
+             "other tokens than with 'nltk'.")
+    parser.add_argument(
+        '--download-tokenizer', action='store_true',
+        help="download the NLTK punkt models before evaluating")
+    return parser.parse_args(arguments)
+
+
 if __name__ == "__main__":
-    if len(sys.argv) != 6:
-        sys.exit(f"6 arguments are needed, found {len(sys.argv)}")
-    else:
-        gold_alignments_filename = sys.argv[1]
-        gold_source_sentences_filename = sys.argv[2]
-        gold_target_sentences_filename = sys.argv[3]
-        probabilities_filename = sys.argv[4]
-        golden_sents_calculated_alignments_filename = sys.argv[5]
-        evaluate(
-            gold_alignments_filename=sys.argv[1],
-            gold_source_sentences_filename=sys.argv[2],
-            gold_target_sentences_filename=sys.argv[3],
-            probabilities_filename=sys.argv[4],
-            golden_sents_calculated_alignments_filename=sys.argv[5]
-        )
+    args = parse_arguments(sys.argv[1:])
+    if args.download_tokenizer:
+        download_tokenizer_models()
+    evaluate(
+        gold_alignments_filename=args.gold_alignments_filename,
+        gold_source_sentences_filename=args.gold_source_sentences_filename,
+        gold_target_sentences_filename=args.gold_target_sentences_filename,
+        probabilities_filename=args.probabilities_filename,
+        golden_sents_calculated_alignments_filename=(
+            args.golden_sents_calculated_alignments_filename),
+        cache_dir=args.cache_dir,
+        tokenizer=args.tokenizer
+    )
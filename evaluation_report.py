@@ -0,0 +1,340 @@
+# -*- coding: utf-8 -*-
+# Modulprojekt CLT
+# Authorin: Sandra Sánchez
+# Datum: 17.10.2026
+
+import argparse
+import bisect
+import collections
+import csv
+import itertools
+import os
+import sys
+from typing import NamedTuple
+
+from corpus_sampling import LENGTH_STRATA
+from evaluate import AlignmentCounts, add_null_alignments, \
+    iterate_gold_alignment_sets, iterate_preprocessed_gold_sentences, \
+    parse_calculated_alignments, score_sentence
+from shared_functions import iterate_lines_from_file, map_in_chunks, \
+    align_in_worker, load_worker_model, download_tokenizer_models
+
+# Columns of the files written by AlignmentReport.write_csv()
+SENTENCE_COLUMNS = ['sentence', 'source_length', 'target_length',
+                    'length_bucket', 'sure_matches', 'possible_matches',
+                    'calculated', 'sure', 'null_calculated', 'null_sure',
+                    'precision', 'recall', 'aer']
+BREAKDOWN_COLUMNS = ['group', 'value', 'sentences', 'sure_matches',
+                     'possible_matches', 'calculated', 'sure',
+                     'precision', 'recall', 'aer']
+ERROR_COLUMNS = ['error', 'source_word', 'target_word', 'count']
+
+# Calculated alignments that are not even possible, and sure gold
+# alignments that were not calculated
+ERROR_TYPES = ['wrong', 'missed']
+
+
+def length_bucket(length, strata=LENGTH_STRATA):
+    """
+    Name of the length stratum of a sentence, like the strata of
+    corpus_sampling.stratified_sample().
+    :param length: int
+    :param strata: sorted tuple of int, the upper bounds of the strata
+    :return: str. Example: '0-10', '11-20', '61+'
+    """
+    stratum = bisect.bisect_left(strata, length)
+    lower = strata[stratum - 1] + 1 if stratum else 0
+    if stratum == len(strata):
+        return f"{lower}+"
+    return f"{lower}-{strata[stratum]}"
+
+
+def rates(counts):
+    """
+    :param counts: AlignmentCounts
+    :return: tuple (precision, recall, aer) of float, None where
+        there is nothing to divide by
+    """
+    return (counts.precision() if counts.calculated else None,
+            counts.recall() if counts.sure else None,
+            counts.alignment_error_rate()
+            if counts.calculated + counts.sure else None)
+
+
+class SentenceReport(NamedTuple):
+    """
+    The scores of one sentence pair, split into the alignments with
+    'NULL' (source position 0) and the alignments with a source word.
+    """
+    sentence: int
+    source_length: int
+    target_length: int
+    null_counts: AlignmentCounts
+    word_counts: AlignmentCounts
+    errors: collections.Counter  # (error type, source word, target word)
+
+    def counts(self):
+        """AlignmentCounts of all alignments of the sentence."""
+        return self.null_counts.combine(self.word_counts)
+
+
+def _word(sentence, index):
+    """The word at index, or '#index' if the tokenization is shorter."""
+    return sentence[index] if index < len(sentence) else f"#{index}"
+
+
+def score_sentence_pair(item):
+    """
+    Score one sentence pair. Runs in the workers of report_alignments().
+    :param item: tuple (sentence, source_sentence, target_sentence,
+        (sure, possible), sentence_alignments), where source_sentence
+        starts with 'NULL', (sure, possible) come from
+        iterate_gold_alignment_sets() and sentence_alignments is str
+        like '1-0 2-3 3-2'
+    :return: SentenceReport
+    """
+    sentence, source_sentence, target_sentence, (sure, possible), \
+        sentence_alignments = item
+    alignments = parse_calculated_alignments(sentence_alignments)
+    add_null_alignments(sure, possible, len(alignments))
+    null_counts = score_sentence(
+        {alignment for alignment in sure if alignment[0] == 0},
+        {alignment for alignment in possible if alignment[0] == 0},
+        [alignment for alignment in alignments if alignment[0] == 0])
+    word_counts = score_sentence(
+        {alignment for alignment in sure if alignment[0] != 0},
+        {alignment for alignment in possible if alignment[0] != 0},
+        [alignment for alignment in alignments if alignment[0] != 0])
+    errors = collections.Counter()
+    for source_position, target_position in alignments:
+        if (source_position, target_position) not in possible:
+            errors['wrong', _word(source_sentence, source_position),
+                   _word(target_sentence, target_position - 1)] += 1
+    for source_position, target_position in sure.difference(alignments):
+        errors['missed', _word(source_sentence, source_position),
+               _word(target_sentence, target_position - 1)] += 1
+    return SentenceReport(sentence, len(source_sentence) - 1,
+                          len(target_sentence), null_counts, word_counts,
+                          errors)
+
+
+class AlignmentReport:
+    """
+    Per-sentence scores and their breakdowns by source length and by
+    'NULL' versus word alignments, plus the most frequent errors.
+    """
+
+    def __init__(self, strata=LENGTH_STRATA):
+        self.strata = strata
+        self.sentences = []
+        self.by_length = collections.defaultdict(AlignmentCounts)
+        self.sentences_by_length = collections.Counter()
+        self.null_counts = AlignmentCounts()
+        self.word_counts = AlignmentCounts()
+        self.errors = collections.Counter()
+
+    def add(self, sentence_report):
+        """
+        :param sentence_report: SentenceReport
+        :return: None
+        """
+        bucket = length_bucket(sentence_report.source_length, self.strata)
+        self.sentences.append(sentence_report)
+        self.by_length[bucket] = self.by_length[bucket].combine(
+            sentence_report.counts())
+        self.sentences_by_length[bucket] += 1
+        self.null_counts = self.null_counts.combine(
+            sentence_report.null_counts)
+        self.word_counts = self.word_counts.combine(
+            sentence_report.word_counts)
+        self.errors.update(sentence_report.errors)
+
+    def total(self):
+        """AlignmentCounts of all sentences, like evaluate.evaluate()."""
+        return self.null_counts.combine(self.word_counts)
+
+    def sentence_rows(self):
+        """:return: generator of lists, see SENTENCE_COLUMNS"""
+        for sentence_report in self.sentences:
+            counts = sentence_report.counts()
+            yield [sentence_report.sentence, sentence_report.source_length,
+                   sentence_report.target_length,
+                   length_bucket(sentence_report.source_length, self.strata),
+                   *counts, sentence_report.null_counts.calculated,
+                   sentence_report.null_counts.sure, *rates(counts)]
+
+    def breakdown_rows(self):
+        """:return: list of lists, see BREAKDOWN_COLUMNS"""
+        number_sentences = len(self.sentences)
+        groups = [('all', 'all', number_sentences, self.total()),
+                  ('alignment', 'null', number_sentences, self.null_counts),
+                  ('alignment', 'word', number_sentences, self.word_counts)]
+        buckets = [length_bucket(length, self.strata)
+                   for length in (*self.strata, self.strata[-1] + 1)]
+        groups.extend(('length', bucket, self.sentences_by_length[bucket],
+                       self.by_length[bucket])
+                      for bucket in buckets if bucket in self.by_length)
+        return [[group, value, sentences, *counts, *rates(counts)]
+                for group, value, sentences, counts in groups]
+
+    def error_rows(self, top_errors=50):
+        """
+        :param top_errors: int, number of rows per error type
+        :return: list of lists, see ERROR_COLUMNS, the most frequent
+            errors of every type first
+        """
+        rows = []
+        for error_type in ERROR_TYPES:
+            errors = collections.Counter(
+                {error: count for error, count in self.errors.items()
+                 if error[0] == error_type})
+            rows.extend([*error, count]
+                        for error, count in errors.most_common(top_errors))
+        return rows
+
+    def write_csv(self, directory, top_errors=50):
+        """
+        Write sentences.csv, breakdown.csv and errors.csv with one typed
+        column per field, so that they can be read as tables by
+        csv.DictReader, pandas or pyarrow.csv. Undefined rates are
+        empty fields.
+        :param directory: str, created if it does not exist
+        :param top_errors: int, see error_rows()
+        :return: None
+        """
+        os.makedirs(directory, exist_ok=True)
+        for filename, columns, rows in [
+                ('sentences.csv', SENTENCE_COLUMNS, self.sentence_rows()),
+                ('breakdown.csv', BREAKDOWN_COLUMNS, self.breakdown_rows()),
+                ('errors.csv', ERROR_COLUMNS, self.error_rows(top_errors))]:
+            with open(os.path.join(directory, filename), 'w',
+                      encoding='utf-8', newline='') as file:
+                writer = csv.writer(file)
+                writer.writerow(columns)
+                writer.writerows(rows)
+
+
+def align_and_score_sentence_pair(item):
+    """
+    Align one sentence pair with the model of
+    shared_functions.load_worker_model() and score it, so that every
+    chunk is aligned and scored by the same worker.
+    :param item: tuple (sentence, source_sentence, target_sentence,
+        (sure, possible)), see score_sentence_pair()
+    :return: SentenceReport
+    """
+    sentence, source_sentence, target_sentence, gold_alignment_set = item
+    return score_sentence_pair(
+        (sentence, source_sentence, target_sentence, gold_alignment_set,
+         align_in_worker((source_sentence, target_sentence))))
+
+
+def report_alignments(gold_alignment_sets, source_sentences,
+                      target_sentences, calculated_alignments, workers=1,
+                      chunk_size=1000, strata=LENGTH_STRATA):
+    """
+    Score every sentence pair, in chunks in a process pool if workers
+    is bigger than 1, and collect the scores in one pass.
+    :param gold_alignment_sets: iterable of tuples (sure, possible),
+        see evaluate.iterate_gold_alignment_sets()
+    :param source_sentences: iterable of lists of str, starting with
+        'NULL'
+    :param target_sentences: iterable of lists of str
+    :param calculated_alignments: iterable of str, one per sentence.
+        Example: '1-0 2-3 3-2'
+    :param workers: int, number of processes
+    :param chunk_size: int, number of sentence pairs per chunk
+    :param strata: sorted tuple of int, see length_bucket()
+    :return: AlignmentReport
+    """
+    report = AlignmentReport(strata)
+    items = zip(itertools.count(1), source_sentences, target_sentences,
+                gold_alignment_sets, calculated_alignments)
+    for sentence_report in map_in_chunks(score_sentence_pair, items,
+                                         workers, chunk_size):
+        report.add(sentence_report)
+    return report
+
+
+def evaluation_report(gold_alignments_filename,
+                      gold_source_sentences_filename,
+                      gold_target_sentences_filename,
+                      probabilities_filename, report_directory,
+                      cache_dir=None, tokenizer='nltk', workers=1,
+                      top_errors=50):
+    """
+    Detailed version of evaluate.evaluate(): align the golden sentences
+    with the trained model and write the report into report_directory.
+    :param gold_alignments_filename: file with alignments and annotations
+    :param gold_source_sentences_filename: file with golden sentences of
+        source language
+    :param gold_target_sentences_filename: file with golden sentences of
+        target language
+    :param probabilities_filename: file with modelled probabilities
+    :param report_directory: str, see AlignmentReport.write_csv()
+    :param cache_dir: directory of the tokenization cache
+    :param tokenizer: 'nltk' or 'regex'
+    :param workers: int, processes that align and score the sentences
+    :param top_errors: int, see AlignmentReport.error_rows()
+    :return: AlignmentReport
+    """
+    items = zip(
+        itertools.count(1),
+        iterate_preprocessed_gold_sentences(
+            gold_source_sentences_filename, cache_dir, tokenizer,
+            append_null=True),
+        iterate_preprocessed_gold_sentences(
+            gold_target_sentences_filename, cache_dir, tokenizer),
+        iterate_gold_alignment_sets(
+            iterate_lines_from_file(gold_alignments_filename)))
+    report = AlignmentReport()
+    # One process pool aligns and scores every chunk
+    for sentence_report in map_in_chunks(
+            align_and_score_sentence_pair, items, workers,
+            initializer=load_worker_model,
+            initargs=(probabilities_filename,)):
+        report.add(sentence_report)
+    report.write_csv(report_directory, top_errors)
+    for row in report.breakdown_rows():
+        print(*row, sep='\t')
+    return report
+
+
+def parse_arguments(arguments):
+    """Parse the command line arguments of the evaluation report."""
+    parser = argparse.ArgumentParser(
+        description="Write per-sentence scores, breakdowns by length "
+                    "and NULL alignments and the most frequent errors "
+                    "as CSV files.")
+    parser.add_argument('gold_alignments_filename')
+    parser.add_argument('gold_source_sentences_filename')
+    parser.add_argument('gold_target_sentences_filename')
+    parser.add_argument('probabilities_filename')
+    parser.add_argument('report_directory')
+    parser.add_argument(
+        '--cache-dir',
+        help="cache the tokenized golden sentences in this directory")
+    parser.add_argument(
+        '--tokenizer', choices=['nltk', 'regex'], default='nltk')
+    parser.add_argument(
+        '--workers', type=int, default=1,
+        help="align and score the sentences in this many processes")
+    parser.add_argument(
+        '--top-errors', type=int, default=50,
+        help="number of error pairs of every type in errors.csv")
+    parser.add_argument(
+        '--download-tokenizer', action='store_true',
+        help="download the NLTK punkt models before evaluating")
+    return parser.parse_args(arguments)
+
+
+if __name__ == '__main__':
+    args = parse_arguments(sys.argv[1:])
+    if args.download_tokenizer:
+        download_tokenizer_models()
+    evaluation_report(
+        args.gold_alignments_filename, args.gold_source_sentences_filename,
+        args.gold_target_sentences_filename, args.probabilities_filename,
+        args.report_directory, cache_dir=args.cache_dir,
+        tokenizer=args.tokenizer, workers=args.workers,
+        top_errors=args.top_errors)
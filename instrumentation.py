@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+# Modulprojekt CLT
+# Authorin: Sandra Sánchez
+# Datum: 17.10.2026
+
+import atexit
+import contextlib
+import json
+import os
+import time
+
+# Environment variables that switch the instrumentation on without
+# changing the command line, for example in a batch job
+REPORT_VARIABLE = 'CLT_INSTRUMENT'
+PROFILE_PHASE_VARIABLE = 'CLT_PROFILE_PHASE'
+TRACE_MEMORY_VARIABLE = 'CLT_TRACE_MEMORY'
+
+# Names of the timed phases
+PHASES = ['preprocessing', 'vocabulary', 'initialisation', 'e_step',
+          'm_step', 'pruning', 'evaluation', 'checkpoint',
+          'serialisation', 'model_loading', 'alignment']
+
+# Returned by timer() while the instrumentation is off, so a timed block
+# costs one function call and one dict lookup
+_NULL_TIMER = contextlib.nullcontext()
+
+_settings = {'enabled': False, 'profile_phase': None,
+             'profile_filename': None, 'trace_memory': False}
+_timers = {}
+_counters = {}
+_profiles = {}
+
+
+def enable(profile_phase=None, profile_filename=None, trace_memory=False):
+    """
+    Switch the timers and counters on.
+    :param profile_phase: str, one of PHASES. Every call of its timer
+        also runs under cProfile, and under tracemalloc with
+        trace_memory. No profiling if None.
+    :param profile_filename: file for the cProfile statistics of the
+        phase, readable with pstats. Default: '<profile_phase>.prof'
+    :param trace_memory: bool, record the peak memory and the biggest
+        allocations of the profiled phase with tracemalloc
+    :return: None
+    """
+    if profile_phase is not None and profile_phase not in PHASES:
+        raise ValueError(f"Unknown phase '{profile_phase}', "
+                         f"choose one of {', '.join(PHASES)}")
+    _settings['enabled'] = True
+    _settings['profile_phase'] = profile_phase
+    _settings['profile_filename'] = profile_filename \
+        or f"{profile_phase}.prof"
+    _settings['trace_memory'] = trace_memory
+
+
+def disable():
+    """Switch the instrumentation off and forget the measurements."""
+    _settings['enabled'] = False
+    _settings['profile_phase'] = None
+    _timers.clear()
+    _counters.clear()
+    _profiles.clear()
+
+
+def enabled():
+    """
+    Use it to skip work that is only done for a counter.
+    :return: bool
+    """
+    return _settings['enabled']
+
+
+def timer(name):
+    """
+    Time a block of code:
+        with instrumentation.timer('e_step'):
+            ...
+    :param name: str, one of PHASES
+    :return: context manager
+    """
+    if not _settings['enabled']:
+        return _NULL_TIMER
+    return _Timer(name)
+
+
+def count(name, value=1):
+    """
+    Add value to a counter, for example the number of sentence pairs
+    of an E-step.
+    :param name: str
+    :param value: int or float
+    :return: None
+    """
+    if _settings['enabled']:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+class _Timer:
+    """Accumulate the time of a phase, and profile it if it is chosen."""
+
+    def __init__(self, name):
+        self.name = name
+        self.start = None
+        self.profiled = name == _settings['profile_phase']
+
+    def __enter__(self):
+        if self.profiled:
+            _start_profiling(self.name)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter() - self.start
+        if self.profiled:
+            _stop_profiling(self.name)
+        statistics = _timers.setdefault(
+            self.name, {'calls': 0, 'seconds': 0.0, 'max_seconds': 0.0})
+        statistics['calls'] += 1
+        statistics['seconds'] += seconds
+        statistics['max_seconds'] = max(statistics['max_seconds'], seconds)
+
+
+def _start_profiling(name):
+    """Resume the cProfile profile of the phase and trace memory."""
+    import cProfile
+    profile = _profiles.setdefault(
+        name, {'profiler': cProfile.Profile(), 'peak_memory_mb': 0.0,
+               'top_allocations': []})
+    if _settings['trace_memory']:
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+    profile['profiler'].enable()
+
+
+def _stop_profiling(name):
+    """Pause the profile and keep the memory measurements."""
+    profile = _profiles[name]
+    profile['profiler'].disable()
+    if _settings['trace_memory']:
+        import tracemalloc
+        _, peak = tracemalloc.get_traced_memory()
+        if peak / 1024 ** 2 >= profile['peak_memory_mb']:
+            profile['peak_memory_mb'] = peak / 1024 ** 2
+            snapshot = tracemalloc.take_snapshot().filter_traces(
+                [tracemalloc.Filter(False, tracemalloc.__file__),
+                 tracemalloc.Filter(False, __file__)])
+            statistics = snapshot.statistics('lineno')
+            profile['top_allocations'] = [
+                {'line': str(statistic.traceback),
+                 'size_mb': statistic.size / 1024 ** 2,
+                 'blocks': statistic.count}
+                for statistic in statistics[:10]]
+
+
+def report():
+    """
+    :return: dict with the timers, the counters and the profiled phase,
+        that can be serialised as JSON
+    """
+    result = {
+        'timers': {name: dict(statistics)
+                   for name, statistics in _timers.items()},
+        'counters': dict(_counters),
+    }
+    for name, profile in _profiles.items():
+        profile['profiler'].dump_stats(_settings['profile_filename'])
+        result['profile'] = {'phase': name,
+                             'cprofile': _settings['profile_filename']}
+        if _settings['trace_memory']:
+            result['profile']['peak_memory_mb'] = profile['peak_memory_mb']
+            result['profile']['top_allocations'] = \
+                profile['top_allocations']
+    return result
+
+
+def save_report(filename):
+    """
+    Write report() into a JSON file. The cProfile statistics of the
+    profiled phase are written next to it, see enable().
+    :param filename: file
+    :return: None
+    """
+    with open(filename, 'w', encoding='utf-8') as file:
+        json.dump(report(), file, indent=2)
+        file.write('\n')
+
+
+def enable_from_environment():
+    """
+    Switch the instrumentation on if CLT_INSTRUMENT names a report file,
+    and save the report there when the program ends. CLT_PROFILE_PHASE
+    chooses the profiled phase and CLT_TRACE_MEMORY=1 traces its memory.
+    :return: bool, whether the instrumentation is on
+    """
+    report_filename = os.environ.get(REPORT_VARIABLE)
+    if not report_filename or _settings['enabled']:
+        return _settings['enabled']
+    enable(os.environ.get(PROFILE_PHASE_VARIABLE) or None,
+           trace_memory=os.environ.get(TRACE_MEMORY_VARIABLE) == '1')
+    atexit.register(save_report, report_filename)
+    return True
+
+
+def add_arguments(parser):
+    """Add the instrumentation options to an argparse parser."""
+    parser.add_argument(
+        '--instrument', metavar='REPORT',
+        help="time the phases, count their work and write the report "
+             "as JSON to REPORT")
+    parser.add_argument(
+        '--profile-phase', choices=PHASES,
+        help="with --instrument, also run this phase under cProfile")
+    parser.add_argument(
+        '--profile-output',
+        help="file for the cProfile statistics, '<phase>.prof' by default")
+    parser.add_argument(
+        '--trace-memory', action='store_true',
+        help="with --profile-phase, record the peak memory and the "
+             "biggest allocations of the phase with tracemalloc")
+
+
+@contextlib.contextmanager
+def instrumented(args):
+    """
+    Switch the instrumentation on as the arguments of add_arguments()
+    or the environment say, and save the report at the end of the block.
+    :param args: argparse.Namespace
+    :return: context manager
+    """
+    if args.instrument is None:
+        enable_from_environment()
+        yield
+        return
+    enable(args.profile_phase, args.profile_output, args.trace_memory)
+    try:
+        yield
+    finally:
+        save_report(args.instrument)
@@ -3,32 +3,26 @@
 # Authorin: Sandra Sánchez
 # Datum: 07.04.2022
 
+import argparse
+import functools
+import itertools
+import json
+import math
 import sys
-
-import nltk
-
-nltk.download('punkt')
+import time
 
 from tqdm import tqdm
 
 from shared_functions \
-    import read_lines_from_file, clean_corpus_leave_punctuation, \
-    get_sentence_pairs
-
-
-def select_smaller_corpus_from_corpus(corpus, minimize=False):
-    """
-    Set split size to select a percentage of sentences
-    from original corpus to get a smaller corpus.
-    :param corpus: list of sentences (str)
-    :param minimize: bool, when True selects a minimal portion of a corpus
-    :return: list of sentences (str)
-    """
-    split_size = int(len(corpus) * 0.5)
-    if minimize:
-        split_size = 3000
-    partial_corpus = corpus[:split_size]
-    return partial_corpus
+    import read_parallel_corpus, tokenize_sentence_pairs, \
+    read_tokenized_parallel_corpus, download_tokenizer_models
+import instrumentation
+from corpus_sampling import SAMPLING_METHODS, count_words, \
+    filter_sentence_pairs, sample_sentence_pairs
+from parallel_corpus import ParallelCorpus
+from checkpoints import CheckpointWriter, load_checkpoint
+from translation_table import save_translation_table, \
+    load_translation_probabilities, prune_probabilities
 
 
 def get_unique_words(sentences):
@@ -44,7 +38,12 @@ def get_unique_words(sentences):
 
 
 def expectation_maximization_algorithm(
-        source_words, target_words, parallel_corpus, filename):
+        source_words, target_words, parallel_corpus, filename,
+        engine='dense', workers=1, binary_model=False, max_iterations=3,
+        tolerance=None, training_log=None, initial_probabilities=None,
+        checkpoint_filename=None, checkpoint_interval=1, resume=False,
+        statistics_filename=None, prune_threshold=None, prune_top_k=None,
+        prune_every_iteration=False, evaluation_callback=None):
     """
     Run the expectation-maximization algorithm on a parallel corpus
     in order to find the most likely word translations that
@@ -54,45 +53,390 @@ def expectation_maximization_algorithm(
     :param target_words: list of str.
         Example: ['bleu', 'fleur', 'la', 'maison']
     :param parallel_corpus: list of tuples
-        ([source_sentence], [target_sentence])
+        ([source_sentence], [target_sentence]), or a ParallelCorpus
     :param filename: file into which we save the probabilities as str
+    :param engine: 'dense' allocates every (s_w, t_w) combination,
+        'sparse' only the combinations that co-occur in some sentence pair.
+        Both give the same probabilities for the co-occurring pairs.
+        'numpy' maps the words to integer ids and runs the E-step and
+        the M-step as array operations over the co-occurring pairs.
+        'bucketed' is the 'numpy' engine with an E-step over padded
+        buckets of sentence pairs of similar lengths, see
+        vectorized_em.BucketedEStep.
+    :param workers: int, number of processes that run the E-step on
+        shards of the corpus. Only supported by the 'numpy' engine.
+    :param binary_model: bool, when True the probabilities are saved in
+        the binary format of translation_table.py
+    :param max_iterations: int, the most EM iterations that are run
+    :param tolerance: float, stop as soon as the log-likelihood of the
+        corpus improves by less than this fraction of its value in the
+        previous iteration. All max_iterations are run if None.
+    :param training_log: file to which a JSON line is appended for every
+        iteration, see iteration_record()
+    :param initial_probabilities: dict or TranslationTable of a model
+        to start from instead of uniform probabilities, for example one
+        trained on a smaller corpus. Pairs it does not contain start
+        with the uniform probability.
+    :param checkpoint_filename: file for the checkpoints in the binary
+        model format, see checkpoints.py. No checkpoints if None.
+    :param checkpoint_interval: int, save a checkpoint every that many
+        iterations, and always after the last one
+    :param resume: bool, when True and the checkpoint file exists the
+        training continues from it instead of starting again. With
+        prune_every_iteration, the pairs missing in the checkpoint stay
+        pruned.
+    :param statistics_filename: file for the expected counts of the last
+        E-step, which online_em.py needs to update the model with new
+        sentence pairs later
+    :param prune_threshold: float, drop the probabilities below it from
+        the model, see translation_table.prune_probabilities()
+    :param prune_top_k: int, keep only the k most probable source words
+        of every target word in the model
+    :param prune_every_iteration: bool, when True the model is pruned
+        after every M-step, so that the following iterations only visit
+        the kept pairs. Not supported by the 'dense' engine.
+    :param evaluation_callback: function that is called after every
+        iteration with the probabilities of the iteration, as a dict or
+        a vectorized_em.PairProbabilities with items of the form
+        (s_w, t_w) : float. The dict it returns is added to the record
+        of the iteration, see evaluate.make_gold_evaluation_callback().
     :return: dict with items of the form (s_w, t_w) : float,
     where the float represents the probability
     Example: ('house', 'maison'): 0.4862535128673125
     """
-    t_probs = initialise(source_words, target_words)
+    if workers > 1 and engine != 'numpy':
+        raise ValueError("Several workers need the 'numpy' engine")
+    if prune_every_iteration and engine == 'dense':
+        raise ValueError("Pruning between iterations needs the 'sparse' "
+                         "or the 'numpy' engine")
+    links = None
+    vectorized = engine in ('numpy', 'bucketed')
+    with instrumentation.timer('initialisation'):
+        if vectorized:
+            import vectorized_em
+            corpus_arrays = vectorized_em.build_corpus_arrays(
+                parallel_corpus, source_words, target_words)
+            links = vectorized_em.build_links(
+                *corpus_arrays, len(source_words), len(target_words))
+            t_probs = vectorized_em.initialise(links)
+            if workers > 1:
+                sharded_e_step = vectorized_em.ShardedEStep(links, workers)
+            if engine == 'bucketed':
+                bucketed_e_step = vectorized_em.BucketedEStep(
+                    links, corpus_arrays[1], corpus_arrays[3])
+            del corpus_arrays
+        elif engine == 'sparse':
+            t_probs = initialise_sparse(
+                source_words, target_words, parallel_corpus)
+        elif engine == 'dense':
+            t_probs = initialise(source_words, target_words)
+        else:
+            raise ValueError(f"Unknown engine '{engine}'")
+        first_iteration = 0
+        previous_log_likelihood = None
+        checkpoint = load_checkpoint(checkpoint_filename) \
+            if resume and checkpoint_filename is not None else None
+        if checkpoint is not None:
+            initial_probabilities, metadata = checkpoint
+            first_iteration = metadata['iteration']
+            previous_log_likelihood = metadata.get('log_likelihood')
+            print(f"Resuming after iteration {first_iteration}")
+        if initial_probabilities is not None:
+            if vectorized:
+                t_probs = vectorized_em.probabilities_from_dict(
+                    initial_probabilities, t_probs, links,
+                    source_words, target_words)
+            else:
+                warm_start(t_probs, initial_probabilities)
+        if checkpoint is not None and prune_every_iteration:
+            # The pairs pruned before the checkpoint stay pruned instead
+            # of coming back with the uniform probability
+            if vectorized:
+                t_probs, links = vectorized_em.keep_pairs(
+                    t_probs, links, vectorized_em.pairs_in_model(
+                        initial_probabilities, links, source_words,
+                        target_words))
+                if workers > 1:
+                    sharded_e_step.close()
+                    sharded_e_step = vectorized_em.ShardedEStep(
+                        links, workers)
+                if engine == 'bucketed':
+                    bucketed_e_step.update_links(links)
+            else:
+                t_probs = {pair: prob for pair, prob in t_probs.items()
+                           if pair in initial_probabilities}
     print("Probabilities initialised")
-    s_total = {}
-    number_iterations = 3
-    for iteration in tqdm(range(number_iterations)):
+    number_source_tokens = sum(len(source_sentence)
+                               for source_sentence, _ in parallel_corpus)
+    log_file = open(training_log, 'a', encoding='utf-8') \
+        if training_log is not None else None
+    checkpoint_writer = CheckpointWriter(checkpoint_filename) \
+        if checkpoint_filename is not None else None
+    count = None
+    word_indexes = None
+    if instrumentation.enabled():
+        number_word_pairs = sum(
+            len(source_sentence) * len(target_sentence)
+            for source_sentence, target_sentence in parallel_corpus)
+    try:
+        for iteration in tqdm(range(first_iteration, max_iterations)):
+            start = time.perf_counter()
+            if vectorized:
+                with instrumentation.timer('e_step'):
+                    if workers > 1:
+                        count, log_likelihood = sharded_e_step(t_probs)
+                    elif engine == 'bucketed':
+                        count, log_likelihood = bucketed_e_step(t_probs)
+                    else:
+                        count, log_likelihood = vectorized_em.e_step(
+                            t_probs, links)
+                e_step_end = time.perf_counter()
+                count_links = links
+                with instrumentation.timer('m_step'):
+                    t_probs = vectorized_em.m_step(count, links)
+                if prune_every_iteration:
+                    with instrumentation.timer('pruning'):
+                        t_probs, links = vectorized_em.prune(
+                            t_probs, links, prune_threshold, prune_top_k)
+                    if workers > 1 and links is not count_links:
+                        sharded_e_step.close()
+                        sharded_e_step = vectorized_em.ShardedEStep(
+                            links, workers)
+                    if engine == 'bucketed':
+                        bucketed_e_step.update_links(links)
+            else:
+                with instrumentation.timer('e_step'):
+                    count, total, log_likelihood = e_step(
+                        t_probs, source_words, target_words,
+                        parallel_corpus, sparse=engine == 'sparse')
+                e_step_end = time.perf_counter()
+                with instrumentation.timer('m_step'):
+                    m_step(t_probs, count, total, source_words,
+                           target_words, sparse=engine == 'sparse')
+                if prune_every_iteration:
+                    with instrumentation.timer('pruning'):
+                        t_probs = prune_probabilities(
+                            t_probs, prune_threshold, prune_top_k)
+            end = time.perf_counter()
+            instrumentation.count('em.iterations')
+            instrumentation.count('e_step.sentence_pairs',
+                                  len(parallel_corpus))
+            if instrumentation.enabled():
+                instrumentation.count('e_step.word_pairs', number_word_pairs)
+                instrumentation.count('m_step.word_pairs', len(t_probs))
+            record = iteration_record(
+                iteration + 1, log_likelihood, previous_log_likelihood,
+                number_source_tokens, e_step_end - start, end - e_step_end)
+            if evaluation_callback is not None:
+                with instrumentation.timer('evaluation'):
+                    if vectorized:
+                        if word_indexes is None:
+                            word_indexes = (
+                                {word: index for index, word
+                                 in enumerate(source_words)},
+                                {word: index for index, word
+                                 in enumerate(target_words)})
+                        probabilities = vectorized_em.PairProbabilities(
+                            t_probs, links, *word_indexes)
+                    else:
+                        probabilities = t_probs
+                    record.update(evaluation_callback(probabilities))
+            print(json.dumps(record))
+            if log_file is not None:
+                log_file.write(json.dumps(record) + '\n')
+                log_file.flush()
+            converged = tolerance is not None \
+                and record['relative_improvement'] is not None \
+                and record['relative_improvement'] < tolerance
+            if checkpoint_writer is not None and (
+                    converged or iteration + 1 == max_iterations
+                    or (iteration + 1) % checkpoint_interval == 0):
+                with instrumentation.timer('checkpoint'):
+                    checkpoint_writer.save(
+                        checkpoint_probabilities(
+                            t_probs, links, source_words, target_words),
+                        {'iteration': iteration + 1,
+                         'log_likelihood': log_likelihood})
+            if converged:
+                print(f"Converged after {iteration + 1} iterations")
+                break
+            previous_log_likelihood = log_likelihood
+    finally:
+        if workers > 1:
+            sharded_e_step.close()
+        if log_file is not None:
+            log_file.close()
+        if checkpoint_writer is not None:
+            checkpoint_writer.close()
+
+    with instrumentation.timer('serialisation'):
+        if vectorized:
+            t_probs = vectorized_em.probabilities_to_dict(
+                t_probs, links, source_words, target_words)
+            if count is not None:
+                count = vectorized_em.probabilities_to_dict(
+                    count, count_links, source_words, target_words)
+        if statistics_filename is not None:
+            if count is None:
+                raise ValueError("No statistics without any EM iteration")
+            from online_em import save_statistics
+            save_statistics(count, len(parallel_corpus), statistics_filename)
+    if prune_threshold is not None or prune_top_k is not None:
+        number_entries = len(t_probs)
+        with instrumentation.timer('pruning'):
+            t_probs = prune_probabilities(
+                t_probs, prune_threshold, prune_top_k)
+        print(f"Pruned the model from {number_entries} to {len(t_probs)} "
+              f"entries")
+    # translation prob. t(e|f)
+    with instrumentation.timer('serialisation'):
+        if binary_model:
+            save_translation_table(t_probs, filename)
+        else:
+            save_probs_into_file_tab(t_probs, filename)
+    instrumentation.count('model.entries', len(t_probs))
+    return t_probs
+
+
+def warm_start(t_probs, initial_probabilities):
+    """
+    Replace the initial probabilities of the pairs that the given model
+    knows by the probabilities of the model.
+    :param t_probs: dict with items of the form (s_w, t_w) : float
+    :param initial_probabilities: dict or TranslationTable
+    :return: None
+    """
+    for pair in t_probs:
+        if pair in initial_probabilities:
+            t_probs[pair] = initial_probabilities[pair]
+
+
+def checkpoint_probabilities(t_probs, links, source_words, target_words):
+    """
+    Snapshot the probabilities of the current iteration for the
+    checkpoint thread.
+    The dict engines update t_probs in place, so they are copied here.
+    The numpy engine creates a new array in every M-step, so the array
+    is only converted into a dict in the checkpoint thread.
+    :param t_probs: dict, or np.ndarray for the numpy engine
+    :param links: vectorized_em.CorpusLinks of the numpy engine, else None
+    :return: function without arguments that returns a dict with items
+        of the form (s_w, t_w) : float
+    """
+    if links is not None:
+        import vectorized_em
+        return functools.partial(vectorized_em.probabilities_to_dict,
+                                 t_probs, links, source_words, target_words)
+    snapshot = dict(t_probs)
+    return lambda: snapshot
+
+
+def iteration_record(iteration, log_likelihood, previous_log_likelihood,
+                     number_source_tokens, e_step_seconds, m_step_seconds):
+    """
+    Describe one EM iteration for the training log.
+    The log-likelihood is the one of the probabilities the iteration
+    started with, computed during its E-step.
+    :param iteration: int, starting at 1
+    :param log_likelihood: float, log P(source corpus | target corpus)
+    :param previous_log_likelihood: float, None in the first iteration
+    :param number_source_tokens: int, source tokens in the corpus,
+        including 'NULL'
+    :param e_step_seconds: float
+    :param m_step_seconds: float
+    :return: dict that can be serialised as JSON
+    """
+    relative_improvement = None
+    if previous_log_likelihood:
+        relative_improvement = (log_likelihood - previous_log_likelihood) \
+            / abs(previous_log_likelihood)
+    elif previous_log_likelihood == 0.0:
+        # Every probability is already 1, as after pruning to the top 1
+        relative_improvement = 0.0
+    return {
+        'iteration': iteration,
+        'log_likelihood': log_likelihood,
+        'perplexity': math.exp(-log_likelihood / number_source_tokens)
+        if number_source_tokens else None,
+        'relative_improvement': relative_improvement,
+        'e_step_seconds': e_step_seconds,
+        'm_step_seconds': m_step_seconds,
+    }
+
+
+def e_step(t_probs, source_words, target_words, parallel_corpus,
+           sparse=False):
+    """
+    Collect the expected counts of the word pairs in the corpus.
+    :param t_probs: dict with items of the form (s_w, t_w) : float
+    :param source_words: list of str
+    :param target_words: list of str
+    :param parallel_corpus: list of tuples
+        ([source_sentence], [target_sentence])
+    :param sparse: bool, when True only the pairs in t_probs are counted
+    :return: tuple (count, total, log_likelihood), count is a dict with
+        items of the form (s_w, t_w) : float, total a dict of the form
+        t_w : float and log_likelihood the float log-likelihood of the
+        corpus under t_probs:
+        sum of log(s_total[s_w] / len(target_sentence)) over the source
+        tokens
+    """
+    if sparse:
+        count = dict.fromkeys(t_probs, 0.0)
+        total = dict.fromkeys(target_words, 0.0)
+    else:
         count = {}
         total = {}
-
         for s_w in source_words:
             for t_w in target_words:
                 total[t_w] = 0.0
                 count[(s_w, t_w)] = 0.0
-        print('1/3 for loop done')
-
-        for pair in parallel_corpus:
-            for s_w in pair[0]:  # // Normalization
-                s_total[s_w] = 0.0
-                for t_w in pair[1]:
-                    s_total[s_w] += t_probs[(s_w, t_w)]
-            # // E-Step
-            for s_w in pair[0]:
-                for t_w in pair[1]:
-                    count[(s_w, t_w)] += t_probs[(s_w, t_w)] / s_total[s_w]
-                    total[t_w] += t_probs[(s_w, t_w)] / s_total[s_w]
-        print('2/3 for loop done')
-        # // M-Step
+
+    s_total = {}
+    log_likelihood = 0.0
+    # Pairs missing in a pruned model have probability 0
+    get_probability = t_probs.get
+    for source_sentence, target_sentence in parallel_corpus:
+        # A SentenceView of a ParallelCorpus looks up its words on every
+        # iteration, so every sentence is decoded once
+        source_sentence = list(source_sentence)
+        target_sentence = list(target_sentence)
+        for s_w in source_sentence:  # // Normalization
+            s_total[s_w] = 0.0
+            for t_w in target_sentence:
+                s_total[s_w] += get_probability((s_w, t_w), 0.0)
+            if s_total[s_w]:
+                log_likelihood += math.log(
+                    s_total[s_w] / len(target_sentence))
+        # // E-Step
+        for s_w in source_sentence:
+            for t_w in target_sentence:
+                prob = get_probability((s_w, t_w), 0.0)
+                if prob:
+                    count[(s_w, t_w)] += prob / s_total[s_w]
+                    total[t_w] += prob / s_total[s_w]
+    return count, total, log_likelihood
+
+
+def m_step(t_probs, count, total, source_words, target_words,
+           sparse=False):
+    """
+    Update t_probs in place with the normalised expected counts.
+    :param t_probs: dict with items of the form (s_w, t_w) : float
+    :param count: dict with items of the form (s_w, t_w) : float
+    :param total: dict with items of the form t_w : float
+    :param source_words: list of str
+    :param target_words: list of str
+    :param sparse: bool, when True only the pairs in t_probs are updated
+    :return: None
+    """
+    if sparse:
+        for s_w, t_w in t_probs:
+            t_probs[(s_w, t_w)] = count[(s_w, t_w)] / total[t_w]
+    else:
         for t_w in target_words:
             for s_w in source_words:
                 t_probs[(s_w, t_w)] = count[(s_w, t_w)] / total[t_w]
-        print('3/3 for loop done')
-        print(f"Finished iteration number {iteration + 1}/3")
-
-    save_probs_into_file_tab(t_probs, filename)  # translation prob. t(e|f)
 
 
 def save_probs_into_file_tab(probabilities_dict, filename):
@@ -123,9 +467,52 @@ def initialise(source_language_set, target_language_set):
     return probs
 
 
+def initialise_sparse(
+        source_language_set, target_language_set, parallel_corpus):
+    """
+    Assign initial value only to the (source_word, target_word)
+    combinations that co-occur in at least one sentence pair.
+    The other combinations can never get any probability mass.
+    Entries keep the order of initialise(), so the probabilities
+    file lists the co-occurring pairs in the same order.
+    :param source_language_set: list of str
+    :param target_language_set: list of str
+    :param parallel_corpus: list of tuples
+        ([source_sentence], [target_sentence])
+    :return: dict of items that are tuple: float
+    """
+    co_occurring = set()
+    for source_sentence, target_sentence in parallel_corpus:
+        co_occurring.update(
+            itertools.product(source_sentence, target_sentence))
+    source_positions = {e_w: index for index, e_w
+                        in enumerate(source_language_set)}
+    target_positions = {f_w: index for index, f_w
+                        in enumerate(target_language_set)}
+    ordered_pairs = sorted(
+        co_occurring,
+        key=lambda pair: (target_positions[pair[1]],
+                          source_positions[pair[0]])
+    )
+    initial_prob = 1 / len(target_language_set)
+    return dict.fromkeys(ordered_pairs, initial_prob)
+
+
 def learn_alignments(
         source_language: str, target_language: str,
-        model_probabilities_filename: str, pairs_filename: str):
+        model_probabilities_filename: str, pairs_filename: str,
+        engine: str = 'dense', workers: int = 1,
+        binary_model: bool = False, cache_dir: str = None,
+        tokenizer: str = 'nltk', preprocessing_workers: int = 1,
+        max_iterations: int = 3, tolerance: float = None,
+        training_log: str = None, init_model: str = None,
+        checkpoint_filename: str = None, checkpoint_interval: int = 1,
+        resume: bool = False, statistics_filename: str = None,
+        prune_threshold: float = None, prune_top_k: int = None,
+        prune_every_iteration: bool = False,
+        max_sentence_pairs: int = 3000, sampling: str = 'head',
+        seed: int = 0, max_length: int = None,
+        max_length_ratio: float = None, gold_standard: tuple = None):
     """
     Phase 1: calculate translation probabilities by calling the
     expectation maximization algorithm
@@ -133,48 +520,274 @@ def learn_alignments(
     :param target_language: file with target sentences
     :param model_probabilities_filename: file to save calculated probs
     :param pairs_filename: file to save sentence pairs
+    :param engine: 'dense', 'sparse', 'numpy' or 'bucketed', see
+        expectation_maximization_algorithm()
+    :param workers: number of processes for the E-step
+    :param binary_model: save the model in the binary format
+    :param cache_dir: directory of the tokenization cache, see
+        corpus_cache.py. The whole corpus files are tokenized and cached
+        the first time, later runs skip tokenization. No cache if None.
+    :param tokenizer: 'nltk' or 'regex', see
+        shared_functions.tokenize_not_remove_punctuation()
+    :param preprocessing_workers: number of processes that tokenize
+        the corpus
+    :param max_iterations: the most EM iterations that are run
+    :param tolerance: relative improvement of the log-likelihood below
+        which the training stops, see expectation_maximization_algorithm()
+    :param training_log: file for the JSON lines of every iteration
+    :param init_model: model file in either format to start EM from,
+        for example one trained on a smaller corpus
+    :param checkpoint_filename: file for the checkpoints, see
+        expectation_maximization_algorithm()
+    :param checkpoint_interval: save a checkpoint every that many
+        iterations
+    :param resume: continue from the checkpoint if it exists
+    :param statistics_filename: file for the statistics of online_em.py
+    :param prune_threshold: drop the probabilities below it
+    :param prune_top_k: keep the k most probable source words of every
+        target word
+    :param prune_every_iteration: prune after every M-step, not only the
+        saved model
+    :param max_sentence_pairs: train on that many sentence pairs of the
+        corpus, on all of them if None
+    :param sampling: how the sentence pairs are selected, 'head',
+        'random' or 'stratified', see
+        corpus_sampling.sample_sentence_pairs()
+    :param seed: seed of the random sampling methods
+    :param max_length: drop the sentence pairs with a longer sentence
+        before sampling
+    :param max_length_ratio: drop the sentence pairs whose longer
+        sentence is more than this many times as long as the shorter one
+    :param gold_standard: tuple of the files (gold alignments, golden
+        source sentences, golden target sentences). When given, recall,
+        precision and AER on them are added to the record of every
+        iteration, see evaluate.make_gold_evaluation_callback()
     :return: None
     """
     print("________________PHASE 1: LEARN ALIGNMENTS_______________")
-    source_corpus_raw = read_lines_from_file(source_language)
-    target_corpus_raw = read_lines_from_file(target_language)
+    print("Preprocessing corpora and getting sentence pairs.")
+    # The lengths of the filters and of stratified sampling are counted
+    # in whitespace-separated words of the untokenized lines
+    if cache_dir is None:
+        # Untokenized lines are filtered and sampled, so only the
+        # selected sentence pairs are tokenized
+        sentence_pairs = read_parallel_corpus(
+            source_language, target_language)
+        length = count_words
+    else:
+        # Every sentence is a tuple (line, cached tokens) until sampling
+        # is done
+        sentence_pairs = (
+            ((source_line, source), (target_line, target))
+            for (source_line, target_line), (source, target) in zip(
+                read_parallel_corpus(source_language, target_language),
+                read_tokenized_parallel_corpus(
+                    source_language, target_language, cache_dir,
+                    tokenizer, preprocessing_workers)))
+
+        def length(sentence):
+            return count_words(sentence[0])
+    if max_length is not None or max_length_ratio is not None:
+        sentence_pairs = filter_sentence_pairs(
+            sentence_pairs, max_length, max_length_ratio, length)
     # This step is important in larger corpora
-    partial_corpus_en = select_smaller_corpus_from_corpus(source_corpus_raw,
-                                                          minimize=True)
-    partial_corpus_es = select_smaller_corpus_from_corpus(
-        target_corpus_raw, minimize=True)
-    print("Preprocessing corpora.")
-    preprocessed_source_sents = \
-        clean_corpus_leave_punctuation(partial_corpus_en, append_null=True)
-    preprocessed_target_sents = \
-        clean_corpus_leave_punctuation(partial_corpus_es)
-    print("Getting sentence pairs.")
-    tiny_sentence_pairs = get_sentence_pairs(
-        preprocessed_source_sents, preprocessed_target_sents)
-    with open(pairs_filename, 'w') as file:
-        lines = ''
-        for source, target in tiny_sentence_pairs:
-            lines += f"{' '.join(source)}\n{' '.join(target)}\n"
-        file.write(lines)
+    if max_sentence_pairs is not None:
+        sentence_pairs = sample_sentence_pairs(
+            sentence_pairs, max_sentence_pairs, sampling, seed, length)
+    if cache_dir is None:
+        preprocessed_sentence_pairs = tokenize_sentence_pairs(
+            sentence_pairs, tokenizer, preprocessing_workers)
+    else:
+        preprocessed_sentence_pairs = (
+            (source, target) for (_, source), (_, target) in sentence_pairs)
+    tiny_sentence_pairs = ParallelCorpus()
+    # The sentence pairs are read and tokenized lazily in this loop
+    with instrumentation.timer('preprocessing'), \
+            open(pairs_filename, 'w') as file:
+        for source, target in preprocessed_sentence_pairs:
+            file.write(f"{' '.join(source)}\n{' '.join(target)}\n")
+            tiny_sentence_pairs.append(source, target)
+    instrumentation.count('corpus.sentence_pairs', len(tiny_sentence_pairs))
     print("Getting vocabularies.")
-    source_words = get_unique_words(preprocessed_source_sents)
-    foreign_words = get_unique_words(preprocessed_target_sents)
+    with instrumentation.timer('vocabulary'):
+        source_words = tiny_sentence_pairs.source_vocabulary.sorted_words()
+        foreign_words = tiny_sentence_pairs.target_vocabulary.sorted_words()
+    instrumentation.count('corpus.source_words', len(source_words))
+    instrumentation.count('corpus.target_words', len(foreign_words))
+    initial_probabilities = None
+    if init_model is not None:
+        print(f"Starting from the model {init_model}.")
+        initial_probabilities = load_translation_probabilities(init_model)
+    evaluation_callback = None
+    if gold_standard is not None:
+        from evaluate import make_gold_evaluation_callback
+        evaluation_callback = make_gold_evaluation_callback(
+            *gold_standard, cache_dir=cache_dir, tokenizer=tokenizer)
     print("Running expectation maximization algorithm to get translation probabilities.")
     expectation_maximization_algorithm(
-        source_words, foreign_words, tiny_sentence_pairs, model_probabilities_filename)
+        source_words, foreign_words, tiny_sentence_pairs,
+        model_probabilities_filename, engine=engine, workers=workers,
+        binary_model=binary_model, max_iterations=max_iterations,
+        tolerance=tolerance, training_log=training_log,
+        initial_probabilities=initial_probabilities,
+        checkpoint_filename=checkpoint_filename,
+        checkpoint_interval=checkpoint_interval, resume=resume,
+        statistics_filename=statistics_filename,
+        prune_threshold=prune_threshold, prune_top_k=prune_top_k,
+        prune_every_iteration=prune_every_iteration,
+        evaluation_callback=evaluation_callback)
+
+
+def parse_arguments(arguments):
+    """Parse the command line arguments of phase 1."""
+    parser = argparse.ArgumentParser(
+        description="Phase 1: learn word alignments with IBM Model 1.")
+    parser.add_argument('source_language')
+    parser.add_argument('target_language')
+    parser.add_argument('model_probabilities_filename')
+    parser.add_argument('pairs_filename')
+    parser.add_argument(
+        '--engine', choices=['dense', 'sparse', 'numpy', 'bucketed'],
+        default='dense',
+        help="'sparse' only stores word pairs that co-occur in the corpus, "
+             "'numpy' also runs the EM steps as array operations, "
+             "'bucketed' runs the E-step on padded buckets of sentences "
+             "of similar lengths")
+    parser.add_argument(
+        '--workers', type=int, default=1,
+        help="number of processes for the E-step (needs --engine numpy)")
+    parser.add_argument(
+        '--binary-model', action='store_true',
+        help="save the model in the memory-mappable binary format")
+    parser.add_argument(
+        '--cache-dir',
+        help="cache the tokenized corpus files in this directory")
+    parser.add_argument(
+        '--tokenizer', choices=['nltk', 'regex'], default='nltk',
+        help="'regex' is the NLTK word tokenizer without sentence "
+             "splitting and with fewer regular expressions per sentence. "
+             "Periods inside a line, as after abbreviations, can give "
+             "other tokens than with 'nltk'.")
+    parser.add_argument(
+        '--preprocessing-workers', type=int, default=1,
+        help="number of processes that tokenize the corpus")
+    parser.add_argument(
+        '--max-iterations', type=int, default=3,
+        help="the most EM iterations that are run")
+    parser.add_argument(
+        '--tolerance', type=float,
+        help="stop when the log-likelihood improves by less than this "
+             "fraction, for example 0.001")
+    parser.add_argument(
+        '--training-log',
+        help="append the log-likelihood and the timing of every "
+             "iteration to this file as JSON lines")
+    parser.add_argument(
+        '--init-model',
+        help="start EM from this model instead of uniform probabilities")
+    parser.add_argument(
+        '--checkpoint',
+        help="save checkpoints of the model in this file")
+    parser.add_argument(
+        '--checkpoint-interval', type=int, default=1,
+        help="save a checkpoint every that many iterations")
+    parser.add_argument(
+        '--resume', action='store_true',
+        help="continue the training from the --checkpoint file")
+    parser.add_argument(
+        '--statistics',
+        help="save the expected counts in this file, so that online_em.py "
+             "can update the model with new sentence pairs")
+    parser.add_argument(
+        '--prune-threshold', type=float,
+        help="drop the probabilities below this value from the model")
+    parser.add_argument(
+        '--prune-top-k', type=int,
+        help="keep only the k most probable source words of every "
+             "target word in the model")
+    parser.add_argument(
+        '--prune-every-iteration', action='store_true',
+        help="prune after every EM iteration to bound the memory "
+             "(needs --engine sparse or numpy)")
+    parser.add_argument(
+        '--max-sentence-pairs', type=int, default=3000,
+        help="train on that many sentence pairs, 0 for the whole corpus")
+    parser.add_argument(
+        '--sampling', choices=SAMPLING_METHODS, default='head',
+        help="'head' takes the first sentence pairs, 'random' a uniform "
+             "sample and 'stratified' a sample with the sentence length "
+             "distribution of the corpus")
+    parser.add_argument(
+        '--seed', type=int, default=0,
+        help="seed of the random sampling")
+    parser.add_argument(
+        '--max-length', type=int,
+        help="drop the sentence pairs with a longer sentence")
+    parser.add_argument(
+        '--max-length-ratio', type=float,
+        help="drop the sentence pairs whose longer sentence is more than "
+             "this many times as long as the shorter one")
+    parser.add_argument(
+        '--evaluate-gold', nargs=3,
+        metavar=('GOLD_ALIGNMENTS', 'GOLD_SOURCE', 'GOLD_TARGET'),
+        help="add recall, precision and AER on this gold standard to the "
+             "log of every iteration")
+    parser.add_argument(
+        '--download-tokenizer', action='store_true',
+        help="download the NLTK punkt models before training")
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args(arguments)
+    if args.resume and args.checkpoint is None:
+        parser.error("--resume needs --checkpoint")
+    if args.prune_top_k is not None and args.prune_top_k < 1:
+        parser.error("--prune-top-k must be at least 1")
+    if args.prune_every_iteration and args.engine == 'dense':
+        parser.error("--prune-every-iteration needs --engine sparse or "
+                     "numpy")
+    if args.checkpoint_interval < 1:
+        parser.error("--checkpoint-interval must be at least 1")
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.max_iterations < 1:
+        parser.error("--max-iterations must be at least 1")
+    if args.preprocessing_workers < 1:
+        parser.error("--preprocessing-workers must be at least 1")
+    if args.workers > 1 and args.engine != 'numpy':
+        parser.error("--workers needs --engine numpy")
+    return args
 
 
 if __name__ == '__main__':
-    if len(sys.argv) != 5:
-        sys.exit(f"5 arguments are needed, found {len(sys.argv)}")
-    else:
-        source_language = sys.argv[1]
-        target_language = sys.argv[2]
-        model_probabilities_filename = sys.argv[3]
-        pairs_filename = sys.argv[4]
+    args = parse_arguments(sys.argv[1:])
+    if args.download_tokenizer:
+        download_tokenizer_models()
+    with instrumentation.instrumented(args):
         learn_alignments(
-            source_language,
-            target_language,
-            model_probabilities_filename,
-            pairs_filename
+            args.source_language,
+            args.target_language,
+            args.model_probabilities_filename,
+            args.pairs_filename,
+            engine=args.engine,
+            workers=args.workers,
+            binary_model=args.binary_model,
+            cache_dir=args.cache_dir,
+            tokenizer=args.tokenizer,
+            preprocessing_workers=args.preprocessing_workers,
+            max_iterations=args.max_iterations,
+            tolerance=args.tolerance,
+            training_log=args.training_log,
+            init_model=args.init_model,
+            checkpoint_filename=args.checkpoint,
+            checkpoint_interval=args.checkpoint_interval,
+            resume=args.resume,
+            statistics_filename=args.statistics,
+            prune_threshold=args.prune_threshold,
+            prune_top_k=args.prune_top_k,
+            prune_every_iteration=args.prune_every_iteration,
+            max_sentence_pairs=args.max_sentence_pairs or None,
+            sampling=args.sampling,
+            seed=args.seed,
+            max_length=args.max_length,
+            max_length_ratio=args.max_length_ratio,
+            gold_standard=args.evaluate_gold
         )
@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+# Modulprojekt CLT
+# Authorin: Sandra Sánchez
+# Datum: 17.10.2026
+
+import argparse
+import itertools
+import json
+import math
+import sys
+import time
+
+from learn_alignments import e_step, save_probs_into_file_tab
+from shared_functions import read_parallel_corpus, tokenize_sentence_pairs
+from translation_table import TranslationTable, save_translation_table
+
+# The stored counts are rescaled when the lazy scale factor gets this small
+MINIMUM_SCALE = 1e-100
+
+
+class OnlineEM:
+    """
+    Update an IBM Model 1 with new sentence pairs by stepwise online EM
+    (Liang and Klein, 2009).
+    The sufficient statistics are the expected counts of every word pair
+    per sentence pair. Every batch of new sentence pairs is folded in as
+        mu = (1 - step_size) * mu + step_size * batch_counts
+    with step_size = (updates + 1) ** -step_exponent, and the model is
+    t(s_w, t_w) = mu[(s_w, t_w)] / sum of mu[(_, t_w)].
+    The training corpus counts as as many updates as batches of the size
+    of the first new batch fit into it, so a small batch does not
+    outweigh the corpus the model was trained on.
+    The factor (1 - step_size) is kept in a single scale instead of being
+    multiplied into every count, so an update only touches the pairs
+    of the batch and takes time proportional to the batch.
+    """
+
+    def __init__(self, count, updates=1, scale=1.0, step_exponent=0.7,
+                 sentence_pairs=None):
+        """
+        :param count: dict with items of the form (s_w, t_w) : float,
+            the stored counts, the true counts are scale * count
+        :param updates: int, number of batches in the statistics. None
+            until the first update, which sets it from sentence_pairs.
+        :param scale: float, lazy factor of all the stored counts
+        :param step_exponent: float between 0.5 and 1. With 1 every batch
+            has the same weight, smaller values favour the newer batches.
+        :param sentence_pairs: int, size of the training corpus
+        """
+        self.count = count
+        self.total = {}
+        for (_, t_w), pair_count in count.items():
+            self.total[t_w] = self.total.get(t_w, 0.0) + pair_count
+        self.updates = updates
+        self.sentence_pairs = sentence_pairs
+        self.scale = scale
+        self.step_exponent = step_exponent
+
+    @classmethod
+    def load(cls, statistics_filename, step_exponent=0.7):
+        """Read the statistics written by save()."""
+        with TranslationTable(statistics_filename) as table:
+            count = table.to_dict()
+            metadata = table.metadata
+        return cls(count, metadata['updates'], metadata['scale'],
+                   step_exponent, metadata.get('sentence_pairs'))
+
+    def save(self, statistics_filename):
+        """Write the statistics in the binary model format."""
+        save_translation_table(
+            self.count, statistics_filename,
+            metadata={'statistics': 'expected_counts',
+                      'updates': self.updates, 'scale': self.scale,
+                      'sentence_pairs': self.sentence_pairs})
+
+    def probabilities(self):
+        """
+        :return: dict with items of the form (s_w, t_w) : float
+        """
+        return {(s_w, t_w): pair_count / self.total[t_w]
+                for (s_w, t_w), pair_count in self.count.items()}
+
+    def update(self, sentence_pairs):
+        """
+        Fold a batch of new sentence pairs into the statistics.
+        Word pairs the model does not know yet start with the uniform
+        probability 1/|target_words|, like in learn_alignments.initialise().
+        :param sentence_pairs: list of tuples
+            ([source_sentence], [target_sentence]). An empty batch
+            leaves the statistics unchanged and takes no step.
+        :return: dict that describes the update and can be serialised
+            as JSON
+        """
+        start = time.perf_counter()
+        if not sentence_pairs:
+            return {'update': self.updates, 'sentence_pairs': 0,
+                    'step_size': 0.0, 'log_likelihood': 0.0,
+                    'seconds': time.perf_counter() - start}
+        source_words = set(itertools.chain.from_iterable(
+            source for source, _ in sentence_pairs))
+        target_words = set(itertools.chain.from_iterable(
+            target for _, target in sentence_pairs))
+        uniform_prob = 1 / len(target_words.union(self.total))
+        batch_probs = {}
+        for source_sentence, target_sentence in sentence_pairs:
+            for pair in itertools.product(source_sentence, target_sentence):
+                if pair not in batch_probs:
+                    pair_count = self.count.get(pair)
+                    batch_probs[pair] = uniform_prob if not pair_count \
+                        else pair_count / self.total[pair[1]]
+        batch_count, _, log_likelihood = e_step(
+            batch_probs, sorted(source_words), sorted(target_words),
+            sentence_pairs, sparse=True)
+        if self.updates is None:
+            self.updates = max(
+                1, math.ceil(self.sentence_pairs / len(sentence_pairs)))
+        step_size = (self.updates + 1) ** -self.step_exponent
+        self.scale *= 1 - step_size
+        weight = step_size / len(sentence_pairs) / self.scale
+        for (s_w, t_w), pair_count in batch_count.items():
+            self.count[(s_w, t_w)] = \
+                self.count.get((s_w, t_w), 0.0) + weight * pair_count
+            self.total[t_w] = self.total.get(t_w, 0.0) + weight * pair_count
+        self.updates += 1
+        if self.scale < MINIMUM_SCALE:
+            self.rescale()
+        return {'update': self.updates,
+                'sentence_pairs': len(sentence_pairs),
+                'step_size': step_size, 'log_likelihood': log_likelihood,
+                'seconds': time.perf_counter() - start}
+
+    def rescale(self):
+        """Multiply the scale into the stored counts."""
+        for pair in self.count:
+            self.count[pair] *= self.scale
+        for t_w in self.total:
+            self.total[t_w] *= self.scale
+        self.scale = 1.0
+
+
+def save_statistics(count, number_sentence_pairs, statistics_filename):
+    """
+    Save the expected counts of the last E-step of a batch training as
+    the statistics that OnlineEM starts from.
+    :param count: dict with items of the form (s_w, t_w) : float
+    :param number_sentence_pairs: int, size of the training corpus
+    :param statistics_filename: file
+    :return: None
+    """
+    OnlineEM({pair: pair_count / number_sentence_pairs
+              for pair, pair_count in count.items() if pair_count},
+             updates=None, sentence_pairs=number_sentence_pairs) \
+        .save(statistics_filename)
+
+
+def update_model(source_language, target_language, statistics_filename,
+                 model_probabilities_filename, step_exponent=0.7,
+                 binary_model=False, tokenizer='nltk', prior_updates=None):
+    """
+    Fold new sentence pairs into a model trained with learn_alignments.py
+    --statistics, then save the updated statistics and the new model.
+    :param source_language: file with the new source sentences
+    :param target_language: file with the new target sentences
+    :param statistics_filename: statistics file, it is updated in place
+    :param model_probabilities_filename: file to save the updated model
+    :param step_exponent: float, see OnlineEM
+    :param binary_model: save the model in the binary format
+    :param tokenizer: 'nltk' or 'regex'
+    :param prior_updates: int, number of batches the statistics count
+        as, instead of the training corpus size in batches of this size
+    :return: dict, see OnlineEM.update()
+    """
+    online_em = OnlineEM.load(statistics_filename, step_exponent)
+    if prior_updates is not None:
+        online_em.updates = prior_updates
+    sentence_pairs = list(tokenize_sentence_pairs(
+        read_parallel_corpus(source_language, target_language), tokenizer))
+    record = online_em.update(sentence_pairs)
+    print(json.dumps(record))
+    online_em.save(statistics_filename)
+    if binary_model:
+        save_translation_table(online_em.probabilities(),
+                               model_probabilities_filename)
+    else:
+        save_probs_into_file_tab(online_em.probabilities(),
+                                 model_probabilities_filename)
+    return record
+
+
+def parse_arguments(arguments):
+    """Parse the command line arguments of the model update."""
+    parser = argparse.ArgumentParser(
+        description="Update a model with new sentence pairs by online EM.")
+    parser.add_argument('source_language')
+    parser.add_argument('target_language')
+    parser.add_argument('statistics_filename')
+    parser.add_argument('model_probabilities_filename')
+    parser.add_argument(
+        '--step-exponent', type=float, default=0.7,
+        help="between 0.5 and 1, with 1 every batch has the same weight")
+    parser.add_argument(
+        '--prior-updates', type=int,
+        help="number of batches that the statistics count as. By default "
+             "the training corpus counts as many batches of the size of "
+             "the first new batch.")
+    parser.add_argument(
+        '--binary-model', action='store_true',
+        help="save the model in the memory-mappable binary format")
+    parser.add_argument(
+        '--tokenizer', choices=['nltk', 'regex'], default='nltk')
+    args = parser.parse_args(arguments)
+    if not 0.5 <= args.step_exponent <= 1:
+        parser.error("--step-exponent must be between 0.5 and 1")
+    if args.prior_updates is not None and args.prior_updates < 1:
+        parser.error("--prior-updates must be at least 1")
+    return args
+
+
+if __name__ == '__main__':
+    args = parse_arguments(sys.argv[1:])
+    update_model(
+        args.source_language,
+        args.target_language,
+        args.statistics_filename,
+        args.model_probabilities_filename,
+        step_exponent=args.step_exponent,
+        binary_model=args.binary_model,
+        tokenizer=args.tokenizer,
+        prior_updates=args.prior_updates
+    )
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+# Modulprojekt CLT
+# Authorin: Sandra Sánchez
+# Datum: 17.10.2026
+
+import sys
+from array import array
+
+# Type codes of the token and offset buffers: 4-byte ids, 8-byte offsets
+TOKEN_TYPECODE = 'I'
+OFFSET_TYPECODE = 'q'
+
+
+class Vocabulary:
+    """
+    Every word is stored once, interned, and gets the next free id.
+    """
+    __slots__ = ('words', 'ids')
+
+    def __init__(self, words=()):
+        self.words = []
+        self.ids = {}
+        for word in words:
+            self.add(word)
+
+    def add(self, word):
+        """
+        :param word: str
+        :return: int, the id of the word
+        """
+        word_id = self.ids.get(word)
+        if word_id is None:
+            word_id = len(self.words)
+            word = sys.intern(word)
+            self.words.append(word)
+            self.ids[word] = word_id
+        return word_id
+
+    def sorted_words(self):
+        """
+        :return: list of str in alphabetical order, like
+            learn_alignments.get_unique_words()
+        """
+        return sorted(self.words)
+
+    def __getitem__(self, word_id):
+        return self.words[word_id]
+
+    def __contains__(self, word):
+        return word in self.ids
+
+    def __len__(self):
+        return len(self.words)
+
+
+class SentenceView:
+    """
+    Read-only view of one sentence of a ParallelCorpus.
+    It shares the token buffer of the corpus instead of copying it and
+    behaves like the list of str it replaces: it has a length, can be
+    indexed and iterated, and yields the interned words.
+    Pickling turns it into a list, so views can be sent to a Pool.
+    """
+    __slots__ = ('ids', 'words')
+
+    def __init__(self, ids, words):
+        """
+        :param ids: memoryview of the word ids of the sentence
+        :param words: list of str of the vocabulary
+        """
+        self.ids = ids
+        self.words = words
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return map(self.words.__getitem__, self.ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return SentenceView(self.ids[index], self.words)
+        return self.words[self.ids[index]]
+
+    def __eq__(self, other):
+        if isinstance(other, (SentenceView, list, tuple)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __reduce__(self):
+        return list, (list(self),)
+
+    def __repr__(self):
+        return f"SentenceView({list(self)!r})"
+
+
+class ParallelCorpus:
+    """
+    Compact parallel corpus: two interned vocabularies, the word ids of
+    all sentences in one array('I') per language and the start of every
+    sentence in one offset array per language.
+    A token costs 4 bytes instead of a str object and a list slot, and
+    a sentence 8 bytes instead of a list, so the corpus needs about a
+    tenth of the memory of the lists of str it replaces.
+    Indexing or iterating gives tuples (source_view, target_view) of
+    SentenceView, which the EM trainer and the aligner consume like
+    ([source_sentence], [target_sentence]) tuples.
+    """
+    __slots__ = ('source_vocabulary', 'target_vocabulary',
+                 'source_tokens', 'target_tokens',
+                 'source_offsets', 'target_offsets')
+
+    def __init__(self):
+        self.source_vocabulary = Vocabulary()
+        self.target_vocabulary = Vocabulary()
+        self.source_tokens = array(TOKEN_TYPECODE)
+        self.target_tokens = array(TOKEN_TYPECODE)
+        self.source_offsets = array(OFFSET_TYPECODE, [0])
+        self.target_offsets = array(OFFSET_TYPECODE, [0])
+
+    @classmethod
+    def from_sentence_pairs(cls, sentence_pairs):
+        """
+        Build the corpus from a stream of tokenized sentence pairs.
+        Only the current sentence pair is held as lists of str.
+        :param sentence_pairs: iterable of tuples
+            ([source_sentence], [target_sentence])
+        :return: ParallelCorpus
+        """
+        corpus = cls()
+        for source_sentence, target_sentence in sentence_pairs:
+            corpus.append(source_sentence, target_sentence)
+        return corpus
+
+    def append(self, source_sentence, target_sentence):
+        """
+        Add a sentence pair at the end of the corpus.
+        :param source_sentence: list of str
+        :param target_sentence: list of str
+        :return: None
+        """
+        add_source = self.source_vocabulary.add
+        add_target = self.target_vocabulary.add
+        self.source_tokens.extend(map(add_source, source_sentence))
+        self.target_tokens.extend(map(add_target, target_sentence))
+        self.source_offsets.append(len(self.source_tokens))
+        self.target_offsets.append(len(self.target_tokens))
+
+    def __len__(self):
+        return len(self.source_offsets) - 1
+
+    def __getitem__(self, index):
+        """
+        :param index: int, negative indexes count from the end
+        :return: tuple (source_view, target_view) of SentenceView
+        """
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("sentence pair index out of range")
+        return (
+            SentenceView(memoryview(self.source_tokens)[
+                self.source_offsets[index]:self.source_offsets[index + 1]],
+                self.source_vocabulary.words),
+            SentenceView(memoryview(self.target_tokens)[
+                self.target_offsets[index]:self.target_offsets[index + 1]],
+                self.target_vocabulary.words),
+        )
+
+    def __iter__(self):
+        source_tokens = memoryview(self.source_tokens)
+        target_tokens = memoryview(self.target_tokens)
+        source_words = self.source_vocabulary.words
+        target_words = self.target_vocabulary.words
+        source_offsets = self.source_offsets
+        target_offsets = self.target_offsets
+        for index in range(len(self)):
+            yield (
+                SentenceView(source_tokens[
+                    source_offsets[index]:source_offsets[index + 1]],
+                    source_words),
+                SentenceView(target_tokens[
+                    target_offsets[index]:target_offsets[index + 1]],
+                    target_words),
+            )
+
+    def number_tokens(self):
+        """
+        :return: tuple (source tokens, target tokens) of int
+        """
+        return len(self.source_tokens), len(self.target_tokens)
+
+    def to_arrays(self, source_words, target_words):
+        """
+        Same result as vectorized_em.build_corpus_arrays(), but the ids
+        are translated with one array lookup per language instead of
+        a dict lookup per token.
+        :param source_words: list of str, the id of a word is its index
+        :param target_words: list of str, the id of a word is its index
+        :return: tuple of np.ndarray
+            (source_ids, source_offsets, target_ids, target_offsets)
+        """
+        import numpy as np
+        from vectorized_em import index_dtype
+        arrays = []
+        for vocabulary, tokens, offsets, words in [
+                (self.source_vocabulary, self.source_tokens,
+                 self.source_offsets, source_words),
+                (self.target_vocabulary, self.target_tokens,
+                 self.target_offsets, target_words)]:
+            word_index = {word: index for index, word in enumerate(words)}
+            lookup = np.array([word_index[word] for word in vocabulary.words],
+                              dtype=index_dtype(len(words)))
+            arrays.append(lookup[np.frombuffer(tokens, dtype=np.uint32)]
+                          if len(tokens) else np.zeros(0, lookup.dtype))
+            arrays.append(np.frombuffer(offsets, dtype=np.int64).copy())
+        return tuple(arrays)
+
+    def nbytes(self):
+        """
+        :return: int, bytes of the token and offset buffers, without
+            the vocabularies
+        """
+        return sum(buffer.itemsize * len(buffer) for buffer in (
+            self.source_tokens, self.target_tokens,
+            self.source_offsets, self.target_offsets))
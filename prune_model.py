@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+# Modulprojekt CLT
+# Authorin: Sandra Sánchez
+# Datum: 17.10.2026
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+from evaluate import evaluate
+from learn_alignments import save_probs_into_file_tab
+from translation_table import TranslationTable, is_translation_table, \
+    prune_probabilities, read_probabilities_file, save_translation_table
+
+
+def prune_model(model_filename, pruned_model_filename, threshold=None,
+                top_k=None, renormalize=True):
+    """
+    Prune a model file and save the result in the same format.
+    :param model_filename: binary model or probabilities file
+    :param pruned_model_filename: file for the pruned model
+    :param threshold: float, see translation_table.prune_probabilities()
+    :param top_k: int, see translation_table.prune_probabilities()
+    :param renormalize: bool, see translation_table.prune_probabilities()
+    :return: dict with the number of entries and the file sizes before
+        and after pruning
+    """
+    binary_model = is_translation_table(model_filename)
+    if binary_model:
+        with TranslationTable(model_filename) as table:
+            probabilities = table.to_dict()
+    else:
+        probabilities = read_probabilities_file(model_filename)
+    pruned = prune_probabilities(probabilities, threshold, top_k,
+                                 renormalize)
+    if binary_model:
+        save_translation_table(pruned, pruned_model_filename)
+    else:
+        save_probs_into_file_tab(pruned, pruned_model_filename)
+    return {
+        'entries': len(probabilities),
+        'pruned_entries': len(pruned),
+        'bytes': os.path.getsize(model_filename),
+        'pruned_bytes': os.path.getsize(pruned_model_filename),
+    }
+
+
+def evaluation_impact(model_filename, pruned_model_filename,
+                      gold_alignments_filename,
+                      gold_source_sentences_filename,
+                      gold_target_sentences_filename, tokenizer='nltk'):
+    """
+    Evaluate both models against the gold standard, see evaluate.py.
+    :return: dict with recall, precision and AER of both models
+    """
+    report = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for name, filename in [('original', model_filename),
+                               ('pruned', pruned_model_filename)]:
+            recall_value, precision_value, aer_value = evaluate(
+                gold_alignments_filename, gold_source_sentences_filename,
+                gold_target_sentences_filename, filename,
+                os.path.join(directory, f"{name}_alignments.txt"),
+                tokenizer=tokenizer)
+            report[name] = {'recall': recall_value,
+                            'precision': precision_value,
+                            'aer': aer_value}
+    return report
+
+
+def parse_arguments(arguments):
+    """Parse the command line arguments of the pruning tool."""
+    parser = argparse.ArgumentParser(
+        description="Prune a translation model and report the size "
+                    "reduction and the effect on the evaluation.")
+    parser.add_argument('model_filename')
+    parser.add_argument('pruned_model_filename')
+    parser.add_argument(
+        '--threshold', type=float,
+        help="drop the probabilities below this value")
+    parser.add_argument(
+        '--top-k', type=int,
+        help="keep only the k most probable source words of every "
+             "target word")
+    parser.add_argument(
+        '--no-renormalize', action='store_true',
+        help="keep the probabilities as they are instead of making them "
+             "sum up to 1 for every target word")
+    parser.add_argument(
+        '--gold', nargs=3,
+        metavar=('ALIGNMENTS', 'SOURCE_SENTENCES', 'TARGET_SENTENCES'),
+        help="evaluate both models against these gold standard files, "
+             "with the arguments of evaluate.py")
+    parser.add_argument(
+        '--tokenizer', choices=['nltk', 'regex'], default='nltk')
+    args = parser.parse_args(arguments)
+    if args.threshold is None and args.top_k is None:
+        parser.error("give --threshold, --top-k or both")
+    if args.top_k is not None and args.top_k < 1:
+        parser.error("--top-k must be at least 1")
+    return args
+
+
+if __name__ == '__main__':
+    args = parse_arguments(sys.argv[1:])
+    report = prune_model(args.model_filename, args.pruned_model_filename,
+                         args.threshold, args.top_k,
+                         not args.no_renormalize)
+    if args.gold is not None:
+        report.update(evaluation_impact(
+            args.model_filename, args.pruned_model_filename, *args.gold,
+            tokenizer=args.tokenizer))
+    print(json.dumps(report, indent=2))
@@ -3,9 +3,16 @@
 # Authorin: Sandra Sánchez
 # Datum: 06.04.2022
 
-import operator
+import collections
+import functools
+import itertools
+import re
+from multiprocessing import Pool
 
-from nltk import word_tokenize
+
+import instrumentation
+from corpus_cache import cached_tokenization
+from translation_table import load_translation_probabilities
 
 
 def read_lines_from_file(file_name):
@@ -22,24 +29,292 @@ def read_lines_from_file(file_name):
     return text
 
 
-def clean_corpus_leave_punctuation(corpus, append_null=False):
+def iterate_lines_from_file(file_name):
+    """
+    Read a file line by line without loading it into memory.
+    :param file_name: file
+    :return: generator of str without the new line character
+    """
+    with open(file_name, encoding='utf-8') as file:
+        for line in file:
+            yield line.rstrip('\n')
+
+
+def read_parallel_corpus(source_file_name, target_file_name):
+    """
+    Read two parallel files line by line, zipped.
+    :param source_file_name: file with one source sentence per line
+    :param target_file_name: file with one target sentence per line
+    :return: generator of tuples of str (source_sentence, target_sentence)
+    """
+    return zip(iterate_lines_from_file(source_file_name),
+               iterate_lines_from_file(target_file_name))
+
+
+def tokenize_sentence_pairs(sentence_pairs, tokenizer='nltk', workers=1,
+                            chunk_size=1000):
+    """
+    Lazily tokenize sentence pairs, adding 'NULL' to the source sentence.
+    :param sentence_pairs: iterable of tuples of str
+        Example: ('the house', 'la maison')
+    :param tokenizer: 'nltk' or 'regex', see tokenize_not_remove_punctuation()
+    :param workers: int, when bigger than 1 chunks of sentence pairs are
+        tokenized in a process pool, see map_in_chunks()
+    :param chunk_size: int, number of sentence pairs per chunk
+    :return: generator of tuples of list of str
+        Example: (['NULL', 'the', 'house'], ['la', 'maison'])
+    """
+    return map_in_chunks(
+        functools.partial(tokenize_sentence_pair, tokenizer=tokenizer),
+        sentence_pairs, workers, chunk_size)
+
+
+def tokenize_sentence_pair(sentence_pair, tokenizer='nltk'):
+    """
+    :param sentence_pair: tuple of str. Example: ('the house', 'la maison')
+    :param tokenizer: 'nltk' or 'regex'
+    :return: tuple of list of str
+        Example: (['NULL', 'the', 'house'], ['la', 'maison'])
+    """
+    source_sentence, target_sentence = sentence_pair
+    return (tokenize_not_remove_punctuation(source_sentence,
+                                            append_null=True,
+                                            tokenizer=tokenizer),
+            tokenize_not_remove_punctuation(target_sentence,
+                                            tokenizer=tokenizer))
+
+
+def read_tokenized_parallel_corpus(source_file_name, target_file_name,
+                                   cache_dir, tokenizer='nltk', workers=1):
+    """
+    Same sentence pairs as tokenize_sentence_pairs(read_parallel_corpus()),
+    but the tokenized files are cached in cache_dir, see corpus_cache.py.
+    :param source_file_name: file with one source sentence per line
+    :param target_file_name: file with one target sentence per line
+    :param cache_dir: directory of the cache files
+    :param tokenizer: 'nltk' or 'regex'
+    :param workers: int, processes that tokenize files missing in the cache
+    :return: iterator of tuples of list of str
+        Example: (['NULL', 'the', 'house'], ['la', 'maison'])
+    """
+    return zip(
+        read_tokenized_corpus_file(source_file_name, cache_dir,
+                                   append_null=True, tokenizer=tokenizer,
+                                   workers=workers),
+        read_tokenized_corpus_file(target_file_name, cache_dir,
+                                   tokenizer=tokenizer, workers=workers))
+
+
+def read_tokenized_corpus_file(file_name, cache_dir, append_null=False,
+                               tokenizer='nltk', workers=1):
+    """
+    Tokenize a file with one sentence per line through the cache.
+    :param file_name: file
+    :param cache_dir: directory of the cache files
+    :param append_null: Add token 'NULL' only to Quellsprache sentences.
+    :param tokenizer: 'nltk' or 'regex'
+    :param workers: int, processes that tokenize the file if it is not
+        in the cache yet
+    :return: generator of lists of str
+    """
+    return cached_tokenization(
+        file_name, iterate_lines_from_file,
+        functools.partial(iterate_tokenized_sentences,
+                          append_null=append_null, tokenizer=tokenizer,
+                          workers=workers),
+        tokenizer_settings('lines', append_null, tokenizer), cache_dir)
+
+
+def tokenizer_settings(reader, append_null=False, tokenizer='nltk'):
+    """
+    Describe how a corpus file is read and tokenized, so that cached
+    corpora are invalidated when any of it changes.
+    :param reader: str, name of the function that reads the sentences
+    :param append_null: bool, see tokenize_not_remove_punctuation()
+    :param tokenizer: 'nltk' or 'regex'
+    :return: dict
+    """
+    return {'reader': reader, 'tokenizer': TOKENIZERS[tokenizer],
+            'lowercase': True, 'append_null': append_null}
+
+
+def clean_corpus_leave_punctuation(corpus, append_null=False,
+                                   tokenizer='nltk', workers=1,
+                                   chunk_size=1000):
     """
     Call tokenize() on all the sentences in the corpus.
     :param corpus: list of str
     :param append_null: Add token 'NULL' only to Quellsprache sentences.
+    :param tokenizer: 'nltk' or 'regex', see tokenize_not_remove_punctuation()
+    :param workers: int, when bigger than 1 chunks of the corpus are
+        tokenized in a process pool. The result keeps the corpus order.
+    :param chunk_size: int, number of sentences per chunk
     :return: list of lists of str
     """
-    return [tokenize_not_remove_punctuation(
-        sentence, append_null) for sentence in corpus]
+    return list(iterate_tokenized_sentences(
+        corpus, append_null, tokenizer, workers, chunk_size))
+
+
+def iterate_tokenized_sentences(sentences, append_null=False,
+                                tokenizer='nltk', workers=1,
+                                chunk_size=1000):
+    """
+    Lazy version of clean_corpus_leave_punctuation().
+    :param sentences: iterable of str
+    :return: generator of lists of str
+    """
+    return map_in_chunks(
+        functools.partial(tokenize_not_remove_punctuation,
+                          append_null=append_null, tokenizer=tokenizer),
+        sentences, workers, chunk_size)
+
+
+def map_in_chunks(function, items, workers=1, chunk_size=1000,
+                  max_in_flight=None, initializer=None, initargs=()):
+    """
+    Apply function to every item and yield the results in the order of
+    the items. With several workers the items are sent in chunks to a
+    process pool, so that every task is big enough to pay for the
+    pickling. At most max_in_flight chunks are submitted at the same
+    time: items are not read further until the results of the oldest
+    chunk have been consumed, so a slow consumer does not fill the
+    memory with results.
+    :param function: picklable function of one argument
+    :param items: iterable
+    :param workers: int, number of processes
+    :param chunk_size: int, number of items per chunk
+    :param max_in_flight: int, 2 * workers if None
+    :param initializer: function called with initargs once in every
+        worker before function, or once here with a single worker.
+        Example: load_worker_model()
+    :param initargs: tuple
+    :return: generator
+    """
+    if workers <= 1:
+        if initializer is not None:
+            initializer(*initargs)
+        yield from map(function, items)
+        return
+    if max_in_flight is None:
+        max_in_flight = 2 * workers
+    in_flight = collections.deque()
+    with Pool(workers, initializer, initargs) as pool:
+        for chunk in get_chunks(items, chunk_size):
+            in_flight.append(
+                pool.apply_async(_map_chunk, (function, chunk)))
+            if len(in_flight) == max_in_flight:
+                yield from in_flight.popleft().get()
+        while in_flight:
+            yield from in_flight.popleft().get()
+
+
+def _map_chunk(function, chunk):
+    """Apply function to every item of a chunk in a worker."""
+    return [function(item) for item in chunk]
+
+
+# Names of the tokenizers in the cache key
+TOKENIZERS = {'nltk': 'nltk.word_tokenize', 'regex': 'regex_word_tokenize'}
+
+# Sentences with quotes, apostrophes or runs of commas and colons go
+# through the full NLTK rules, everything else through the few rules below.
+_NEEDS_NLTK_RULES = re.compile(r"[\"'`«»“”‘’„]|[:,][:,]")
+_FINAL_PERIOD = re.compile(r"([^.])(\.)([\]\)}> ]*)\s*$")
+_SEPARATE_PUNCTUATION = re.compile(
+    r"[:,](?!\d)|\.{2,}|--|[;@#$%&?!*\[\](){}<>\u2012-\u2015]")
+_CONTRACTIONS = re.compile(r"(?i)cannot|gimme|gonna|gotta|lemme|wanna")
+# NLTK is only imported when the first sentence is tokenized
+_tokenizers = {}
+
+
+def load_word_tokenize():
+    """
+    Import nltk.word_tokenize() the first time a sentence is tokenized.
+    The punkt models it needs are looked up in the local nltk_data once
+    and never downloaded here, see download_tokenizer_models().
+    :return: function
+    """
+    if 'nltk' not in _tokenizers:
+        import nltk
+        for resource in ('tokenizers/punkt_tab', 'tokenizers/punkt'):
+            try:
+                nltk.data.find(resource)
+                break
+            except LookupError:
+                pass
+        else:
+            raise LookupError(
+                "The NLTK punkt models are not installed. Download them "
+                "once with the --download-tokenizer option, or use "
+                "--tokenizer regex, which does not need them.")
+        _tokenizers['nltk'] = nltk.word_tokenize
+    return _tokenizers['nltk']
+
+
+def load_treebank_tokenizer():
+    """
+    Import the NLTK word tokenizer without sentence splitting, which
+    needs no models, the first time regex_word_tokenize() uses it.
+    :return: nltk.tokenize.destructive.NLTKWordTokenizer
+    """
+    if 'treebank' not in _tokenizers:
+        from nltk.tokenize.destructive import NLTKWordTokenizer
+        _tokenizers['treebank'] = NLTKWordTokenizer()
+    return _tokenizers['treebank']
 
 
-def tokenize_not_remove_punctuation(sentence: str, append_null=False):
+def download_tokenizer_models():
+    """
+    Download the punkt models of nltk.word_tokenize() into nltk_data.
+    This is the only function that connects to the network.
+    :return: None
+    """
+    import nltk
+    # Newer NLTK versions read punkt_tab, older ones punkt
+    for resource in ('punkt_tab', 'punkt'):
+        nltk.download(resource)
+    _tokenizers.pop('nltk', None)
+
+
+def regex_word_tokenize(sentence):
+    """
+    Faster replacement of word_tokenize() for one sentence per line.
+    It gives the same tokens as the NLTK Treebank rules, but runs three
+    regular expressions instead of about thirty on the sentences without
+    quotes or apostrophes, which are most of the corpus.
+    Unlike word_tokenize(), the line is not split into sentences first,
+    so a period is only split from the word at the end of the line.
+    Where punkt finds a sentence end inside the line, for example after
+    an abbreviation like 'sr.', the tokens differ from word_tokenize().
+    :param sentence: str
+    :return: list of str
+    """
+    if _NEEDS_NLTK_RULES.search(sentence):
+        return load_treebank_tokenizer().tokenize(sentence)
+    sentence = _FINAL_PERIOD.sub(r"\1 \2 \3 ", sentence)
+    sentence = _SEPARATE_PUNCTUATION.sub(r" \g<0> ", sentence)
+    if _CONTRACTIONS.search(sentence):
+        sentence = f" {sentence} "
+        for regexp in load_treebank_tokenizer().CONTRACTIONS2:
+            sentence = regexp.sub(r" \1 \2 ", sentence)
+    return sentence.split()
+
+
+def tokenize_not_remove_punctuation(sentence: str, append_null=False,
+                                    tokenizer='nltk'):
     """
     :param sentence: str. Example: 'the blue house'
     :param append_null: Add token 'NULL' only to Quellsprache sentences.
+    :param tokenizer: 'nltk' for word_tokenize(), 'regex' for the faster
+        regex_word_tokenize()
     :return: list of str. Example: ['NULL', 'the', 'blue', 'house']
     """
-    tokens = word_tokenize(sentence)
+    if tokenizer == 'regex':
+        tokens = regex_word_tokenize(sentence)
+    elif tokenizer == 'nltk':
+        tokens = load_word_tokenize()(sentence)
+    else:
+        raise ValueError(f"Unknown tokenizer {tokenizer!r}")
     clean_tokens = [token.lower().strip() for token in tokens]
     if append_null:
         clean_tokens.insert(0, "NULL")
@@ -59,15 +334,23 @@ def get_sentence_pairs(e_tokens, f_tokens):
     return pairs
 
 
-def calculate_word_alignments(probabilities_filename, parallel_corpus):
+def calculate_word_alignments(probabilities_filename, parallel_corpus,
+                              vectorized=False, workers=1, chunk_size=1000):
     """
     Use the trained model to calculate word alignments.
     Read probabilities file and convert each one in a dict entry.
-    Get the word combination with the highest probability and get word indices.
+    Binary models are memory-mapped instead.
+    Align every target word with the source word of highest probability.
     :param probabilities_filename: str with source_word\ttarget_word\tprobability
         Example: 'dreadful	comprobar	0.03160869924509357'
+        or a model in the binary format of translation_table.py
     :param parallel_corpus: list of tuples with
         ([source_sentence], [target_sentence])
+    :param vectorized: bool, when True every sentence is aligned with
+        numpy over its matrix of probabilities
+    :param workers: int, when bigger than 1 chunks of the corpus are
+        aligned in a process pool. Every worker loads the model once.
+    :param chunk_size: int, number of sentence pairs per chunk
     :return: list of str
         Every str represents the word alignments of one sentence.
         Example: in '0-0 1-2' a target sentence would have 2 positions,
@@ -75,57 +358,185 @@ def calculate_word_alignments(probabilities_filename, parallel_corpus):
         word in index 2. Source word with index 1 would not have any
         translation in the target sentence.
     """
-    probs_lines = read_lines_from_file(probabilities_filename)
-    translation_probabilities = {}
-    for prob_string in probs_lines:
-        prob = prob_string.split('\t')
-        translation_probabilities[(prob[0], prob[1])] = float(prob[2])
-    sentences_alignments = []
-    for src_sent, tgt_sent in parallel_corpus:
-        sentence_alignments = []
-        for t_w in tgt_sent:
-            # Get translation probabilities for every sentence pair
-            t_w_possible_translations = []
-            for s_w in src_sent:
-                t_w_index = tgt_sent.index(t_w) + 1
-                # The index of every t_w position starts at 1,
-                # since 0 is reserved for NULL in the source_sentence.
-                s_w_index = src_sent.index(s_w)
-                # Fetch the probabilities that are relevant for our word
-                source_with_target = s_w, t_w
-                try:
-                    probability = translation_probabilities[source_with_target]
-                except KeyError:
-                    probability = 0.0
-                    translation_probabilities[source_with_target] = 0.0
-                src_tgt_w_tuple = \
-                    source_with_target, probability, t_w_index, s_w_index
-                t_w_possible_translations.append(src_tgt_w_tuple)
-                # Collect all possible translations
-            # Sort by highest probability
-            sorted_probabilities = sorted(
-                t_w_possible_translations,
-                key=operator.itemgetter(1),
-                reverse=True
-            )
-            # Get the one with the highest probability
-            word_translation_n_alignment = sorted_probabilities[0]
-            word_alignment = \
-                str(word_translation_n_alignment[2]) \
-                + '-' \
-                + str(word_translation_n_alignment[3])
-            # The first index shown belongs to tgt_word,
-            # second index belongs to src_word
-            sentence_alignments.append(word_alignment)
-            sentence = " ".join(sentence_alignments)
-        sentences_alignments.append(sentence)
-    return sentences_alignments
+    return list(iterate_word_alignments(
+        probabilities_filename, parallel_corpus,
+        vectorized=vectorized, workers=workers, chunk_size=chunk_size))
     # List of strings ['0-0 1-2', '0-0 1-3 2-2', '0-0 1-2']
 
 
+def iterate_word_alignments(probabilities_filename, parallel_corpus,
+                            vectorized=False, workers=1, chunk_size=1000):
+    """
+    Lazy version of calculate_word_alignments().
+    The sentence pairs are consumed and the alignments are produced one
+    by one (a few chunks at a time with several workers, see
+    map_in_chunks()), so a corpus of any size can be aligned into a file.
+    :param parallel_corpus: iterable of tuples with
+        ([source_sentence], [target_sentence])
+    :return: generator of str, one per sentence pair
+    """
+    if workers > 1:
+        yield from map_in_chunks(
+            align_in_worker, parallel_corpus, workers, chunk_size,
+            initializer=load_worker_model,
+            initargs=(probabilities_filename, vectorized))
+        return
+    with instrumentation.timer('model_loading'):
+        translation_probabilities = load_translation_probabilities(
+            probabilities_filename)
+    align = align_sentence_vectorized if vectorized else align_sentence
+    for src_sent, tgt_sent in parallel_corpus:
+        yield align(translation_probabilities, src_sent, tgt_sent)
+
+
+def get_chunks(items, chunk_size):
+    """
+    Group an iterable into lists of at most chunk_size items.
+    :return: generator of lists
+    """
+    iterator = iter(items)
+    chunk = list(itertools.islice(iterator, chunk_size))
+    while chunk:
+        yield chunk
+        chunk = list(itertools.islice(iterator, chunk_size))
+
+
+_worker_model = {}
+
+
+def load_worker_model(probabilities_filename, vectorized=False):
+    """
+    Initializer of map_in_chunks(): load the model once per worker
+    process for align_in_worker().
+    :param probabilities_filename: binary model or probabilities file
+    :param vectorized: bool, align with align_sentence_vectorized()
+    """
+    _worker_model['translation_probabilities'] = \
+        load_translation_probabilities(probabilities_filename)
+    _worker_model['align'] = \
+        align_sentence_vectorized if vectorized else align_sentence
+
+
+def align_in_worker(sentence_pair):
+    """
+    Align a sentence pair with the model of load_worker_model().
+    :param sentence_pair: tuple ([source_sentence], [target_sentence])
+    :return: str. Example: '1-0 2-2'
+    """
+    src_sent, tgt_sent = sentence_pair
+    return _worker_model['align'](
+        _worker_model['translation_probabilities'], src_sent, tgt_sent)
+
+
+def align_sentence(translation_probabilities, src_sent, tgt_sent):
+    """
+    Align every target position with the source position of highest
+    probability. When several source positions have the same probability
+    the first one wins, so unknown words are aligned with 'NULL'.
+    :param translation_probabilities: dict with items of the form
+        (s_w, t_w) : float, or a TranslationTable
+    :param src_sent: list of str, starting with 'NULL'
+    :param tgt_sent: list of str
+    :return: str. Example: '1-0 2-2'
+    """
+    get_probability = translation_probabilities.get
+    sentence_alignments = []
+    # The index of every t_w position starts at 1,
+    # since 0 is reserved for NULL in the source_sentence.
+    for t_w_index, t_w in enumerate(tgt_sent, 1):
+        best_s_w_index = 0
+        best_probability = -1.0
+        for s_w_index, s_w in enumerate(src_sent):
+            probability = get_probability((s_w, t_w), 0.0)
+            if probability > best_probability:
+                best_s_w_index = s_w_index
+                best_probability = probability
+        # The first index shown belongs to tgt_word,
+        # second index belongs to src_word
+        sentence_alignments.append(f"{t_w_index}-{best_s_w_index}")
+    return " ".join(sentence_alignments)
+
+
+def align_sentence_vectorized(translation_probabilities, src_sent, tgt_sent):
+    """
+    Same as align_sentence(), but takes the argmax over the
+    |src_sent| x |tgt_sent| matrix of probabilities with numpy.
+    """
+    best_s_w_indices = probability_matrix(
+        translation_probabilities, src_sent, tgt_sent).argmax(axis=0)
+    return " ".join(f"{t_w_index}-{s_w_index}" for t_w_index, s_w_index
+                    in enumerate(best_s_w_indices.tolist(), 1))
+
+
+def probability_matrix(translation_probabilities, src_sent, tgt_sent):
+    """
+    Get the probabilities of all word pairs of a sentence pair.
+    :return: np.ndarray, rows are source positions and columns are
+        target positions
+    """
+    import numpy as np
+    # TranslationTable and vectorized_em.PairProbabilities look up all
+    # pairs at once
+    if hasattr(translation_probabilities, 'probability_matrix'):
+        return translation_probabilities.probability_matrix(
+            src_sent, tgt_sent)
+    get_probability = translation_probabilities.get
+    return np.array(
+        [[get_probability((s_w, t_w), 0.0) for t_w in tgt_sent]
+         for s_w in src_sent], dtype=np.float64
+    ).reshape(len(src_sent), len(tgt_sent))
+
+
 def save_data(tokens, filename):
     """Save tokens into file, separated by comma."""
     with open(filename, "w") as file:
         tokens_string = ",".join(tokens)
         file.write(tokens_string)
     return file
+
+
+def write_alignments(sentences_alignments, filename,
+                     buffer_size=1024 * 1024):
+    """
+    Stream alignments into a file, one sentence per line, like the
+    Pharaoh/Moses alignment files. Example of a line: '1-0 2-2'
+    :param sentences_alignments: iterable of str, one per sentence
+    :param filename: file
+    :param buffer_size: int, bytes buffered before every write
+    :return: int, number of sentences written
+    """
+    number_sentences = 0
+    with open(filename, "w", encoding='utf-8',
+              buffering=buffer_size) as file:
+        for sentence_alignments in sentences_alignments:
+            file.write(sentence_alignments + "\n")
+            number_sentences += 1
+    return number_sentences
+
+
+def write_alignments_lazily(sentences_alignments, filename,
+                            buffer_size=1024 * 1024):
+    """
+    Same as write_alignments(), but pass every sentence on after writing
+    it, so the alignments can be scored while they are written.
+    The file is complete once the generator is exhausted.
+    :param sentences_alignments: iterable of str, one per sentence
+    :param filename: file
+    :param buffer_size: int, bytes buffered before every write
+    :return: generator of str
+    """
+    with open(filename, "w", encoding='utf-8',
+              buffering=buffer_size) as file:
+        for sentence_alignments in sentences_alignments:
+            file.write(sentence_alignments + "\n")
+            yield sentence_alignments
+
+
+def read_alignments(filename):
+    """
+    Stream the alignments written by write_alignments().
+    :param filename: file
+    :return: generator of str, one per sentence. Example: '1-0 2-2'
+    """
+    for line in iterate_lines_from_file(filename):
+        yield line
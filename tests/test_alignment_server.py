@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+# Modulprojekt CLT
+# Authorin: Sandra Sánchez
+# Datum: 17.10.2026
+
+import io
+import json
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from alignment_server import AlignmentServer, Aligner, MicroBatcher, \
+    handle_request, serve_lines
+from learn_alignments import expectation_maximization_algorithm
+from parallel_corpus import ParallelCorpus
+from shared_functions import calculate_word_alignments
+
+PARALLEL_CORPUS = [
+    (['NULL', 'the', 'house'], ['la', 'maison']),
+    (['NULL', 'the', 'blue', 'house'], ['la', 'maison', 'bleu']),
+    (['NULL', 'the', 'flower'], ['la', 'fleur']),
+]
+
+
+@pytest.fixture
+def model(tmp_path):
+    corpus = ParallelCorpus.from_sentence_pairs(PARALLEL_CORPUS)
+    filename = tmp_path / 'model.txt'
+    expectation_maximization_algorithm(
+        corpus.source_vocabulary.sorted_words(),
+        corpus.target_vocabulary.sorted_words(), corpus, filename)
+    return filename
+
+
+def test_aligner(model):
+    aligner = Aligner(model, tokenizer='regex', cache_size=2)
+    alignments, source_tokens, target_tokens = aligner.align(
+        'The blue house', 'la maison bleu')
+    assert source_tokens == ('NULL', 'the', 'blue', 'house')
+    assert target_tokens == ('la', 'maison', 'bleu')
+    assert alignments == calculate_word_alignments(
+        model, PARALLEL_CORPUS[1:2])[0]
+    aligner.align_batch([('The blue house', 'la maison bleu'),
+                         ('the flower', 'la fleur')])
+    assert aligner.cache_info()['hits'] == 1
+    assert aligner.cache_info()['currsize'] == 2
+
+
+def test_align_batch_keeps_errors_per_sentence_pair(model):
+    aligner = Aligner(model, tokenizer='regex')
+    align = aligner.align
+
+    def fail_on_flowers(source_sentence, target_sentence):
+        if 'flower' in source_sentence:
+            raise LookupError(source_sentence)
+        return align(source_sentence, target_sentence)
+
+    aligner.align = fail_on_flowers
+    results = aligner.align_batch([('the house', 'la maison'),
+                                   ('the flower', 'la fleur')])
+    assert results[0] == align('the house', 'la maison')
+    assert isinstance(results[1], LookupError)
+
+
+def test_handle_request(model):
+    aligner = Aligner(model, tokenizer='regex')
+    response = json.loads(handle_request(
+        '{"id": 7, "source": "the house", "target": "la maison"}',
+        aligner.align))
+    assert response == {'id': 7, 'alignments': aligner.align(
+        'the house', 'la maison')[0], 'source': ['NULL', 'the', 'house'],
+        'target': ['la', 'maison']}
+    assert 'error' in json.loads(handle_request('{"id": 8', aligner.align))
+    assert json.loads(handle_request('{"id": 9, "source": "the house"}',
+                                     aligner.align))['id'] == 9
+
+
+def test_handle_request_logs_unexpected_errors(caplog):
+    def align(source_sentence, target_sentence):
+        raise KeyError(source_sentence)
+
+    response = json.loads(handle_request(
+        '{"id": 3, "source": "the house", "target": "la maison"}', align))
+    assert response == {'id': 3, 'error': "KeyError: 'the house'"}
+    assert 'Request failed' in caplog.text
+    assert 'KeyError' in caplog.text
+
+
+def test_serve_lines(model):
+    input_file = io.StringIO(
+        '{"source": "the house", "target": "la maison"}\n\n'
+        '{"source": "the flower", "target": "la fleur"}\n')
+    output_file = io.StringIO()
+    assert serve_lines(Aligner(model, tokenizer='regex'), input_file,
+                       output_file) == 2
+    responses = [json.loads(line)
+                 for line in output_file.getvalue().splitlines()]
+    assert [response['target'] for response in responses] \
+        == [['la', 'maison'], ['la', 'fleur']]
+
+
+def test_micro_batcher():
+    release = threading.Event()
+
+    def square_all(items):
+        release.wait()
+        return [item * item for item in items]
+
+    batcher = MicroBatcher(square_all, max_batch_size=3, max_delay=0.1)
+    futures = [batcher.submit(item) for item in range(5)]
+    release.set()
+    assert [future.result() for future in futures] == [0, 1, 4, 9, 16]
+    batcher.close()
+    assert sum(batcher.batch_sizes) == 5
+    assert max(batcher.batch_sizes) == 3
+
+
+def test_micro_batcher_fails_only_the_failed_item():
+    release = threading.Event()
+
+    def invert_all(items):
+        release.wait()
+        return [ZeroDivisionError() if item == 0 else 1 / item
+                for item in items]
+
+    batcher = MicroBatcher(invert_all, max_batch_size=3, max_delay=0.1)
+    futures = [batcher.submit(item) for item in [1, 0, 2]]
+    release.set()
+    assert futures[0].result() == 1
+    with pytest.raises(ZeroDivisionError):
+        futures[1].result()
+    assert futures[2].result() == 0.5
+    batcher.close()
+
+
+def test_micro_batcher_does_not_hold_isolated_requests():
+    batcher = MicroBatcher(lambda items: items, max_delay=10)
+    start = time.monotonic()
+    assert batcher.submit(1).result() == 1
+    assert time.monotonic() - start < 1
+    batcher.close()
+
+
+def test_alignment_server(model, tmp_path):
+    aligner = Aligner(model, tokenizer='regex')
+    socket_path = str(tmp_path / 'aligner.sock')
+    server = AlignmentServer(socket_path, aligner, max_delay=0.01)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    def request(sentence_pair):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.connect(socket_path)
+            client.sendall(json.dumps(
+                {'source': sentence_pair[0], 'target': sentence_pair[1]}
+            ).encode('utf-8') + b'\n')
+            return json.loads(client.makefile('rb').readline())
+
+    sentence_pairs = [('the house', 'la maison'), ('the flower', 'la fleur'),
+                      ('the blue house', 'la maison bleu')] * 4
+    try:
+        with ThreadPoolExecutor(4) as executor:
+            responses = list(executor.map(request, sentence_pairs))
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert [response['alignments'] for response in responses] \
+        == [aligner.align(*sentence_pair)[0]
+            for sentence_pair in sentence_pairs]
+    assert sum(server.batcher.batch_sizes) == len(sentence_pairs)
+
+
+def test_alignment_server_answers_invalid_utf8(model, tmp_path):
+    aligner = Aligner(model, tokenizer='regex')
+    socket_path = str(tmp_path / 'aligner.sock')
+    server = AlignmentServer(socket_path, aligner)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.connect(socket_path)
+            client.sendall(b'{"source": "the \xff", "target": "la"}\n'
+                           b'{"source": "the house", "target": "la maison"}'
+                           b'\n')
+            responses = client.makefile('rb')
+            assert 'error' in json.loads(responses.readline())
+            # The connection stays open for the next request
+            assert json.loads(responses.readline())['alignments'] \
+                == aligner.align('the house', 'la maison')[0]
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+# Modulprojekt CLT
+# Authorin: Sandra Sánchez
+# Datum: 17.10.2026
+
+import asyncio
+import time
+
+import pytest
+
+from async_aligner import AsyncAligner, iterate_batches
+from learn_alignments import expectation_maximization_algorithm
+from parallel_corpus import ParallelCorpus
+from shared_functions import calculate_word_alignments
+
+PARALLEL_CORPUS = [
+    (['NULL', 'the', 'house'], ['la', 'maison']),
+    (['NULL', 'the', 'blue', 'house'], ['la', 'maison', 'bleu']),
+    (['NULL', 'the', 'flower'], ['la', 'fleur']),
+]
+SENTENCE_PAIRS = [(' '.join(source[1:]), ' '.join(target))
+                  for source, target in PARALLEL_CORPUS] * 7
+
+
+@pytest.fixture
+def model(tmp_path):
+    corpus = ParallelCorpus.from_sentence_pairs(PARALLEL_CORPUS)
+    filename = tmp_path / 'model.txt'
+    expectation_maximization_algorithm(
+        corpus.source_vocabulary.sorted_words(),
+        corpus.target_vocabulary.sorted_words(), corpus, filename)
+    return filename
+
+
+async def iterate_slowly(items, delay=0.0, reads=None):
+    for item in items:
+        await asyncio.sleep(delay)
+        if reads is not None:
+            reads.append(item)
+        yield item
+
+
+@pytest.mark.parametrize('processes', [False, True])
+def test_align_keeps_order(model, processes):
+    async def align():
+        async with AsyncAligner(model, tokenizer='regex', workers=2,
+                                processes=processes, batch_size=4,
+                                max_in_flight=2) as aligner:
+            return [alignment async for alignment
+                    in aligner.align(iterate_slowly(SENTENCE_PAIRS))]
+
+    assert asyncio.run(align()) == calculate_word_alignments(
+        model, PARALLEL_CORPUS * 7)
+
+
+def test_align_backpressure(model):
+    reads = []
+
+    async def align_first():
+        async with AsyncAligner(model, tokenizer='regex', batch_size=2,
+                                max_in_flight=3) as aligner:
+            alignments = aligner.align(
+                iterate_slowly(SENTENCE_PAIRS, reads=reads))
+            first = await alignments.__anext__()
+            await asyncio.sleep(0.05)
+            await alignments.aclose()
+            return first
+
+    assert asyncio.run(align_first()) == calculate_word_alignments(
+        model, PARALLEL_CORPUS[:1])[0]
+    # Three batches are submitted before the first alignment is yielded
+    assert len(reads) == 6
+
+
+def test_iterate_batches_max_delay():
+    async def collect():
+        items = iterate_slowly(range(3), delay=0.05)
+        return [batch async for batch
+                in iterate_batches(items, 10, max_delay=0.01)]
+
+    assert asyncio.run(collect()) == [[0], [1], [2]]
+
+
+def test_align_sentence_pair(model):
+    async def align():
+        async with AsyncAligner(model, tokenizer='regex') as aligner:
+            return await aligner.align_sentence_pair('the flower',
+                                                     'la fleur')
+
+    assert asyncio.run(align()) == calculate_word_alignments(
+        model, PARALLEL_CORPUS[2:])[0]
+
+
+def test_close_does_not_block_the_event_loop(model):
+    ticks = []
+
+    async def tick():
+        while True:
+            ticks.append(time.monotonic())
+            await asyncio.sleep(0.01)
+
+    def align_slowly(chunk):
+        time.sleep(0.3)
+        return ['' for _ in chunk]
+
+    async def close_while_aligning():
+        aligner = AsyncAligner(model, tokenizer='regex')
+        aligner._align_chunk = align_slowly
+        alignment = asyncio.ensure_future(
+            aligner.align_sentence_pair('the flower', 'la fleur'))
+        await asyncio.sleep(0.05)
+        ticker = asyncio.ensure_future(tick())
+        start = time.monotonic()
+        await aligner.close()
+        ticker.cancel()
+        await alignment
+        return [moment for moment in ticks if moment > start]
+
+    # The loop kept ticking while close() waited for the slow batch
+    assert len(asyncio.run(close_while_aligning())) > 5
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+# Modulprojekt CLT
+# Authorin: Sandra Sánchez
+# Datum: 17.10.2026
+
+from benchmark import compare_with_baseline, generate_corpus, run_benchmark
+
+
+def test_generate_corpus(tmp_path):
+    filenames = generate_corpus(tmp_path, sentence_pairs=50,
+                                vocabulary_size=20, sentence_length=5,
+                                gold_sentence_pairs=10)
+    with open(filenames['source']) as source_file, \
+            open(filenames['target']) as target_file:
+        source = source_file.read().splitlines()
+        target = target_file.read().splitlines()
+    assert len(source) == len(target) == 50
+    with open(filenames['gold_source']) as file:
+        gold_source = file.read().splitlines()
+    assert gold_source[0] == f"<s snum=1> {source[0]} </s>"
+    assert len(gold_source) == 10
+    with open(filenames['gold_alignments']) as file:
+        sentence, source_position, target_position, sure = \
+            file.readline().split()
+    assert (sentence, sure) == ('1', 'S')
+    assert 1 <= int(source_position) <= len(source[0].split())
+    assert 1 <= int(target_position) <= len(target[0].split())
+    other_directory = tmp_path / 'other'
+    other_directory.mkdir()
+    same_seed = generate_corpus(other_directory, sentence_pairs=50,
+                                vocabulary_size=20, sentence_length=5,
+                                gold_sentence_pairs=10)
+    with open(same_seed['source']) as file:
+        assert file.read().splitlines() == source
+
+
+def test_run_benchmark(tmp_path):
+    results = run_benchmark(tmp_path, sentence_pairs=30, vocabulary_size=20,
+                            sentence_length=5, gold_sentence_pairs=10,
+                            max_iterations=2)
+    assert set(results['phases']) == {'learn', 'align', 'evaluate'}
+    for phase in results['phases'].values():
+        assert phase['wall_seconds'] > 0
+        assert phase['peak_rss_mb'] > 0
+        assert phase['sentences_per_second'] > 0
+    assert [record['iteration'] for record
+            in results['phases']['learn']['em_iterations']] == [1, 2]
+    assert 0 <= results['phases']['evaluate']['aer'] <= 1
+
+
+def test_compare_with_baseline():
+    baseline = {'configuration': {}, 'phases': {
+        'learn': {'wall_seconds': 10.0, 'peak_rss_mb': 100.0},
+        'align': {'wall_seconds': 2.0, 'peak_rss_mb': 50.0}}}
+    results = {'configuration': {}, 'phases': {
+        'learn': {'wall_seconds': 10.5, 'peak_rss_mb': 150.0},
+        'align': {'wall_seconds': 1.0, 'peak_rss_mb': 50.0},
+        'evaluate': {'wall_seconds': 1.0, 'peak_rss_mb': 50.0}}}
+    comparison = compare_with_baseline(results, baseline, tolerance=0.1)
+    assert comparison['regressions'] == ['learn peak_rss_mb']
+    assert comparison['phases']['align'] == {'wall_seconds': 0.5,
+                                             'peak_rss_mb': 1.0}
+    assert 'evaluate' not in comparison['phases']
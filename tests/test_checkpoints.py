@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+# Modulprojekt CLT
+# Authorin: Sandra Sánchez
+# Datum: 17.10.2026
+
+import pytest
+
+from checkpoints import CheckpointWriter, load_checkpoint
+from learn_alignments import expectation_maximization_algorithm
+
+PARALLEL_CORPUS = [
+    (['NULL', 'the', 'house'], ['la', 'maison']),
+    (['NULL', 'the', 'blue', 'house'], ['la', 'maison', 'bleu']),
+    (['NULL', 'the', 'flower'], ['la', 'fleur']),
+]
+SOURCE_WORDS = ['NULL', 'blue', 'flower', 'house', 'the']
+TARGET_WORDS = ['bleu', 'fleur', 'la', 'maison']
+
+
+def train(tmp_path, engine, **kwargs):
+    return expectation_maximization_algorithm(
+        SOURCE_WORDS, TARGET_WORDS, PARALLEL_CORPUS,
+        filename=tmp_path / 'model.txt', engine=engine, **kwargs)
+
+
+def test_checkpoint_writer(tmp_path):
+    filename = tmp_path / 'checkpoint.bin'
+    assert load_checkpoint(filename) is None
+    with CheckpointWriter(filename) as writer:
+        writer.save(lambda: {('the', 'la'): 0.5}, {'iteration': 1})
+        writer.save(lambda: {('the', 'la'): 0.75}, {'iteration': 2})
+    assert load_checkpoint(filename) == ({('the', 'la'): 0.75},
+                                         {'iteration': 2})
+    assert list(tmp_path.iterdir()) == [filename]
+
+
+@pytest.mark.parametrize('engine', ['dense', 'sparse', 'numpy'])
+def test_resume_gives_the_same_model(tmp_path, engine):
+    uninterrupted = train(tmp_path, engine, max_iterations=5)
+    checkpoint = tmp_path / 'checkpoint.bin'
+    train(tmp_path, engine, max_iterations=2,
+          checkpoint_filename=checkpoint)
+    assert load_checkpoint(checkpoint)[1]['iteration'] == 2
+    resumed = train(tmp_path, engine, max_iterations=5,
+                    checkpoint_filename=checkpoint, checkpoint_interval=2,
+                    resume=True)
+    assert resumed == uninterrupted
+    assert load_checkpoint(checkpoint)[1]['iteration'] == 5
+
+
+@pytest.mark.parametrize('engine', ['dense', 'sparse', 'numpy'])
+def test_warm_start(tmp_path, engine):
+    smaller_model = expectation_maximization_algorithm(
+        ['NULL', 'house', 'the'], ['la', 'maison'], PARALLEL_CORPUS[:1],
+        filename=tmp_path / 'smaller.txt', engine=engine, max_iterations=1)
+    warm = train(tmp_path, engine, max_iterations=0,
+                 initial_probabilities=smaller_model)
+    for pair, prob in warm.items():
+        assert prob == smaller_model.get(pair, 1 / len(TARGET_WORDS))
+
+
+@pytest.mark.parametrize('engine', ['dense', 'sparse', 'numpy', 'bucketed'])
+def test_warm_start_from_dense_model(tmp_path, engine):
+    # The dense model has probability 0.0 for the pairs that never
+    # co-occurred, so 'blue' has no probability with 'fleur' at all
+    dense_model = train(tmp_path, 'dense', max_iterations=2)
+    parallel_corpus = PARALLEL_CORPUS + [(['NULL', 'blue'], ['fleur'])]
+    warm = expectation_maximization_algorithm(
+        SOURCE_WORDS, TARGET_WORDS, parallel_corpus,
+        filename=tmp_path / 'warm.txt', engine=engine, max_iterations=2,
+        initial_probabilities=dense_model)
+    expected = expectation_maximization_algorithm(
+        SOURCE_WORDS, TARGET_WORDS, parallel_corpus,
+        filename=tmp_path / 'expected.txt', engine='sparse',
+        max_iterations=2, initial_probabilities=dense_model)
+    assert all(prob == prob for prob in warm.values())
+    for pair, prob in expected.items():
+        assert warm[pair] == pytest.approx(prob)
+
+
+@pytest.mark.parametrize('engine', ['sparse', 'numpy', 'bucketed'])
+def test_resume_after_pruning(tmp_path, engine):
+    uninterrupted = train(tmp_path, engine, max_iterations=4,
+                          prune_every_iteration=True, prune_threshold=0.3)
+    checkpoint = tmp_path / 'checkpoint.bin'
+    train(tmp_path, engine, max_iterations=2, prune_every_iteration=True,
+          prune_threshold=0.3, checkpoint_filename=checkpoint)
+    resumed = train(tmp_path, engine, max_iterations=4,
+                    prune_every_iteration=True, prune_threshold=0.3,
+                    checkpoint_filename=checkpoint, resume=True)
+    assert resumed.keys() == uninterrupted.keys()
+    for pair, prob in uninterrupted.items():
+        assert resumed[pair] == pytest.approx(prob)
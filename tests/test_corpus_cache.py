@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+# Modulprojekt CLT
+# Authorin: Sandra Sánchez
+# Datum: 17.10.2026
+
+from corpus_cache \
+    import cached_tokenization, read_tokenized_corpus, \
+    write_tokenized_corpus
+from shared_functions import iterate_lines_from_file
+
+
+def test_write_and_read_tokenized_corpus(tmp_path):
+    sentences = [['NULL', 'the', 'house'], [], ['NULL', 'señor', 'the']]
+    write_tokenized_corpus(iter(sentences), tmp_path / 'corpus.tok')
+    assert list(read_tokenized_corpus(tmp_path / 'corpus.tok')) == sentences
+    assert list(tmp_path.iterdir()) == [tmp_path / 'corpus.tok']
+
+
+def test_cached_tokenization(tmp_path):
+    corpus_file = tmp_path / 'corpus.txt'
+    corpus_file.write_text('the house\nthe blue house\n')
+    tokenized = []
+
+    def tokenize(sentences):
+        for sentence in sentences:
+            tokenized.append(sentence)
+            yield sentence.split()
+
+    def tokenize_corpus(settings):
+        return list(cached_tokenization(
+            corpus_file, iterate_lines_from_file, tokenize, settings,
+            tmp_path / 'cache'))
+
+    expected = [['the', 'house'], ['the', 'blue', 'house']]
+    assert tokenize_corpus({'tokenizer': 'split'}) == expected
+    assert tokenize_corpus({'tokenizer': 'split'}) == expected
+    assert len(tokenized) == 2
+    # Other settings and other file contents are new cache entries
+    assert tokenize_corpus({'tokenizer': 'other'}) == expected
+    assert len(tokenized) == 4
+    corpus_file.write_text('the flower\n')
+    assert tokenize_corpus({'tokenizer': 'split'}) == [['the', 'flower']]
+    assert len(tokenized) == 5
+    assert len(list((tmp_path / 'cache').iterdir())) == 3
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+# Modulprojekt CLT
+# Authorin: Sandra Sánchez
+# Datum: 17.10.2026
+
+import collections
+
+import pytest
+
+from corpus_sampling import count_words, filter_sentence_pairs, \
+    reservoir_sample, sample_sentence_pairs, stratified_sample
+from learn_alignments import learn_alignments
+
+
+def test_filter_sentence_pairs():
+    sentence_pairs = [('a b c', 'x y z'), ('a ' * 50, 'x ' * 50),
+                      ('a', 'x y z w v'), ('a b', ''), ('a b', 'x y')]
+    assert list(filter_sentence_pairs(
+        sentence_pairs, max_length=10, max_length_ratio=3,
+        length=count_words)) == [('a b c', 'x y z'), ('a b', 'x y')]
+    assert len(list(filter_sentence_pairs(
+        sentence_pairs, max_length=10, length=count_words))) == 4
+
+
+def test_reservoir_sample():
+    sample = reservoir_sample(iter(range(10000)), 100, seed=1)
+    assert len(sample) == 100
+    assert sample == sorted(sample)
+    assert len(set(sample)) == 100
+    assert sample == reservoir_sample(range(10000), 100, seed=1)
+    assert sample != reservoir_sample(range(10000), 100, seed=2)
+    assert reservoir_sample(range(5), 100) == [0, 1, 2, 3, 4]
+    assert reservoir_sample(range(5), 0) == []
+
+
+def test_reservoir_sample_is_uniform():
+    frequencies = collections.Counter()
+    for seed in range(2000):
+        frequencies.update(reservoir_sample(range(20), 5, seed))
+    # Every item is expected 500 times
+    assert all(400 < frequency < 600 for frequency in frequencies.values())
+
+
+def test_stratified_sample():
+    sentence_pairs = [(['w'] * (5 if index % 4 else 50), ['w'])
+                      for index in range(1000)]
+    sample = stratified_sample(sentence_pairs, 100, seed=3)
+    assert len(sample) == 100
+    lengths = collections.Counter(len(source) for source, _ in sample)
+    assert lengths == {5: 75, 50: 25}
+    assert stratified_sample(sentence_pairs[:50], 100) == sentence_pairs[:50]
+
+
+def test_sample_sentence_pairs():
+    sentence_pairs = [(str(index), str(index)) for index in range(100)]
+    assert list(sample_sentence_pairs(iter(sentence_pairs), 10)) \
+        == sentence_pairs[:10]
+    assert len(sample_sentence_pairs(sentence_pairs, 10, 'random')) == 10
+    with pytest.raises(ValueError):
+        sample_sentence_pairs(sentence_pairs, 10, 'systematic')
+
+
+def test_cache_dir_keeps_the_length_filter(tmp_path):
+    # 'the house.' has two words, but four tokens with 'NULL' and '.'
+    (tmp_path / 'source.txt').write_text(
+        'the house.\nthe blue house\nthe flower\n')
+    (tmp_path / 'target.txt').write_text(
+        'la maison.\nla maison bleu\nla fleur\n')
+    pairs = []
+    for cache_dir in [None, tmp_path / 'cache', tmp_path / 'cache']:
+        learn_alignments(
+            tmp_path / 'source.txt', tmp_path / 'target.txt',
+            tmp_path / 'model.txt', tmp_path / 'pairs.txt',
+            cache_dir=cache_dir, tokenizer='regex', max_iterations=1,
+            max_length=2, sampling='stratified')
+        pairs.append((tmp_path / 'pairs.txt').read_text())
+    assert pairs[0] == 'NULL the house .\nla maison .\n' \
+                       'NULL the flower\nla fleur\n'
+    assert pairs[1] == pairs[0]
+    assert pairs[2] == pairs[0]
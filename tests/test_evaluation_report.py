@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+# Modulprojekt CLT
+# Authorin: Sandra Sánchez
+# Datum: 17.10.2026
+
+import csv
+
+import pytest
+
+from evaluate import AlignmentCounts, iterate_gold_alignment_sets, \
+    score_alignments
+from evaluation_report import evaluation_report, length_bucket, \
+    report_alignments, score_sentence_pair
+
+GOLD_LINES = ['1 1 1 S', '1 2 2 S', '1 3 2 P',
+              '2 1 2 S', '2 2 1 P']
+SOURCE_SENTENCES = [['NULL', 'the', 'blue', 'house'],
+                    ['NULL', 'the', 'flower']]
+TARGET_SENTENCES = [['la', 'maison', 'bleu'], ['la', 'fleur']]
+CALCULATED_ALIGNMENTS = ['1-1 2-3 3-0', '1-2 2-1']
+
+
+def test_length_bucket():
+    assert length_bucket(0) == '0-10'
+    assert length_bucket(10) == '0-10'
+    assert length_bucket(11) == '11-20'
+    assert length_bucket(60) == '41-60'
+    assert length_bucket(61) == '61+'
+
+
+def test_score_sentence_pair():
+    sure, possible = next(iterate_gold_alignment_sets(GOLD_LINES))
+    sentence_report = score_sentence_pair(
+        (1, SOURCE_SENTENCES[0], TARGET_SENTENCES[0], (sure, possible),
+         CALCULATED_ALIGNMENTS[0]))
+    assert sentence_report.source_length == 3
+    assert sentence_report.target_length == 3
+    # Target position 3 has no gold alignment, so it belongs to 'NULL'
+    assert sentence_report.null_counts == AlignmentCounts(1, 1, 1, 1)
+    assert sentence_report.word_counts == AlignmentCounts(1, 2, 2, 2)
+    assert sentence_report.errors == {('missed', 'blue', 'maison'): 1}
+
+
+def test_report_alignments_totals():
+    expected = score_alignments(iterate_gold_alignment_sets(GOLD_LINES),
+                                CALCULATED_ALIGNMENTS)
+    report = report_alignments(iterate_gold_alignment_sets(GOLD_LINES),
+                               SOURCE_SENTENCES, TARGET_SENTENCES,
+                               CALCULATED_ALIGNMENTS)
+    assert report.total() == expected
+    assert [sentence_report.counts() for sentence_report
+            in report.sentences] == [AlignmentCounts(2, 3, 3, 3),
+                                     AlignmentCounts(1, 2, 2, 1)]
+    assert report.breakdown_rows()[0][:7] == ['all', 'all', 2, *expected]
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_write_csv(tmp_path, workers):
+    report = report_alignments(iterate_gold_alignment_sets(GOLD_LINES),
+                               SOURCE_SENTENCES, TARGET_SENTENCES,
+                               CALCULATED_ALIGNMENTS, workers=workers,
+                               chunk_size=1)
+    report.write_csv(tmp_path / 'report', top_errors=1)
+    with open(tmp_path / 'report' / 'sentences.csv',
+              encoding='utf-8') as file:
+        sentences = list(csv.DictReader(file))
+    assert [row['sentence'] for row in sentences] == ['1', '2']
+    assert float(sentences[1]['precision']) == 1.0
+    with open(tmp_path / 'report' / 'breakdown.csv',
+              encoding='utf-8') as file:
+        breakdown = list(csv.DictReader(file))
+    assert [(row['group'], row['value']) for row in breakdown] == [
+        ('all', 'all'), ('alignment', 'null'), ('alignment', 'word'),
+        ('length', '0-10')]
+    assert breakdown[1]['sure'] == '1'
+    with open(tmp_path / 'report' / 'errors.csv',
+              encoding='utf-8') as file:
+        errors = list(csv.DictReader(file))
+    assert errors == [{'error': 'missed', 'source_word': 'blue',
+                       'target_word': 'maison', 'count': '1'}]
+
+
+def test_evaluation_report_workers(tmp_path):
+    reports = [evaluation_report(
+        '../gold_standard/goldstandard_en_es.txt', '1-100-final.en',
+        '1-100-final.es', 'TEST_tiny_probs_expected.txt',
+        tmp_path / str(workers), tokenizer='regex', workers=workers)
+        for workers in [1, 2]]
+    assert len(reports[0].sentences) == 100
+    assert reports[1].total() == reports[0].total()
+    assert reports[1].sentences == reports[0].sentences
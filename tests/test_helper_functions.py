@@ -3,19 +3,40 @@
 # Authorin: Sandra Sánchez
 # Datum: 07.04.2022
 
+import json
+import math
+
+import numpy as np
+import pytest
+from nltk.tokenize.destructive import NLTKWordTokenizer
+
 from evaluate\
     import get_gold_alignments, read_and_preprocess_gold_sentences, \
+    read_gold_sentences, \
     reverse_indexes, add_missing_null_alignments_to_goldstandard, \
     get_possible_matches, get_sure_matches, \
     count_sure_alignments_in_gold_standard, \
     count_all_calculated_alignments, precision, \
-    recall, alignment_error_rate
+    recall, alignment_error_rate, iterate_gold_alignment_sets, \
+    score_alignments, AlignmentCounts, evaluate, \
+    iterate_preprocessed_gold_sentences, make_gold_evaluation_callback
 from learn_alignments \
     import expectation_maximization_algorithm, initialise, \
-    save_probs_into_file_tab
+    initialise_sparse, save_probs_into_file_tab, get_unique_words
 from shared_functions \
     import tokenize_not_remove_punctuation, \
-    clean_corpus_leave_punctuation, read_lines_from_file
+    clean_corpus_leave_punctuation, read_lines_from_file, \
+    read_parallel_corpus, align_sentence, align_sentence_vectorized, \
+    calculate_word_alignments, get_chunks, map_in_chunks, \
+    write_alignments, read_alignments, iterate_word_alignments, \
+    regex_word_tokenize, \
+    tokenize_sentence_pairs, probability_matrix
+from translation_table import TranslationTable, save_translation_table, \
+    prune_probabilities
+from vectorized_em import build_corpus_arrays, build_links, padded_length, \
+    shard_boundaries, initialise as initialise_vectorized, \
+    PairProbabilities, probabilities_to_dict, e_step as vectorized_e_step, \
+    m_step as vectorized_m_step, prune as vectorized_prune
 
 
 class TestsGolden:
@@ -73,12 +94,56 @@ def test_clean_corpus_leave_punctuation():
     assert actual == expected
 
 
+def test_regex_word_tokenize_gives_nltk_tokens():
+    sentences = read_gold_sentences('../gold_standard/1-100-final.en') \
+        + read_gold_sentences('../gold_standard/1-100-final.es') + [
+            'I cannot say: 3,000 euros, 10:30 (roughly)...',
+            'Is it -- really -- over?! 50% & more; end. )',
+            'He said "wanna go" and it\'s done.', 'a,,b', '.', '']
+    nltk_tokenizer = NLTKWordTokenizer()
+    for sentence in sentences:
+        assert regex_word_tokenize(sentence) == \
+            nltk_tokenizer.tokenize(sentence)
+
+
+def test_clean_corpus_leave_punctuation_workers():
+    corpus = ['The house is blue.', 'the houses.', 'Cannot, gonna!'] * 5
+    expected = [['NULL', 'the', 'house', 'is', 'blue', '.'],
+                ['NULL', 'the', 'houses', '.'],
+                ['NULL', 'can', 'not', ',', 'gon', 'na', '!']] * 5
+    assert clean_corpus_leave_punctuation(
+        corpus, append_null=True, tokenizer='regex') == expected
+    assert clean_corpus_leave_punctuation(
+        corpus, append_null=True, tokenizer='regex', workers=2,
+        chunk_size=4) == expected
+
+
+def test_tokenize_sentence_pairs_workers():
+    pairs = [('the house', 'la maison'), ('the flower.', 'la fleur.')] * 3
+    expected = [(['NULL', 'the', 'house'], ['la', 'maison']),
+                (['NULL', 'the', 'flower', '.'], ['la', 'fleur', '.'])] * 3
+    assert list(tokenize_sentence_pairs(
+        iter(pairs), tokenizer='regex', workers=2, chunk_size=2)) == expected
+
+
+def test_tokenize_not_remove_punctuation_unknown_tokenizer():
+    with pytest.raises(ValueError):
+        tokenize_not_remove_punctuation('the house', tokenizer='spaces')
+
+
 def test_read_lines_from_file():
     actual = read_lines_from_file('../gold_standard/goldstandard_en_es.txt')
     assert actual[0] == '1 4 5 S'
     assert actual[-1] == '100 2 2 P'
 
 
+def test_read_parallel_corpus():
+    actual = read_parallel_corpus('src_en_TEST.txt', 'tgt_fr_TEST.txt')
+    assert next(actual) == ('the house', 'la maison')
+    assert list(actual) == [('the blue house', 'la maison bleu'),
+                            ('the flower', 'la fleur')]
+
+
 def test_expectation_maximization_algorithm():
     expectation_maximization_algorithm(
         source_words=['NULL', 'the', 'blue', 'house', 'flower'],
@@ -104,6 +169,296 @@ def test_expectation_maximization_algorithm():
         assert actual == expected
 
 
+def test_expectation_maximization_algorithm_sparse(tmp_path):
+    parallel_corpus = [
+        (['NULL', 'the', 'house'], ['la', 'maison']),
+        (['NULL', 'the', 'blue', 'house'], ['la', 'maison', 'bleu']),
+        (['NULL', 'the', 'flower'], ['la', 'fleur']),
+    ]
+    source_words = ['NULL', 'the', 'blue', 'house', 'flower']
+    target_words = ['la', 'maison', 'bleu', 'fleur']
+    dense = expectation_maximization_algorithm(
+        source_words, target_words, parallel_corpus,
+        filename=tmp_path / 'dense.txt')
+    sparse = expectation_maximization_algorithm(
+        source_words, target_words, parallel_corpus,
+        filename=tmp_path / 'sparse.txt', engine='sparse')
+    assert ('flower', 'bleu') in dense
+    assert ('flower', 'bleu') not in sparse
+    assert sparse == {pair: prob for pair, prob in dense.items()
+                      if pair in sparse}
+    dense_lines = (tmp_path / 'dense.txt').read_text().split('\n')
+    sparse_lines = (tmp_path / 'sparse.txt').read_text().split('\n')
+    assert sparse_lines == [line for line in dense_lines
+                            if tuple(line.split('\t')[:2]) in sparse]
+
+
+def test_expectation_maximization_algorithm_convergence(tmp_path):
+    parallel_corpus = [
+        (['NULL', 'the', 'house'], ['la', 'maison']),
+        (['NULL', 'the', 'blue', 'house'], ['la', 'maison', 'bleu']),
+        (['NULL', 'the', 'flower'], ['la', 'fleur']),
+    ]
+    source_words = ['NULL', 'the', 'blue', 'house', 'flower']
+    target_words = ['la', 'maison', 'bleu', 'fleur']
+    logs = {}
+    for engine in ['dense', 'sparse', 'numpy']:
+        expectation_maximization_algorithm(
+            source_words, target_words, parallel_corpus,
+            filename=tmp_path / 'model.txt', engine=engine,
+            max_iterations=100, tolerance=1e-3,
+            training_log=tmp_path / f'{engine}.jsonl')
+        with open(tmp_path / f'{engine}.jsonl') as file:
+            logs[engine] = [json.loads(line) for line in file]
+    records = logs['dense']
+    # The first iteration starts from uniform probabilities 1/4
+    assert records[0]['log_likelihood'] == pytest.approx(-10 * math.log(4))
+    assert records[0]['perplexity'] == pytest.approx(4)
+    assert records[0]['relative_improvement'] is None
+    log_likelihoods = [record['log_likelihood'] for record in records]
+    assert log_likelihoods == sorted(log_likelihoods)
+    assert 2 < len(records) < 100
+    assert records[-1]['relative_improvement'] < 1e-3
+    assert all(record['relative_improvement'] >= 1e-3
+               for record in records[1:-1])
+    for engine in ['sparse', 'numpy']:
+        assert [record['log_likelihood'] for record in logs[engine]] == \
+            pytest.approx(log_likelihoods)
+
+
+def test_expectation_maximization_algorithm_numpy(tmp_path):
+    parallel_corpus = [
+        (['NULL', 'the', 'house'], ['la', 'maison']),
+        (['NULL', 'the', 'blue', 'house'], ['la', 'maison', 'bleu']),
+        (['NULL', 'the', 'flower'], ['la', 'fleur']),
+        (['NULL', 'the', 'the', 'house'], ['la', 'la', 'maison']),
+    ]
+    source_words = ['NULL', 'blue', 'flower', 'house', 'the']
+    target_words = ['bleu', 'fleur', 'la', 'maison']
+    sparse = expectation_maximization_algorithm(
+        source_words, target_words, parallel_corpus,
+        filename=tmp_path / 'sparse.txt', engine='sparse')
+    vectorized = expectation_maximization_algorithm(
+        source_words, target_words, parallel_corpus,
+        filename=tmp_path / 'numpy.txt', engine='numpy')
+    assert list(vectorized) == list(sparse)
+    for pair, prob in sparse.items():
+        assert vectorized[pair] == pytest.approx(prob, rel=1e-12)
+
+
+def test_expectation_maximization_algorithm_bucketed(tmp_path):
+    parallel_corpus = [
+        (['NULL', 'the', 'house'], ['la', 'maison']),
+        (['NULL', 'the', 'blue', 'house'], ['la', 'maison', 'bleu']),
+        (['NULL', 'the', 'flower'], []),
+        (['NULL'] + ['the', 'blue', 'flower', 'house'] * 3,
+         ['la', 'fleur', 'bleu', 'maison', 'la'] * 2),
+        (['NULL', 'the', 'the', 'house'], ['la', 'la', 'maison']),
+    ]
+    source_words = ['NULL', 'blue', 'flower', 'house', 'the']
+    target_words = ['bleu', 'fleur', 'la', 'maison']
+    logs = {}
+    models = {}
+    for engine in ['numpy', 'bucketed']:
+        models[engine] = expectation_maximization_algorithm(
+            source_words, target_words, parallel_corpus,
+            filename=tmp_path / f'{engine}.txt', engine=engine,
+            training_log=tmp_path / f'{engine}.jsonl')
+        with open(tmp_path / f'{engine}.jsonl') as file:
+            logs[engine] = [json.loads(line)['log_likelihood']
+                            for line in file]
+    assert list(models['bucketed']) == list(models['numpy'])
+    for pair, prob in models['numpy'].items():
+        assert models['bucketed'][pair] == pytest.approx(prob, rel=1e-12)
+    assert logs['bucketed'] == pytest.approx(logs['numpy'], rel=1e-12)
+
+
+@pytest.mark.parametrize('engine', ['sparse', 'numpy'])
+def test_expectation_maximization_algorithm_evaluation_callback(
+        tmp_path, engine):
+    gold_files = ('../gold_standard/goldstandard_en_es.txt',
+                  '1-100-final.en', '1-100-final.es')
+    source_sentences = list(iterate_preprocessed_gold_sentences(
+        gold_files[1], tokenizer='regex', append_null=True))
+    target_sentences = list(iterate_preprocessed_gold_sentences(
+        gold_files[2], tokenizer='regex'))
+    expectation_maximization_algorithm(
+        get_unique_words(source_sentences), get_unique_words(target_sentences),
+        list(zip(source_sentences, target_sentences)),
+        filename=tmp_path / 'model.txt', engine=engine, max_iterations=2,
+        training_log=tmp_path / 'log.jsonl',
+        evaluation_callback=make_gold_evaluation_callback(
+            *gold_files, tokenizer='regex'))
+    with open(tmp_path / 'log.jsonl') as file:
+        records = [json.loads(line) for line in file]
+    assert records[0]['aer'] > records[1]['aer']
+    # The last record scores the saved model
+    assert (records[1]['recall'], records[1]['precision'],
+            records[1]['aer']) == pytest.approx(evaluate(
+                *gold_files, tmp_path / 'model.txt',
+                tmp_path / 'alignments.txt', tokenizer='regex'))
+
+
+def test_pair_probabilities():
+    parallel_corpus = [
+        (['NULL', 'the', 'house'], ['la', 'maison']),
+        (['NULL', 'the', 'blue', 'house'], ['la', 'maison', 'bleu']),
+    ]
+    source_words = ['NULL', 'blue', 'house', 'the']
+    target_words = ['bleu', 'la', 'maison']
+    links = build_links(*build_corpus_arrays(
+        parallel_corpus, source_words, target_words),
+        len(source_words), len(target_words))
+    t_probs = initialise_vectorized(links) * np.arange(1, len(
+        links.pair_targets) + 1)
+    probabilities = PairProbabilities(
+        t_probs, links,
+        {word: index for index, word in enumerate(source_words)},
+        {word: index for index, word in enumerate(target_words)})
+    expected = probabilities_to_dict(t_probs, links, source_words,
+                                     target_words)
+    assert dict(probabilities) == expected
+    assert probabilities.get(('house', 'fleur')) is None
+    source_sentence = ['NULL', 'the', 'flower', 'house']
+    target_sentence = ['maison', 'la', 'fleur']
+    assert probability_matrix(
+        probabilities, source_sentence, target_sentence).tolist() \
+        == probability_matrix(
+            expected, source_sentence, target_sentence).tolist()
+
+
+def test_padded_length():
+    assert padded_length(np.array([0, 1, 7, 8, 9, 15, 16, 17, 33])) \
+        .tolist() == [0, 1, 7, 8, 10, 16, 16, 20, 40]
+
+
+def test_expectation_maximization_algorithm_workers(tmp_path):
+    parallel_corpus = [
+        (['NULL', 'the', 'house'], ['la', 'maison']),
+        (['NULL', 'the', 'blue', 'house'], ['la', 'maison', 'bleu']),
+        (['NULL', 'the', 'flower'], ['la', 'fleur']),
+        (['NULL', 'the', 'the', 'house'], ['la', 'la', 'maison']),
+    ]
+    source_words = ['NULL', 'blue', 'flower', 'house', 'the']
+    target_words = ['bleu', 'fleur', 'la', 'maison']
+    single = expectation_maximization_algorithm(
+        source_words, target_words, parallel_corpus,
+        filename=tmp_path / 'single.txt', engine='numpy')
+    sharded = expectation_maximization_algorithm(
+        source_words, target_words, parallel_corpus,
+        filename=tmp_path / 'sharded.txt', engine='numpy', workers=3)
+    assert list(sharded) == list(single)
+    for pair, prob in single.items():
+        assert sharded[pair] == pytest.approx(prob, rel=1e-12)
+
+
+def test_expectation_maximization_algorithm_workers_need_numpy(tmp_path):
+    with pytest.raises(ValueError):
+        expectation_maximization_algorithm(
+            ['NULL', 'house'], ['maison'], [(['NULL', 'house'], ['maison'])],
+            filename=tmp_path / 'probs.txt', workers=2)
+
+
+@pytest.mark.parametrize('prune', [{'prune_threshold': 0.2},
+                                   {'prune_top_k': 2},
+                                   {'prune_threshold': 0.1,
+                                    'prune_top_k': 1}])
+def test_expectation_maximization_algorithm_pruning(tmp_path, prune):
+    parallel_corpus = [
+        (['NULL', 'the', 'house'], ['la', 'maison']),
+        (['NULL', 'the', 'blue', 'house'], ['la', 'maison', 'bleu']),
+        (['NULL', 'the', 'flower'], ['la', 'fleur']),
+    ]
+    source_words = ['NULL', 'blue', 'flower', 'house', 'the']
+    target_words = ['bleu', 'fleur', 'la', 'maison']
+    models = {}
+    for engine in ['sparse', 'numpy', 'bucketed']:
+        models[engine] = expectation_maximization_algorithm(
+            source_words, target_words, parallel_corpus,
+            filename=tmp_path / 'model.txt', engine=engine,
+            max_iterations=4, prune_every_iteration=True, **prune)
+    assert models['numpy'] == pytest.approx(models['sparse'])
+    assert models['bucketed'] == pytest.approx(models['sparse'])
+    unpruned = expectation_maximization_algorithm(
+        source_words, target_words, parallel_corpus,
+        filename=tmp_path / 'model.txt', engine='sparse', max_iterations=4)
+    assert len(models['sparse']) < len(unpruned)
+    for t_w in target_words:
+        assert sum(prob for (_, target), prob in models['sparse'].items()
+                   if target == t_w) == pytest.approx(1)
+    with pytest.raises(ValueError):
+        expectation_maximization_algorithm(
+            source_words, target_words, parallel_corpus,
+            filename=tmp_path / 'model.txt', prune_every_iteration=True,
+            **prune)
+
+
+def test_shard_boundaries_keep_source_tokens_together():
+    link_source_tokens = np.array([0, 0, 0, 0, 1, 2, 3, 3, 3, 3])
+    assert shard_boundaries(link_source_tokens, 3) == [0, 4, 6, 10]
+    assert shard_boundaries(link_source_tokens, 1) == [0, 10]
+
+
+def test_build_links():
+    corpus_arrays = build_corpus_arrays(
+        [(['NULL', 'house'], ['maison']), (['NULL'], ['la', 'maison'])],
+        source_words=['NULL', 'house'],
+        target_words=['la', 'maison'],
+    )
+    links = build_links(*corpus_arrays, 2, 2)
+    pairs = list(zip(links.pair_sources.tolist(),
+                     links.pair_targets.tolist()))
+    assert pairs == [(0, 0), (0, 1), (1, 1)]
+    assert links.link_pairs.tolist() == [1, 2, 0, 1]
+    assert links.link_source_tokens.tolist() == [0, 1, 2, 2]
+
+
+def test_vectorized_e_step_with_zero_probabilities():
+    # A model of the dense engine gives 0.0 to pairs that never
+    # co-occurred, here every pair of the source token 'house'
+    corpus_arrays = build_corpus_arrays(
+        [(['NULL', 'house'], ['la'])], source_words=['NULL', 'house'],
+        target_words=['la'])
+    links = build_links(*corpus_arrays, 2, 1)
+    count, log_likelihood = vectorized_e_step(np.array([1.0, 0.0]), links)
+    assert count.tolist() == [1.0, 0.0]
+    assert log_likelihood == 0.0
+    assert vectorized_m_step(count, links).tolist() == [1.0, 0.0]
+
+
+def test_vectorized_prune_drops_targets_without_probability():
+    # After a warm start every pair of 'fleur' can have probability 0
+    source_words = ['NULL', 'flower', 'the']
+    target_words = ['fleur', 'la']
+    links = build_links(*build_corpus_arrays(
+        [(['NULL', 'the', 'flower'], ['la', 'fleur'])],
+        source_words, target_words), 3, 2)
+    t_probs = np.array([0.0, 0.0, 0.0, 0.2, 0.0, 0.6])
+    pruned_probs, pruned_links = vectorized_prune(t_probs, links, top_k=2)
+    assert not np.isnan(pruned_probs).any()
+    assert probabilities_to_dict(
+        pruned_probs, pruned_links, source_words, target_words) \
+        == prune_probabilities(
+            probabilities_to_dict(t_probs, links, source_words, target_words),
+            top_k=2)
+    assert len(pruned_links.link_pairs) == 2
+
+
+def test_initialise_sparse():
+    actual = initialise_sparse(
+        source_language_set=['NULL', 'the', 'blue', 'flower'],
+        target_language_set=['la', 'bleu', 'fleur'],
+        parallel_corpus=[(['NULL', 'the', 'blue'], ['la', 'bleu']),
+                         (['NULL', 'the', 'flower'], ['la', 'fleur'])]
+    )
+    assert list(actual) == [
+        ('NULL', 'la'), ('the', 'la'), ('blue', 'la'), ('flower', 'la'),
+        ('NULL', 'bleu'), ('the', 'bleu'), ('blue', 'bleu'),
+        ('NULL', 'fleur'), ('the', 'fleur'), ('flower', 'fleur'),
+    ]
+    assert set(actual.values()) == {1 / 3}
+
+
 def test_initialise_0():
     actual = initialise(
         source_language_set=['NULL', 'the', 'blue', 'house', 'flower'],
@@ -169,6 +524,51 @@ def test_reverse_indexes():
     assert actual == expected
 
 
+def test_reverse_indexes_two_digit_positions():
+    assert reverse_indexes([['12-3', '3-10']]) == [['3-12', '10-3']]
+
+
+def test_iterate_gold_alignment_sets():
+    lines = ['1 2 2 S', '1 1 1 S', '1 1 2 P', '3 6 5 P', '3 5 4 S']
+    assert list(iterate_gold_alignment_sets(lines)) == [
+        ({(2, 2), (1, 1)}, {(2, 2), (1, 1), (1, 2)}),
+        (set(), set()),
+        ({(5, 4)}, {(6, 5), (5, 4)}),
+    ]
+
+
+def test_score_alignments():
+    gold = [({(1, 1), (2, 2)}, {(1, 1), (2, 2), (1, 2)}),
+            ({(3, 1)}, {(3, 1), (2, 2)})]
+    # Target 3 has no gold alignment in both sentences, so it gets (0, 3)
+    calculated = ['1-1 2-1 3-0', '1-3 2-2 3-1']
+    counts = score_alignments(gold, calculated)
+    assert counts == AlignmentCounts(sure_matches=3, possible_matches=5,
+                                     calculated=6, sure=5)
+    assert counts.recall() == 3 / 5
+    assert counts.precision() == 5 / 6
+    assert counts.alignment_error_rate() == 1 - 8 / 11
+    assert counts.combine(counts) == AlignmentCounts(6, 10, 12, 10)
+
+
+def test_score_alignments_agrees_with_list_functions():
+    gold_lines = read_lines_from_file(
+        '../gold_standard/goldstandard_en_es.txt')
+    calculated = ['1-0 2-2 3-1 4-4', '1-1 2-0 3-3 4-2 5-5 6-6 7-7 8-8 '
+                  '9-9 10-10 11-11 12-12', '1-1 2-2']
+    counts = score_alignments(iterate_gold_alignment_sets(gold_lines),
+                              calculated)
+    gold_alignments = get_gold_alignments(gold_lines)[:3]
+    tokenised = [sentence.split() for sentence in calculated]
+    complete = add_missing_null_alignments_to_goldstandard(
+        gold_alignments, [len(sentence) for sentence in tokenised])
+    reversed_alignments = reverse_indexes(tokenised)
+    assert counts.recall() == recall(complete, reversed_alignments)
+    assert counts.precision() == precision(complete, reversed_alignments)
+    assert counts.alignment_error_rate() == alignment_error_rate(
+        reversed_alignments, complete)
+
+
 def test_add_missing_null_alignments_to_goldstandard():
     actual = add_missing_null_alignments_to_goldstandard(
         gold_sentences_alignments=[
@@ -270,3 +670,121 @@ def test_save_tab():
     )
     with open('test_tab.txt', "r") as file:
         assert file.read() == 'NULL\tla\t0.3967162216116505\nthe\tla\t0.3967162216116505\nblue\tla\t0.023004922711340352'
+
+
+def test_align_sentence_repeated_words():
+    translation_probabilities = {
+        ('the', 'la'): 0.4,
+        ('house', 'maison'): 0.5,
+        ('NULL', 'maison'): 0.5,
+    }
+    actual = align_sentence(
+        translation_probabilities,
+        ['NULL', 'the', 'house', 'the', 'house'],
+        ['la', 'maison', 'la', 'maison', 'fleur'])
+    assert actual == '1-1 2-0 3-1 4-0 5-0'
+
+
+def test_align_sentence_vectorized(tmp_path):
+    translation_probabilities = {
+        ('the', 'la'): 0.4,
+        ('blue', 'bleu'): 0.7,
+        ('house', 'maison'): 0.6,
+        ('NULL', 'bleu'): 0.2,
+    }
+    save_translation_table(translation_probabilities, tmp_path / 'model.bin')
+    src_sent = ['NULL', 'the', 'blue', 'house', 'the']
+    tgt_sent = ['la', 'maison', 'bleu', 'la', 'rouge']
+    expected = align_sentence(translation_probabilities, src_sent, tgt_sent)
+    assert expected == '1-1 2-3 3-2 4-1 5-0'
+    assert align_sentence_vectorized(
+        translation_probabilities, src_sent, tgt_sent) == expected
+    with TranslationTable(tmp_path / 'model.bin') as table:
+        assert align_sentence(table, src_sent, tgt_sent) == expected
+        assert align_sentence_vectorized(
+            table, src_sent, tgt_sent) == expected
+
+
+def test_calculate_word_alignments_vectorized():
+    parallel_corpus = [(['NULL', 'the', 'blue', 'house'],
+                        ['la', 'maison', 'bleu']),
+                       (['NULL', 'the', 'flower'], ['la', 'fleur'])]
+    expected = calculate_word_alignments(
+        'TEST_tiny_probs_expected.txt', parallel_corpus)
+    assert expected == ['1-0 2-3 3-2', '1-0 2-2']
+    assert calculate_word_alignments(
+        'TEST_tiny_probs_expected.txt', parallel_corpus,
+        vectorized=True) == expected
+
+
+def test_get_chunks():
+    assert list(get_chunks(range(5), 2)) == [[0, 1], [2, 3], [4]]
+    assert list(get_chunks([], 2)) == []
+
+
+def test_map_in_chunks_bounds_the_chunks_in_flight():
+    reads = []
+
+    def items():
+        for item in range(100):
+            reads.append(item)
+            yield -item
+
+    results = map_in_chunks(abs, items(), workers=2, chunk_size=5,
+                            max_in_flight=3)
+    assert next(results) == 0
+    # Three chunks are submitted before the first result is yielded
+    assert len(reads) == 15
+    assert list(results) == list(range(1, 100))
+
+
+def test_calculate_word_alignments_workers():
+    parallel_corpus = [(['NULL', 'the', 'blue', 'house'],
+                        ['la', 'maison', 'bleu']),
+                       (['NULL', 'the', 'flower'], ['la', 'fleur']),
+                       (['NULL', 'the', 'house'], ['la', 'maison'])]
+    expected = calculate_word_alignments(
+        'TEST_tiny_probs_expected.txt', parallel_corpus)
+    assert calculate_word_alignments(
+        'TEST_tiny_probs_expected.txt', parallel_corpus,
+        workers=2, chunk_size=2) == expected
+
+
+def test_iterate_word_alignments_bounds_the_chunks_in_flight():
+    parallel_corpus = [(['NULL', 'the', 'blue', 'house'],
+                        ['la', 'maison', 'bleu']),
+                       (['NULL', 'the', 'flower'], ['la', 'fleur'])]
+    reads = []
+
+    def sentence_pairs():
+        for index in range(200):
+            reads.append(index)
+            yield parallel_corpus[index % 2]
+
+    alignments = iterate_word_alignments(
+        'TEST_tiny_probs_expected.txt', sentence_pairs(), workers=2,
+        chunk_size=5)
+    expected = calculate_word_alignments('TEST_tiny_probs_expected.txt',
+                                         parallel_corpus)
+    assert next(alignments) == expected[0]
+    # 2 * workers chunks are submitted before the first alignment
+    assert len(reads) == 20
+    assert list(alignments) == expected[1:] + expected * 99
+
+
+def test_write_and_read_alignments(tmp_path):
+    alignments = (sentence for sentence in ['1-0 2-2', '1-0 2-3 3-2', ''])
+    assert write_alignments(alignments, tmp_path / 'align.txt') == 3
+    assert (tmp_path / 'align.txt').read_text() == '1-0 2-2\n1-0 2-3 3-2\n\n'
+    assert list(read_alignments(tmp_path / 'align.txt')) == \
+        ['1-0 2-2', '1-0 2-3 3-2', '']
+
+
+def test_iterate_word_alignments_is_lazy():
+    def sentence_pairs():
+        yield ['NULL', 'the', 'flower'], ['la', 'fleur']
+        raise AssertionError("Only the first sentence pair is needed")
+
+    alignments = iterate_word_alignments(
+        'TEST_tiny_probs_expected.txt', sentence_pairs())
+    assert next(alignments) == '1-0 2-2'
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+# Modulprojekt CLT
+# Authorin: Sandra Sánchez
+# Datum: 17.10.2026
+
+import json
+import pstats
+
+import pytest
+
+import instrumentation
+from learn_alignments import expectation_maximization_algorithm
+
+PARALLEL_CORPUS = [
+    (['NULL', 'the', 'house'], ['la', 'maison']),
+    (['NULL', 'the', 'blue', 'house'], ['la', 'maison', 'bleu']),
+    (['NULL', 'the', 'flower'], ['la', 'fleur']),
+]
+SOURCE_WORDS = ['NULL', 'blue', 'flower', 'house', 'the']
+TARGET_WORDS = ['bleu', 'fleur', 'la', 'maison']
+
+
+@pytest.fixture(autouse=True)
+def switched_off():
+    yield
+    instrumentation.disable()
+
+
+def test_nothing_is_recorded_when_off():
+    with instrumentation.timer('e_step'):
+        instrumentation.count('e_step.sentence_pairs', 3)
+    assert instrumentation.report() == {'timers': {}, 'counters': {}}
+
+
+def test_timers_and_counters(tmp_path):
+    instrumentation.enable()
+    expectation_maximization_algorithm(
+        SOURCE_WORDS, TARGET_WORDS, PARALLEL_CORPUS, tmp_path / 'model.txt',
+        engine='sparse', max_iterations=2)
+    report_filename = tmp_path / 'report.json'
+    instrumentation.save_report(report_filename)
+    with open(report_filename) as file:
+        report = json.load(file)
+    assert report['timers']['e_step']['calls'] == 2
+    assert report['timers']['m_step']['calls'] == 2
+    assert report['timers']['initialisation']['calls'] == 1
+    assert report['timers']['serialisation']['seconds'] > 0
+    assert report['counters']['em.iterations'] == 2
+    assert report['counters']['e_step.sentence_pairs'] == 6
+    assert report['counters']['e_step.word_pairs'] == 2 * (6 + 12 + 6)
+
+
+def test_profile_phase(tmp_path):
+    profile_filename = tmp_path / 'e_step.prof'
+    instrumentation.enable('e_step', str(profile_filename),
+                           trace_memory=True)
+    expectation_maximization_algorithm(
+        SOURCE_WORDS, TARGET_WORDS, PARALLEL_CORPUS, tmp_path / 'model.txt',
+        engine='dense', max_iterations=2)
+    report = instrumentation.report()
+    assert report['profile']['phase'] == 'e_step'
+    assert report['profile']['peak_memory_mb'] > 0
+    functions = {function for _, _, function
+                 in pstats.Stats(str(profile_filename)).stats}
+    assert 'e_step' in functions
+    assert 'm_step' not in functions
+
+
+def test_unknown_phase():
+    with pytest.raises(ValueError):
+        instrumentation.enable('training')
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+# Modulprojekt CLT
+# Authorin: Sandra Sánchez
+# Datum: 17.10.2026
+
+import json
+
+import pytest
+
+from learn_alignments import expectation_maximization_algorithm
+from online_em import OnlineEM, update_model
+from translation_table import read_probabilities_file
+
+PARALLEL_CORPUS = [
+    (['NULL', 'the', 'house'], ['la', 'maison']),
+    (['NULL', 'the', 'blue', 'house'], ['la', 'maison', 'bleu']),
+    (['NULL', 'the', 'flower'], ['la', 'fleur']),
+]
+SOURCE_WORDS = ['NULL', 'blue', 'flower', 'house', 'the']
+TARGET_WORDS = ['bleu', 'fleur', 'la', 'maison']
+
+
+@pytest.mark.parametrize('engine', ['dense', 'numpy'])
+def test_statistics_give_the_trained_model(tmp_path, engine):
+    model = expectation_maximization_algorithm(
+        SOURCE_WORDS, TARGET_WORDS, PARALLEL_CORPUS,
+        filename=tmp_path / 'model.txt', engine=engine,
+        statistics_filename=tmp_path / 'statistics.bin')
+    online_em = OnlineEM.load(tmp_path / 'statistics.bin')
+    assert online_em.updates is None
+    assert online_em.sentence_pairs == 3
+    assert online_em.probabilities() == pytest.approx(
+        {pair: prob for pair, prob in model.items() if prob})
+
+
+def test_update_only_touches_the_batch():
+    online_em = OnlineEM({('the', 'la'): 1.0, ('house', 'maison'): 1.0,
+                          ('the', 'maison'): 0.5}, step_exponent=1.0)
+    record = online_em.update([(['NULL', 'the', 'tree'], ['la', 'arbre'])])
+    assert record['update'] == 2
+    assert record['step_size'] == 0.5
+    assert online_em.scale == 0.5
+    # The stored counts of the pairs outside the batch are not touched
+    assert online_em.count[('house', 'maison')] == 1.0
+    assert online_em.count[('the', 'maison')] == 0.5
+    probabilities = online_em.probabilities()
+    assert ('tree', 'arbre') in probabilities
+    assert probabilities[('house', 'maison')] == pytest.approx(2 / 3)
+    for t_w in ['la', 'maison', 'arbre']:
+        assert sum(prob for (_, target), prob in probabilities.items()
+                   if target == t_w) == pytest.approx(1)
+    # With step exponent 1 both batches have the same weight
+    true_count = online_em.scale * online_em.count[('the', 'la')]
+    assert 0.5 < true_count < 1.0
+
+
+@pytest.mark.parametrize('batch, step_size', [
+    ([(['NULL', 'the', 'tree'], ['la', 'arbre'])], 1 / 4),
+    ([(['NULL', 'the', 'tree'], ['la', 'arbre'])] * 3, 1 / 2),
+    ([(['NULL', 'the', 'tree'], ['la', 'arbre'])] * 6, 1 / 2),
+])
+def test_first_update_weight(batch, step_size):
+    # The training corpus of 3 sentence pairs counts as 3 batches of one
+    # sentence pair, one batch of 3 and still one batch of 6
+    online_em = OnlineEM({('the', 'la'): 1.0}, updates=None,
+                         step_exponent=1.0, sentence_pairs=3)
+    record = online_em.update(batch)
+    assert record['step_size'] == pytest.approx(step_size)
+    # The statistics of the training corpus keep the rest of the weight
+    assert online_em.scale == pytest.approx(1 - step_size)
+
+
+@pytest.mark.parametrize('updates, sentence_pairs', [(None, 3), (5, None)])
+def test_empty_batch_changes_nothing(updates, sentence_pairs):
+    online_em = OnlineEM({('the', 'la'): 1.0, ('the', 'maison'): 0.5},
+                         updates=updates, sentence_pairs=sentence_pairs)
+    probabilities = online_em.probabilities()
+    record = online_em.update([])
+    assert record['sentence_pairs'] == 0
+    assert record['step_size'] == 0.0
+    assert online_em.updates == updates
+    assert online_em.scale == 1.0
+    assert online_em.probabilities() == probabilities
+    assert OnlineEM({}).update([])['update'] == 1
+
+
+def test_rescale_keeps_the_model():
+    online_em = OnlineEM({('the', 'la'): 1.0, ('the', 'maison'): 0.5})
+    for _ in range(5):
+        online_em.update([(['NULL', 'the'], ['la'])])
+    probabilities = online_em.probabilities()
+    online_em.rescale()
+    assert online_em.scale == 1.0
+    assert online_em.probabilities() == pytest.approx(probabilities)
+
+
+def test_update_model(tmp_path, capsys):
+    expectation_maximization_algorithm(
+        SOURCE_WORDS, TARGET_WORDS, PARALLEL_CORPUS,
+        filename=tmp_path / 'model.txt',
+        statistics_filename=tmp_path / 'statistics.bin')
+    (tmp_path / 'new.en').write_text('the tree\n')
+    (tmp_path / 'new.fr').write_text('la arbre\n')
+    capsys.readouterr()
+    update_model(tmp_path / 'new.en', tmp_path / 'new.fr',
+                 tmp_path / 'statistics.bin', tmp_path / 'updated.txt',
+                 tokenizer='regex')
+    updated = read_probabilities_file(tmp_path / 'updated.txt')
+    assert ('tree', 'arbre') in updated
+    # stdout only has the JSON record of the update
+    assert json.loads(capsys.readouterr().out)['update'] == 4
+    # The 3 training sentence pairs count as 3 batches of one
+    assert OnlineEM.load(tmp_path / 'statistics.bin').updates == 4
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+# Modulprojekt CLT
+# Authorin: Sandra Sánchez
+# Datum: 17.10.2026
+
+import pickle
+
+import pytest
+
+from learn_alignments import expectation_maximization_algorithm, \
+    get_unique_words
+from parallel_corpus import ParallelCorpus, Vocabulary
+from shared_functions import calculate_word_alignments
+from vectorized_em import build_corpus_arrays
+
+PARALLEL_CORPUS = [
+    (['NULL', 'the', 'house'], ['la', 'maison']),
+    (['NULL', 'the', 'blue', 'house'], ['la', 'maison', 'bleu']),
+    (['NULL', 'the', 'flower'], ['la', 'fleur']),
+]
+
+
+def test_vocabulary():
+    vocabulary = Vocabulary(['the', 'house', 'the'])
+    assert len(vocabulary) == 2
+    assert vocabulary.add('blue') == 2
+    assert vocabulary.add('house') == 1
+    assert vocabulary[1] == 'house'
+    assert 'blue' in vocabulary
+    assert vocabulary.sorted_words() == ['blue', 'house', 'the']
+
+
+def test_views():
+    corpus = ParallelCorpus.from_sentence_pairs(PARALLEL_CORPUS)
+    assert len(corpus) == 3
+    assert corpus.number_tokens() == (10, 7)
+    assert [(list(source), list(target)) for source, target in corpus] \
+        == PARALLEL_CORPUS
+    source, target = corpus[1]
+    assert len(source) == 4
+    assert source[2] == 'blue'
+    assert source[1:3] == ['the', 'blue']
+    assert target == ['la', 'maison', 'bleu']
+    assert corpus[-1][1] == ['la', 'fleur']
+    with pytest.raises(IndexError):
+        corpus[3]
+    assert pickle.loads(pickle.dumps(source)) == ['NULL', 'the', 'blue',
+                                                  'house']
+    source_words = get_unique_words(source for source, _ in PARALLEL_CORPUS)
+    assert corpus.source_vocabulary.sorted_words() == source_words
+
+
+def test_to_arrays():
+    corpus = ParallelCorpus.from_sentence_pairs(PARALLEL_CORPUS)
+    source_words = get_unique_words(source for source, _ in PARALLEL_CORPUS)
+    target_words = get_unique_words(target for _, target in PARALLEL_CORPUS)
+    expected = build_corpus_arrays(PARALLEL_CORPUS, source_words,
+                                   target_words)
+    for array, expected_array in zip(
+            build_corpus_arrays(corpus, source_words, target_words),
+            expected):
+        assert array.tolist() == expected_array.tolist()
+
+
+@pytest.mark.parametrize('engine', ['dense', 'sparse', 'numpy'])
+def test_same_model_as_lists(tmp_path, engine):
+    corpus = ParallelCorpus.from_sentence_pairs(PARALLEL_CORPUS)
+    source_words = corpus.source_vocabulary.sorted_words()
+    target_words = corpus.target_vocabulary.sorted_words()
+    from_lists = expectation_maximization_algorithm(
+        source_words, target_words, PARALLEL_CORPUS,
+        tmp_path / 'lists.txt', engine=engine)
+    from_corpus = expectation_maximization_algorithm(
+        source_words, target_words, corpus,
+        tmp_path / 'corpus.txt', engine=engine)
+    assert from_corpus == pytest.approx(from_lists)
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_calculate_word_alignments(tmp_path, workers):
+    corpus = ParallelCorpus.from_sentence_pairs(PARALLEL_CORPUS)
+    model = tmp_path / 'model.txt'
+    expectation_maximization_algorithm(
+        corpus.source_vocabulary.sorted_words(),
+        corpus.target_vocabulary.sorted_words(), corpus, model)
+    assert calculate_word_alignments(model, corpus, workers=workers) \
+        == calculate_word_alignments(model, PARALLEL_CORPUS)
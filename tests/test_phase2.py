@@ -3,8 +3,10 @@
 # Authorin: Sandra Sánchez
 # Datum: 07.04.2022
 
+import subprocess
+import sys
 
-from align_words import align_words
+from align_words import align_words, get_sentence_pairs_from_file
 
 
 def test_align_words():
@@ -16,3 +18,34 @@ def test_align_words():
     with open('align_TEST_actual.txt', 'r') as actual_file:
         with open('align_TEST_expected.txt', 'r') as expected_file:
             assert actual_file.read() == expected_file.read()
+
+
+def test_align_words_parallel(tmp_path):
+    align_words(
+        modelled_probabilities='trans_prob_TEST.txt',
+        calculated_alignments_filename=tmp_path / 'align_parallel.txt',
+        sentence_pairs_filename='sentence_pairs_TEST.txt',
+        workers=2,
+        chunk_size=1
+    )
+    with open(tmp_path / 'align_parallel.txt', 'r') as actual_file:
+        with open('align_TEST_expected.txt', 'r') as expected_file:
+            assert actual_file.read() == expected_file.read()
+
+
+def test_get_sentence_pairs_from_file():
+    actual = get_sentence_pairs_from_file('TEST_tiny_pairs_expected.txt')
+    assert actual == [
+        [['NULL', 'the', 'house'], ['la', 'maison']],
+        [['NULL', 'the', 'blue', 'house'], ['la', 'maison', 'bleu']],
+        [['NULL', 'the', 'flower'], ['la', 'fleur']],
+    ]
+
+
+def test_importing_the_phases_does_not_load_nltk():
+    code = ("import sys; sys.path.insert(0, '..'); "
+            "import align_words, learn_alignments, evaluate; "
+            "print('nltk' in sys.modules)")
+    result = subprocess.run([sys.executable, '-c', code],
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == 'False'
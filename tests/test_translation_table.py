@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+# Modulprojekt CLT
+# Authorin: Sandra Sánchez
+# Datum: 17.10.2026
+
+import pytest
+
+from translation_table \
+    import TranslationTable, save_translation_table, \
+    convert_tsv_to_binary, convert_binary_to_tsv, is_translation_table, \
+    load_translation_probabilities, read_probabilities_file, \
+    prune_probabilities
+
+
+def test_save_and_open_translation_table(tmp_path):
+    probabilities = {
+        ('NULL', 'la'): 0.3967162216116505,
+        ('the', 'la'): 0.3967162216116505,
+        ('blue', 'bleu'): 0.4861795269935963,
+        ('señor', 'señora'): 0.0,
+    }
+    save_translation_table(probabilities, tmp_path / 'model.bin',
+                           metadata={'iteration': 3})
+    with TranslationTable(tmp_path / 'model.bin') as table:
+        assert dict(table) == probabilities
+        assert table[('blue', 'bleu')] == 0.4861795269935963
+        assert table.get(('blue', 'la'), 0.0) == 0.0
+        assert table.get(('unknown', 'la'), 0.0) == 0.0
+        assert ('the', 'la') in table
+        assert len(table) == 4
+        assert table.metadata == {'iteration': 3}
+        assert list(table)[0] == ('blue', 'bleu')
+        with pytest.raises(KeyError):
+            table[('the', 'bleu')]
+
+
+def test_float32_translation_table(tmp_path):
+    save_translation_table({('the', 'la'): 0.1}, tmp_path / 'model.bin',
+                           value_type='f')
+    with TranslationTable(tmp_path / 'model.bin') as table:
+        assert table[('the', 'la')] == pytest.approx(0.1)
+
+
+def test_convert_between_formats(tmp_path):
+    tsv_filename = 'TEST_tiny_probs_expected.txt'
+    binary_filename = tmp_path / 'TEST_tiny_probs.bin'
+    convert_tsv_to_binary(tsv_filename, binary_filename)
+    assert is_translation_table(binary_filename)
+    assert not is_translation_table(tsv_filename)
+    binary = load_translation_probabilities(binary_filename)
+    assert dict(binary) == read_probabilities_file(tsv_filename)
+    binary.close()
+    convert_binary_to_tsv(binary_filename, tmp_path / 'TEST_tiny_probs.txt')
+    with open(tmp_path / 'TEST_tiny_probs.txt') as actual_file:
+        with open(tsv_filename) as expected_file:
+            assert actual_file.read() == expected_file.read().strip()
+
+
+def test_prune_probabilities():
+    probabilities = {
+        ('NULL', 'la'): 0.25, ('the', 'la'): 0.5, ('house', 'la'): 0.25,
+        ('NULL', 'maison'): 0.1, ('house', 'maison'): 0.9,
+        ('the', 'bleu'): 0.0005, ('blue', 'bleu'): 0.9995,
+    }
+    assert prune_probabilities(probabilities, threshold=0.001,
+                               renormalize=False) == {
+        pair: prob for pair, prob in probabilities.items()
+        if pair != ('the', 'bleu')}
+    assert prune_probabilities(probabilities, top_k=1,
+                               renormalize=False) == {
+        ('the', 'la'): 0.5, ('house', 'maison'): 0.9,
+        ('blue', 'bleu'): 0.9995}
+    # Equal probabilities keep the earlier entry
+    top_2 = prune_probabilities(probabilities, top_k=2)
+    assert list(top_2) == [('NULL', 'la'), ('the', 'la'),
+                           ('NULL', 'maison'), ('house', 'maison'),
+                           ('the', 'bleu'), ('blue', 'bleu')]
+    assert top_2[('the', 'la')] == pytest.approx(2 / 3)
+    both = prune_probabilities(probabilities, threshold=0.2, top_k=1)
+    assert both == {('the', 'la'): 1.0, ('house', 'maison'): 1.0,
+                    ('blue', 'bleu'): 1.0}
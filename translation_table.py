@@ -0,0 +1,314 @@
+# -*- coding: utf-8 -*-
+# Modulprojekt CLT
+# Authorin: Sandra Sánchez
+# Datum: 17.10.2026
+
+import argparse
+import bisect
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections.abc import Mapping
+
+MAGIC = b'IBM1TT\x00\x01'
+VERSION = 1
+# magic, version, value typecode, number of source words, number of
+# target words, number of entries, bytes of the source vocabulary,
+# bytes of the target vocabulary, bytes of the metadata
+HEADER = struct.Struct('<8sI4sQQQQQQ')
+
+
+class TranslationTable(Mapping):
+    """
+    Read-only translation probabilities stored in the binary model format.
+    The file is memory-mapped, so opening it only reads the header and the
+    vocabularies, and several processes that open the same model share
+    its pages.
+    Entries behave like the dict that the probabilities file is loaded
+    into: the keys are (source_word, target_word) tuples and the values
+    are the probabilities.
+    Layout of the file:
+        header, source vocabulary, target vocabulary, metadata (JSON),
+        padding to 8 bytes, sorted uint64 keys, float values.
+    Every key is target_id * number_source_words + source_id, where the
+    ids are the positions of the words in the sorted vocabularies.
+    """
+
+    def __init__(self, filename):
+        if sys.byteorder != 'little':
+            raise OSError("The binary model format needs a little-endian "
+                          "machine")
+        with open(filename, 'rb') as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, value_type, number_source_words,
+         number_target_words, number_entries, source_vocab_bytes,
+         target_vocab_bytes, metadata_bytes) = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or version != VERSION:
+            self._mmap.close()
+            raise ValueError(f"{filename} is not a binary translation table")
+        position = HEADER.size
+        self.source_words = _read_vocabulary(
+            self._mmap, position, source_vocab_bytes, number_source_words)
+        position += source_vocab_bytes
+        self.target_words = _read_vocabulary(
+            self._mmap, position, target_vocab_bytes, number_target_words)
+        position += target_vocab_bytes
+        self.metadata = json.loads(
+            self._mmap[position:position + metadata_bytes] or b'{}')
+        position = _aligned(position + metadata_bytes)
+        typecode = value_type.rstrip(b'\x00').decode('ascii')
+        buffer = memoryview(self._mmap)
+        self.keys_view = buffer[position:position + 8 * number_entries] \
+            .cast('Q')
+        position += 8 * number_entries
+        self.values_view = buffer[
+            position:position + array(typecode).itemsize * number_entries] \
+            .cast(typecode)
+        buffer.release()
+        self.source_index = {word: index for index, word
+                             in enumerate(self.source_words)}
+        self.target_index = {word: index for index, word
+                             in enumerate(self.target_words)}
+        self._arrays = None
+
+    def key(self, source_word, target_word):
+        """Return the integer key of a word pair, None for unknown words."""
+        source_id = self.source_index.get(source_word)
+        target_id = self.target_index.get(target_word)
+        if source_id is None or target_id is None:
+            return None
+        return target_id * len(self.source_words) + source_id
+
+    def __getitem__(self, pair):
+        key = self.key(*pair)
+        if key is not None:
+            position = bisect.bisect_left(self.keys_view, key)
+            if position < len(self.keys_view) \
+                    and self.keys_view[position] == key:
+                return self.values_view[position]
+        raise KeyError(pair)
+
+    def probability_matrix(self, source_sentence, target_sentence):
+        """
+        Look up all word pairs of a sentence pair with one binary search
+        over the memory-mapped keys.
+        :param source_sentence: list of str
+        :param target_sentence: list of str
+        :return: np.ndarray, rows are source positions and columns are
+            target positions. Unknown pairs have probability 0.0.
+        """
+        import numpy as np
+        if self._arrays is None:
+            self._arrays = (
+                np.frombuffer(self.keys_view, dtype=np.uint64),
+                np.frombuffer(self.values_view,
+                              dtype=self.values_view.format))
+        keys, values = self._arrays
+        source_ids = np.array(
+            [self.source_index.get(word, -1) for word in source_sentence],
+            dtype=np.int64)
+        target_ids = np.array(
+            [self.target_index.get(word, -1) for word in target_sentence],
+            dtype=np.int64)
+        known = (source_ids[:, None] >= 0) & (target_ids[None, :] >= 0)
+        wanted = np.where(
+            known,
+            target_ids[None, :] * len(self.source_words)
+            + source_ids[:, None],
+            0).astype(np.uint64)
+        if len(keys) == 0:
+            return np.zeros(wanted.shape)
+        positions = np.minimum(np.searchsorted(keys, wanted), len(keys) - 1)
+        found = known & (keys[positions] == wanted)
+        return np.where(found, values[positions], 0.0)
+
+    def to_dict(self):
+        """
+        Read all entries at once.
+        :return: dict with items of the form (s_w, t_w) : float
+        """
+        return dict(zip(self, self.values_view.tolist()))
+
+    def __iter__(self):
+        number_source_words = len(self.source_words)
+        for key in self.keys_view:
+            target_id, source_id = divmod(key, number_source_words)
+            yield self.source_words[source_id], self.target_words[target_id]
+
+    def __len__(self):
+        return len(self.keys_view)
+
+    def close(self):
+        """Release the memory map."""
+        self._arrays = None
+        self.keys_view.release()
+        self.values_view.release()
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _aligned(position):
+    """Round position up to the next multiple of 8."""
+    return (position + 7) // 8 * 8
+
+
+def _read_vocabulary(buffer, position, size, number_words):
+    """Decode a vocabulary section into a list of str."""
+    if number_words == 0:
+        return []
+    return buffer[position:position + size].decode('utf-8').split('\n')
+
+
+def save_translation_table(probabilities_dict, filename, value_type='d',
+                           metadata=None):
+    """
+    Save probabilities into a file in the binary model format.
+    The file is written under a temporary name and renamed at the end,
+    so readers never see a half-written model.
+    :param probabilities_dict: dict with items of the form
+        (s_w, t_w) : float
+    :param filename: file
+    :param value_type: 'd' to store float64 values, 'f' for float32
+    :param metadata: dict that can be serialised as JSON
+    :return: None
+    """
+    source_words = sorted({s_w for s_w, _ in probabilities_dict})
+    target_words = sorted({t_w for _, t_w in probabilities_dict})
+    source_index = {word: index for index, word in enumerate(source_words)}
+    target_index = {word: index for index, word in enumerate(target_words)}
+    number_source_words = len(source_words)
+    entries = sorted(
+        (target_index[t_w] * number_source_words + source_index[s_w], prob)
+        for (s_w, t_w), prob in probabilities_dict.items())
+    keys = array('Q', (key for key, _ in entries))
+    values = array(value_type, (prob for _, prob in entries))
+    source_vocab = '\n'.join(source_words).encode('utf-8')
+    target_vocab = '\n'.join(target_words).encode('utf-8')
+    metadata_json = json.dumps(metadata or {}).encode('utf-8')
+    temporary_filename = f"{filename}.{os.getpid()}.tmp"
+    with open(temporary_filename, 'wb') as file:
+        file.write(HEADER.pack(
+            MAGIC, VERSION, value_type.encode('ascii'),
+            number_source_words, len(target_words), len(keys),
+            len(source_vocab), len(target_vocab), len(metadata_json)))
+        file.write(source_vocab)
+        file.write(target_vocab)
+        file.write(metadata_json)
+        position = HEADER.size + len(source_vocab) + len(target_vocab) \
+            + len(metadata_json)
+        file.write(b'\x00' * (_aligned(position) - position))
+        keys.tofile(file)
+        values.tofile(file)
+    os.replace(temporary_filename, filename)
+
+
+def prune_probabilities(probabilities_dict, threshold=None, top_k=None,
+                        renormalize=True):
+    """
+    Drop the translation probabilities that hardly ever matter.
+    The probabilities of a target word sum up to 1 over the source words,
+    so the top-k entries are chosen among the source words of every
+    target word. Among equal probabilities the earlier entry is kept.
+    :param probabilities_dict: dict with items of the form
+        (s_w, t_w) : float
+    :param threshold: float, drop the entries below it. Nothing is
+        dropped if None.
+    :param top_k: int, keep only the k most probable source words of
+        every target word. All are kept if None.
+    :param renormalize: bool, when True the kept probabilities of every
+        target word are scaled to sum up to 1 again
+    :return: dict with the kept items in their original order
+    """
+    pruned = {pair: prob for pair, prob in probabilities_dict.items()
+              if threshold is None or prob >= threshold}
+    if top_k is not None:
+        candidates = {}
+        for (s_w, t_w), prob in pruned.items():
+            candidates.setdefault(t_w, []).append((prob, s_w))
+        best_pairs = set()
+        for t_w, target_candidates in candidates.items():
+            target_candidates.sort(key=lambda candidate: -candidate[0])
+            best_pairs.update((s_w, t_w)
+                              for _, s_w in target_candidates[:top_k])
+        pruned = {pair: prob for pair, prob in pruned.items()
+                  if pair in best_pairs}
+    if renormalize:
+        totals = {}
+        for (_, t_w), prob in pruned.items():
+            totals[t_w] = totals.get(t_w, 0.0) + prob
+        pruned = {(s_w, t_w): prob / totals[t_w]
+                  for (s_w, t_w), prob in pruned.items() if totals[t_w]}
+    return pruned
+
+
+def is_translation_table(filename):
+    """Check whether a file is in the binary model format."""
+    with open(filename, 'rb') as file:
+        return file.read(len(MAGIC)) == MAGIC
+
+
+def read_probabilities_file(probabilities_filename):
+    """
+    Read a probabilities file with source_word\\ttarget_word\\tprobability
+    lines into a dict.
+    :param probabilities_filename: file
+    :return: dict with items of the form (s_w, t_w) : float
+    """
+    translation_probabilities = {}
+    with open(probabilities_filename, encoding='utf-8') as file:
+        for line in file:
+            prob = line.rstrip('\n').split('\t')
+            if len(prob) == 3:
+                translation_probabilities[(prob[0], prob[1])] = \
+                    float(prob[2])
+    return translation_probabilities
+
+
+def load_translation_probabilities(probabilities_filename):
+    """
+    Load a model in either format.
+    :param probabilities_filename: binary model or probabilities file
+    :return: TranslationTable for binary models, dict otherwise
+    """
+    if is_translation_table(probabilities_filename):
+        return TranslationTable(probabilities_filename)
+    return read_probabilities_file(probabilities_filename)
+
+
+def convert_tsv_to_binary(tsv_filename, binary_filename, value_type='d'):
+    """Convert a probabilities file into the binary model format."""
+    save_translation_table(read_probabilities_file(tsv_filename),
+                           binary_filename, value_type)
+
+
+def convert_binary_to_tsv(binary_filename, tsv_filename):
+    """Convert a binary model into a probabilities file."""
+    with TranslationTable(binary_filename) as table, \
+            open(tsv_filename, 'w', encoding='utf-8') as file:
+        lines = (f"{s_w}\t{t_w}\t{prob}"
+                 for (s_w, t_w), prob in zip(table, table.values_view))
+        file.write('\n'.join(lines))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Convert a model between the probabilities file "
+                    "format and the binary format.")
+    parser.add_argument('input_filename')
+    parser.add_argument('output_filename')
+    parser.add_argument('--float32', action='store_true',
+                        help="store float32 instead of float64 values")
+    args = parser.parse_args()
+    if is_translation_table(args.input_filename):
+        convert_binary_to_tsv(args.input_filename, args.output_filename)
+    else:
+        convert_tsv_to_binary(args.input_filename, args.output_filename,
+                              'f' if args.float32 else 'd')
@@ -0,0 +1,606 @@
+# -*- coding: utf-8 -*-
+# Modulprojekt CLT
+# Authorin: Sandra Sánchez
+# Datum: 17.10.2026
+
+from collections.abc import Mapping
+from multiprocessing import Pool
+from multiprocessing.shared_memory import SharedMemory
+from typing import NamedTuple
+
+import numpy as np
+
+from parallel_corpus import ParallelCorpus
+
+
+class CorpusLinks(NamedTuple):
+    """
+    Integer representation of a parallel corpus for vectorized EM.
+    A link is one (source position, target position) combination inside
+    a sentence pair. Every link points to the co-occurring word pair it
+    belongs to, so the E-step and the M-step become batched operations
+    over flat arrays instead of dict lookups.
+    """
+    pair_sources: np.ndarray  # source word id of every co-occurring pair
+    pair_targets: np.ndarray  # target word id of every co-occurring pair
+    link_pairs: np.ndarray  # co-occurring pair of every link
+    link_source_tokens: np.ndarray  # source token position of every link
+    number_source_tokens: int
+    number_target_words: int
+    # Sum of log |target sentence| over all source tokens, the part of the
+    # log-likelihood that does not depend on the probabilities
+    log_uniform_alignment: float
+
+
+def index_dtype(size):
+    """Return the smallest integer dtype that can index size elements."""
+    if size < np.iinfo(np.int32).max:
+        return np.int32
+    return np.int64
+
+
+def build_corpus_arrays(parallel_corpus, source_words, target_words):
+    """
+    Map every token of the corpus to its integer id and store the
+    corpus as flat id arrays with sentence offsets.
+    :param parallel_corpus: list of tuples
+        ([source_sentence], [target_sentence]), or a ParallelCorpus,
+        whose id buffers are translated without visiting every token
+    :param source_words: list of str, the id of a word is its index
+    :param target_words: list of str, the id of a word is its index
+    :return: tuple of np.ndarray
+        (source_ids, source_offsets, target_ids, target_offsets).
+        The tokens of sentence k are ids[offsets[k]:offsets[k + 1]].
+    """
+    if isinstance(parallel_corpus, ParallelCorpus):
+        return parallel_corpus.to_arrays(source_words, target_words)
+    source_index = {word: index for index, word in enumerate(source_words)}
+    target_index = {word: index for index, word in enumerate(target_words)}
+    source_ids = []
+    target_ids = []
+    source_offsets = [0]
+    target_offsets = [0]
+    for source_sentence, target_sentence in parallel_corpus:
+        source_ids.extend(source_index[s_w] for s_w in source_sentence)
+        target_ids.extend(target_index[t_w] for t_w in target_sentence)
+        source_offsets.append(len(source_ids))
+        target_offsets.append(len(target_ids))
+    return (
+        np.array(source_ids, dtype=index_dtype(len(source_words))),
+        np.array(source_offsets, dtype=np.int64),
+        np.array(target_ids, dtype=index_dtype(len(target_words))),
+        np.array(target_offsets, dtype=np.int64),
+    )
+
+
+def build_links(source_ids, source_offsets, target_ids, target_offsets,
+                number_source_words, number_target_words):
+    """
+    Enumerate every (source token, target token) combination of every
+    sentence pair and group them by word pair.
+    Links are ordered by sentence, source position and target position,
+    the same order in which the dict engine visits them.
+    Word pairs are ordered by target id first and source id second,
+    the same order in which initialise() creates them.
+    :return: CorpusLinks
+    """
+    source_lengths = np.diff(source_offsets)
+    target_lengths = np.diff(target_offsets)
+    links_per_sentence = source_lengths * target_lengths
+    number_links = int(links_per_sentence.sum())
+    link_sentences = np.repeat(
+        np.arange(len(links_per_sentence)), links_per_sentence)
+    link_starts = np.cumsum(links_per_sentence) - links_per_sentence
+    within_sentence = np.arange(number_links) - link_starts[link_sentences]
+    sentence_target_lengths = target_lengths[link_sentences]
+    source_tokens = source_offsets[link_sentences] \
+        + within_sentence // sentence_target_lengths
+    target_tokens = target_offsets[link_sentences] \
+        + within_sentence % sentence_target_lengths
+    keys = target_ids[target_tokens].astype(np.int64) * number_source_words \
+        + source_ids[source_tokens]
+    pair_keys, link_pairs = np.unique(keys, return_inverse=True)
+    return CorpusLinks(
+        pair_sources=pair_keys % number_source_words,
+        pair_targets=pair_keys // number_source_words,
+        link_pairs=link_pairs.astype(index_dtype(len(pair_keys))),
+        link_source_tokens=source_tokens.astype(
+            index_dtype(len(source_ids))),
+        number_source_tokens=len(source_ids),
+        number_target_words=number_target_words,
+        log_uniform_alignment=float(
+            (source_lengths * np.log(np.maximum(target_lengths, 1))).sum()),
+    )
+
+
+def initialise(links):
+    """Give every co-occurring pair the probability 1/|target_words|."""
+    return np.full(len(links.pair_targets), 1 / links.number_target_words)
+
+
+def e_step(t_probs, links):
+    """
+    Collect the expected counts of every co-occurring word pair.
+    For every source token the probabilities are normalised over the
+    target tokens of its sentence, like s_total in the dict engine.
+    :param t_probs: np.ndarray with one probability per co-occurring pair
+    :param links: CorpusLinks
+    :return: tuple (count, log_likelihood), count is a np.ndarray with one
+        expected count per co-occurring pair and log_likelihood is the
+        float log-likelihood of the corpus under t_probs
+    """
+    count, log_s_total = expected_counts(
+        t_probs, links.link_pairs, links.link_source_tokens,
+        links.number_source_tokens)
+    return count, log_s_total - links.log_uniform_alignment
+
+
+def expected_counts(t_probs, link_pairs, link_source_tokens,
+                    number_source_tokens):
+    """
+    E-step over any slice of links whose source tokens are numbered
+    from 0 to number_source_tokens - 1.
+    :return: tuple (count, log_s_total), count is a np.ndarray with one
+        expected count per entry of t_probs and log_s_total the float sum
+        of log(s_total) over the source tokens
+    """
+    link_probs = t_probs[link_pairs]
+    s_total = np.bincount(link_source_tokens, weights=link_probs,
+                          minlength=number_source_tokens)
+    # Source tokens whose pairs all have probability 0, as in a model of
+    # the dense engine used as initial model, get no counts
+    link_s_total = s_total[link_source_tokens]
+    fractions = np.divide(link_probs, link_s_total,
+                          out=np.zeros_like(link_probs),
+                          where=link_s_total > 0)
+    count = np.bincount(link_pairs, weights=fractions,
+                        minlength=len(t_probs))
+    # Source tokens of sentence pairs without target tokens have no links
+    return count, float(np.log(s_total[s_total > 0]).sum())
+
+
+def m_step(count, links):
+    """
+    Normalise the expected counts by the total count of their target word.
+    :param count: np.ndarray with one expected count per co-occurring pair
+    :param links: CorpusLinks
+    :return: np.ndarray with the new probability of every pair
+    """
+    total = np.bincount(links.pair_targets, weights=count,
+                        minlength=links.number_target_words)
+    pair_total = total[links.pair_targets]
+    return np.divide(count, pair_total, out=np.zeros_like(count),
+                     where=pair_total > 0)
+
+
+def padded_length(lengths):
+    """
+    Round sentence lengths up to the length of their bucket.
+    Lengths below 8 are kept, longer ones are rounded up to a multiple
+    of an eighth of their power of two: 8, 10, 12, 14, 16, 20, 24, ...
+    so a sentence gets less than 25 % padding in every dimension.
+    :param lengths: np.ndarray of int
+    :return: np.ndarray of int
+    """
+    lengths = np.asarray(lengths, dtype=np.int64)
+    steps = np.ones_like(lengths)
+    long = lengths >= 8
+    steps[long] = 2 ** (np.floor(np.log2(lengths[long])).astype(np.int64)
+                        - 2)
+    return -(-lengths // steps) * steps
+
+
+class BucketedEStep:
+    """
+    E-step over sentence pairs grouped into buckets of similar
+    (|source|, |target|) lengths.
+    Every bucket is a dense array of shape
+    (sentence pairs, padded source length, padded target length) with the
+    pair id of every link, so the normalisation over the target tokens
+    of every source token is a sum over the last axis and a broadcast
+    division, instead of the bincount and the gather over the flat links
+    of e_step(). Padding cells point to an extra pair with probability
+    0, so they add nothing to any sum and need no separate mask.
+    All buckets live in one flat array, so the probabilities are
+    gathered and the counts accumulated with one operation each, and
+    only the normalisation loops over the batches.
+    """
+
+    def __init__(self, links, source_offsets, target_offsets,
+                 max_batch_links=2 ** 22):
+        """
+        :param links: CorpusLinks of the whole corpus, before pruning
+        :param source_offsets: np.ndarray, see build_corpus_arrays()
+        :param target_offsets: np.ndarray, see build_corpus_arrays()
+        :param max_batch_links: int, the most padded links normalised in
+            one array operation, bounds the temporary memory
+        """
+        self.log_uniform_alignment = links.log_uniform_alignment
+        self.pair_keys = pair_keys(links)
+        self.number_pairs = len(self.pair_keys)
+        source_lengths = np.diff(source_offsets)
+        target_lengths = np.diff(target_offsets)
+        padded_sources = padded_length(source_lengths)
+        padded_targets = padded_length(target_lengths)
+        order = np.lexsort((padded_targets, padded_sources))
+        region_sizes = (padded_sources * padded_targets)[order]
+        region_starts = np.empty(len(order), dtype=np.int64)
+        region_starts[order] = np.cumsum(region_sizes) - region_sizes
+        self.pair_ids = np.full(int(region_sizes.sum()), self.number_pairs,
+                                dtype=index_dtype(self.number_pairs + 1))
+        # Same enumeration of the links as in build_links()
+        links_per_sentence = source_lengths * target_lengths
+        link_sentences = np.repeat(
+            np.arange(len(links_per_sentence)), links_per_sentence)
+        link_starts = np.cumsum(links_per_sentence) - links_per_sentence
+        within_sentence = np.arange(len(link_sentences)) \
+            - link_starts[link_sentences]
+        sentence_target_lengths = target_lengths[link_sentences]
+        self.pair_ids[
+            region_starts[link_sentences]
+            + within_sentence // sentence_target_lengths
+            * padded_targets[link_sentences]
+            + within_sentence % sentence_target_lengths] = links.link_pairs
+        # Batches of sentence pairs of the same bucket
+        self.batches = []
+        buckets = np.stack([padded_sources[order], padded_targets[order]],
+                           axis=1)
+        bucket_starts = np.flatnonzero(
+            np.any(np.diff(buckets, axis=0) != 0, axis=1)) + 1
+        position = 0
+        for first, last in zip(np.r_[0, bucket_starts],
+                               np.r_[bucket_starts, len(order)]):
+            if first == last:
+                continue
+            source_length, target_length = buckets[first].tolist()
+            region_size = source_length * target_length
+            if region_size == 0:
+                continue
+            batch_size = max(1, max_batch_links // region_size)
+            for start in range(first, last, batch_size):
+                number_sentences = min(batch_size, last - start)
+                self.batches.append(
+                    (position, position + number_sentences * region_size,
+                     (number_sentences, source_length, target_length)))
+                position += number_sentences * region_size
+
+    def __call__(self, t_probs):
+        """
+        :param t_probs: np.ndarray with one probability per pair
+        :return: tuple (count, log_likelihood), see e_step()
+        """
+        link_probs = np.append(t_probs, 0.0)[self.pair_ids]
+        log_s_total = 0.0
+        for start, end, shape in self.batches:
+            bucket_probs = link_probs[start:end].reshape(shape)
+            s_total = bucket_probs.sum(axis=2)
+            positive = s_total > 0
+            log_s_total += float(np.log(s_total[positive]).sum())
+            # Padding rows and unknown source tokens have s_total 0
+            s_total[~positive] = 1.0
+            bucket_probs /= s_total[:, :, None]
+        count = np.bincount(self.pair_ids, weights=link_probs,
+                            minlength=self.number_pairs + 1)
+        return count[:-1], log_s_total - self.log_uniform_alignment
+
+    def update_links(self, links):
+        """
+        Follow the pairs of the links after prune(): the ids of the
+        kept pairs are renumbered and the pruned pairs become padding.
+        :param links: CorpusLinks returned by prune()
+        :return: None
+        """
+        new_keys = pair_keys(links)
+        positions = np.minimum(np.searchsorted(new_keys, self.pair_keys),
+                               max(len(new_keys) - 1, 0))
+        kept = new_keys[positions] == self.pair_keys \
+            if len(new_keys) else np.zeros(len(self.pair_keys), dtype=bool)
+        new_ids = np.append(np.where(kept, positions, len(new_keys)),
+                            len(new_keys))
+        self.pair_ids = new_ids[self.pair_ids].astype(
+            index_dtype(len(new_keys) + 1))
+        self.pair_keys = new_keys
+        self.number_pairs = len(new_keys)
+
+
+def pair_keys(links):
+    """
+    :return: np.ndarray of int64, the key target id * 2 ** 32 + source id
+        of every pair, in the order of the pairs
+    """
+    return (links.pair_targets.astype(np.int64) << 32) \
+        + links.pair_sources.astype(np.int64)
+
+
+def probabilities_to_dict(t_probs, links, source_words, target_words):
+    """
+    Convert the probability array into the dict the other engines return.
+    :return: dict with items of the form (s_w, t_w) : float
+    """
+    return {
+        (source_words[s_id], target_words[t_id]): prob
+        for s_id, t_id, prob in zip(links.pair_sources.tolist(),
+                                    links.pair_targets.tolist(),
+                                    t_probs.tolist())
+    }
+
+
+class PairProbabilities(Mapping):
+    """
+    Read-only view of the probability array of one iteration that
+    behaves like the dict of probabilities_to_dict(), without building
+    it. The pairs are sorted by pair_keys(), so a word pair is found by
+    binary search, and the pairs of a whole sentence pair by one
+    searchsorted(), like in TranslationTable.probability_matrix().
+    """
+
+    def __init__(self, t_probs, links, source_index, target_index):
+        """
+        :param t_probs: np.ndarray with one probability per pair
+        :param links: CorpusLinks
+        :param source_index: dict of str : int, the id of every source word
+        :param target_index: dict of str : int, the id of every target word
+        """
+        self.values_array = t_probs
+        self.keys_array = pair_keys(links)
+        self.links = links
+        self.source_index = source_index
+        self.target_index = target_index
+
+    def __getitem__(self, pair):
+        source_id = self.source_index.get(pair[0])
+        target_id = self.target_index.get(pair[1])
+        if source_id is not None and target_id is not None:
+            key = (target_id << 32) + source_id
+            position = int(np.searchsorted(self.keys_array, key))
+            if position < len(self.keys_array) and self.keys_array[position] == key:
+                return float(self.values_array[position])
+        raise KeyError(pair)
+
+    def probability_matrix(self, source_sentence, target_sentence):
+        """
+        :param source_sentence: list of str
+        :param target_sentence: list of str
+        :return: np.ndarray, rows are source positions and columns are
+            target positions. Unknown pairs have probability 0.0.
+        """
+        source_ids = np.array(
+            [self.source_index.get(word, -1) for word in source_sentence],
+            dtype=np.int64)
+        target_ids = np.array(
+            [self.target_index.get(word, -1) for word in target_sentence],
+            dtype=np.int64)
+        known = (source_ids[:, None] >= 0) & (target_ids[None, :] >= 0)
+        wanted = np.where(known, (target_ids[None, :] << 32)
+                          + source_ids[:, None], 0)
+        if len(self.keys_array) == 0:
+            return np.zeros(wanted.shape)
+        positions = np.minimum(np.searchsorted(self.keys_array, wanted),
+                               len(self.keys_array) - 1)
+        found = known & (self.keys_array[positions] == wanted)
+        return np.where(found, self.values_array[positions], 0.0)
+
+    def __iter__(self):
+        source_words = {index: word
+                        for word, index in self.source_index.items()}
+        target_words = {index: word
+                        for word, index in self.target_index.items()}
+        for source_id, target_id in zip(self.links.pair_sources.tolist(),
+                                        self.links.pair_targets.tolist()):
+            yield source_words[source_id], target_words[target_id]
+
+    def __len__(self):
+        return len(self.keys_array)
+
+
+def prune(t_probs, links, threshold=None, top_k=None, renormalize=True):
+    """
+    Array version of translation_table.prune_probabilities().
+    The pruned pairs and all their links are removed, so the following
+    iterations only visit the kept pairs. Source tokens that lose all
+    their links no longer take part in the E-step.
+    :param t_probs: np.ndarray with one probability per co-occurring pair
+    :param links: CorpusLinks
+    :return: tuple (t_probs, links) of the kept pairs
+    """
+    keep = np.ones(len(t_probs), dtype=bool)
+    if threshold is not None:
+        keep &= t_probs >= threshold
+    if top_k is not None:
+        # The kept pairs of every target word from the most to the least
+        # probable, equal probabilities stay in source id order
+        order = np.lexsort((-t_probs, ~keep, links.pair_targets))
+        targets = links.pair_targets[order]
+        ranks = np.arange(len(order)) - np.searchsorted(targets, targets)
+        keep[order[ranks >= top_k]] = False
+    return keep_pairs(t_probs, links, keep, renormalize)
+
+
+def keep_pairs(t_probs, links, keep, renormalize=False):
+    """
+    Remove the pairs that are not kept and all their links.
+    :param t_probs: np.ndarray with one probability per co-occurring pair
+    :param links: CorpusLinks
+    :param keep: np.ndarray of bool, one per pair
+    :param renormalize: bool, when True the kept probabilities of every
+        target word are scaled to sum up to 1 again. Target words whose
+        kept probabilities are all 0 lose their pairs, like in
+        translation_table.prune_probabilities().
+    :return: tuple (t_probs, links) of the kept pairs
+    """
+    if renormalize:
+        totals = np.bincount(links.pair_targets[keep],
+                             weights=t_probs[keep],
+                             minlength=links.number_target_words)
+        keep = keep & (totals[links.pair_targets] > 0)
+    new_ids = np.cumsum(keep) - 1
+    link_keep = keep[links.link_pairs]
+    pair_targets = links.pair_targets[keep]
+    t_probs = t_probs[keep]
+    if renormalize:
+        t_probs = t_probs / totals[pair_targets]
+    links = links._replace(
+        pair_sources=links.pair_sources[keep],
+        pair_targets=pair_targets,
+        link_pairs=new_ids[links.link_pairs[link_keep]].astype(
+            links.link_pairs.dtype),
+        link_source_tokens=links.link_source_tokens[link_keep])
+    return t_probs, links
+
+
+def pairs_in_model(probabilities, links, source_words, target_words):
+    """
+    :param probabilities: dict or TranslationTable with items of the
+        form (s_w, t_w) : float
+    :return: np.ndarray of bool, whether the model has each pair
+    """
+    return np.array(
+        [(source_words[s_id], target_words[t_id]) in probabilities
+         for s_id, t_id in zip(links.pair_sources.tolist(),
+                               links.pair_targets.tolist())],
+        dtype=bool).reshape(len(links.pair_sources))
+
+
+def probabilities_from_dict(probabilities, t_probs, links, source_words,
+                            target_words):
+    """
+    Take the probabilities of the co-occurring pairs from a model, for
+    example a checkpoint or a model trained on a smaller corpus.
+    :param probabilities: dict or TranslationTable with items of the
+        form (s_w, t_w) : float
+    :param t_probs: np.ndarray with the probabilities of the pairs that
+        the model does not contain
+    :return: np.ndarray with one probability per co-occurring pair
+    """
+    t_probs = t_probs.copy()
+    for pair, (s_id, t_id) in enumerate(zip(links.pair_sources.tolist(),
+                                            links.pair_targets.tolist())):
+        word_pair = (source_words[s_id], target_words[t_id])
+        if word_pair in probabilities:
+            t_probs[pair] = probabilities[word_pair]
+    return t_probs
+
+
+def shard_boundaries(link_source_tokens, number_shards):
+    """
+    Split the links into contiguous shards of roughly equal size.
+    A shard never splits the links of one source token, because the
+    normalisation of a source token needs all of its links.
+    :return: list of int with number_shards + 1 link positions
+    """
+    number_links = len(link_source_tokens)
+    boundaries = [0]
+    for shard in range(1, number_shards):
+        boundary = max(number_links * shard // number_shards, boundaries[-1])
+        if 0 < boundary < number_links:
+            # Move forward to the first link of the next source token
+            token = link_source_tokens[boundary - 1]
+            boundary = int(np.searchsorted(
+                link_source_tokens, token, side='right'))
+        boundaries.append(boundary)
+    boundaries.append(number_links)
+    return boundaries
+
+
+_shared_arrays = {}
+
+
+def _attach_shared_arrays(specifications):
+    """Pool initializer: map the shared memory blocks as numpy arrays."""
+    for name, (block_name, shape, dtype) in specifications.items():
+        block = SharedMemory(name=block_name)
+        _shared_arrays[name] = (
+            block, np.ndarray(shape, dtype=dtype, buffer=block.buf))
+
+
+def _shard_e_step(shard):
+    """Run the E-step on the links between start and end."""
+    start, end, pairs_start, pairs_end = shard
+    arrays = {name: array for name, (_, array) in _shared_arrays.items()}
+    pairs = arrays['shard_pairs'][pairs_start:pairs_end]
+    tokens = arrays['link_source_tokens'][start:end]
+    first_token = tokens[0]
+    return expected_counts(arrays['t_probs'][pairs],
+                           arrays['link_local_pairs'][start:end],
+                           tokens - first_token,
+                           int(tokens[-1] - first_token) + 1)
+
+
+class ShardedEStep:
+    """
+    Run the E-step on corpus shards in a process pool.
+    The corpus links and the probability table live in shared memory,
+    so every iteration only writes the new probabilities into the
+    shared table instead of pickling it for every worker.
+    Every worker returns the expected counts of the pairs in its shard,
+    and the parent adds them up before running the M-step.
+    Use it as a context manager so that the pool and the shared memory
+    are released.
+    """
+
+    def __init__(self, links, workers):
+        self.number_pairs = len(links.pair_targets)
+        self.log_uniform_alignment = links.log_uniform_alignment
+        boundaries = shard_boundaries(links.link_source_tokens, workers)
+        link_local_pairs = np.empty_like(links.link_pairs)
+        self.shards = []
+        self.shard_pairs = []
+        pairs_start = 0
+        for start, end in zip(boundaries[:-1], boundaries[1:]):
+            if start == end:
+                continue
+            pairs, local_pairs = np.unique(
+                links.link_pairs[start:end], return_inverse=True)
+            link_local_pairs[start:end] = local_pairs
+            self.shards.append(
+                (start, end, pairs_start, pairs_start + len(pairs)))
+            self.shard_pairs.append(pairs)
+            pairs_start += len(pairs)
+        self._blocks = []
+        specifications = {}
+        for name, array in (
+                ('t_probs', np.zeros(self.number_pairs)),
+                ('link_local_pairs', link_local_pairs),
+                ('link_source_tokens', links.link_source_tokens),
+                ('shard_pairs', np.concatenate(self.shard_pairs or [
+                    np.zeros(0, dtype=links.link_pairs.dtype)]))):
+            block = SharedMemory(create=True, size=max(array.nbytes, 1))
+            shared = np.ndarray(array.shape, dtype=array.dtype,
+                                buffer=block.buf)
+            shared[:] = array
+            self._blocks.append(block)
+            specifications[name] = (block.name, array.shape, array.dtype.str)
+            if name == 't_probs':
+                self.t_probs = shared
+        self.pool = Pool(workers, initializer=_attach_shared_arrays,
+                         initargs=(specifications,))
+
+    def __call__(self, t_probs):
+        """
+        :param t_probs: np.ndarray with one probability per pair
+        :return: tuple (count, log_likelihood), see e_step()
+        """
+        self.t_probs[:] = t_probs
+        count = np.zeros(self.number_pairs)
+        log_s_total = 0.0
+        shard_results = self.pool.map(_shard_e_step, self.shards)
+        for pairs, (partial_count, partial_log_s_total) in zip(
+                self.shard_pairs, shard_results):
+            count[pairs] += partial_count
+            log_s_total += partial_log_s_total
+        return count, log_s_total - self.log_uniform_alignment
+
+    def close(self):
+        """Stop the workers and release the shared memory."""
+        self.pool.close()
+        self.pool.join()
+        del self.t_probs
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()